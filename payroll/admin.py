@@ -1,11 +1,23 @@
 from django.contrib import admin
 
-from .models import Employee, PayrollComponent, PayrollEntry, PayrollEntryItem, PayrollPeriod, School, User
+from .models import (
+    Employee,
+    EmployeeComponentOverride,
+    PayrollComponent,
+    PayrollEntry,
+    PayrollEntryItem,
+    PayrollPeriod,
+    RolloverRun,
+    SlipDelivery,
+    School,
+    User,
+)
 
 
 @admin.register(School)
 class SchoolAdmin(admin.ModelAdmin):
-    list_display = ("name", "code", "is_active")
+    list_display = ("name", "code", "is_active", "rollover_method")
+    list_filter = ("is_active", "rollover_method")
     search_fields = ("name", "code")
 
 
@@ -30,6 +42,13 @@ class PayrollComponentAdmin(admin.ModelAdmin):
     search_fields = ("name", "code")
 
 
+@admin.register(EmployeeComponentOverride)
+class EmployeeComponentOverrideAdmin(admin.ModelAdmin):
+    list_display = ("employee", "component", "amount", "effective_from", "effective_until")
+    list_filter = ("employee__school", "component")
+    search_fields = ("employee__full_name", "component__code")
+
+
 class PayrollEntryItemInline(admin.TabularInline):
     model = PayrollEntryItem
     extra = 0
@@ -48,3 +67,27 @@ class PayrollEntryAdmin(admin.ModelAdmin):
     list_filter = ("period__school", "status")
     search_fields = ("employee__full_name",)
     inlines = [PayrollEntryItemInline]
+
+
+@admin.register(RolloverRun)
+class RolloverRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "year",
+        "month",
+        "created_count",
+        "generated_count",
+        "skipped_count",
+        "failed_count",
+        "last_school_id",
+        "finished_at",
+    )
+    readonly_fields = ("errors", "started_at", "updated_at", "finished_at")
+
+
+@admin.register(SlipDelivery)
+class SlipDeliveryAdmin(admin.ModelAdmin):
+    list_display = ("entry", "email", "status", "attempts", "sent_at")
+    list_filter = ("status", "entry__period__school")
+    search_fields = ("entry__employee__full_name", "email")
+    list_select_related = ("entry__employee", "entry__period")
+    readonly_fields = ("last_error", "claim", "claimed_at", "sent_at", "updated_at")
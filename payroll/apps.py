@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class PayrollConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payroll'
+
+    def ready(self):
+        from .catalog import component_changed
+        from .models import Employee, PayrollComponent, School
+        from .portal import employee_deleted, employee_saved, school_saved
+        from .search import ensure_fulltext_triggers
+
+        post_migrate.connect(ensure_fulltext_triggers, sender=self)
+        post_save.connect(component_changed, sender=PayrollComponent)
+        post_delete.connect(component_changed, sender=PayrollComponent)
+        post_save.connect(employee_saved, sender=Employee)
+        post_delete.connect(employee_deleted, sender=Employee)
+        post_save.connect(school_saved, sender=School)
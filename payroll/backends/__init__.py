@@ -0,0 +1,41 @@
+"""Registry backend impor/ekspor.
+
+Setiap backend adalah modul biasa yang baru diimpor saat pertama kali dipakai,
+sehingga library berat (ReportLab, openpyxl) tidak ikut dimuat ketika worker
+atau perintah ``manage.py`` start. Implementasi dapat diganti lewat setting
+``PAYROLL_BACKENDS``, misalnya ``{"slip": "myapp.slip_weasyprint"}``.
+
+Antarmuka per peran:
+
+- ``slip``: ``render(data: dict) -> bytes`` berisi PDF slip.
+- ``import``: ``read_rows(upload_file)`` yang mengembalikan iterator tuple nilai sel
+  (baris pertama adalah header).
+- ``export``: ``content_type``, ``extension``, ``render_header(codes) -> str``,
+  ``render_rows(codes, rows) -> str``.
+"""
+from __future__ import annotations
+
+from importlib import import_module
+from types import ModuleType
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULT_BACKENDS = {
+    "slip": "payroll.backends.pdf",
+    "import": "payroll.backends.xlsx",
+    "export": "payroll.backends.csv_export",
+}
+
+
+def backend_path(role: str) -> str:
+    paths = {**DEFAULT_BACKENDS, **getattr(settings, "PAYROLL_BACKENDS", {})}
+    try:
+        return paths[role]
+    except KeyError as exc:
+        raise ImproperlyConfigured(f"Backend payroll tidak dikenal: {role}") from exc
+
+
+def get_backend(role: str) -> ModuleType:
+    # import_module sudah di-cache oleh sys.modules; pemanggilan berikutnya murah.
+    return import_module(backend_path(role))
@@ -0,0 +1,35 @@
+"""Ekspor periode ke CSV."""
+from __future__ import annotations
+
+import csv
+from decimal import Decimal
+from io import StringIO
+
+content_type = "text/csv"
+extension = "csv"
+
+
+def render_header(codes: list[str]) -> str:
+    buffer = StringIO()
+    csv.writer(buffer).writerow(
+        ["nip", "nama", "email", *codes, "total_pendapatan", "total_potongan", "gaji_bersih"]
+    )
+    return buffer.getvalue()
+
+
+def render_rows(codes: list[str], rows: list[tuple]) -> str:
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    for _, nip, name, email, amounts, earnings, deductions, net_pay in rows:
+        writer.writerow(
+            [
+                nip,
+                name,
+                email,
+                *(amounts.get(code, Decimal("0")) for code in codes),
+                earnings,
+                deductions,
+                net_pay,
+            ]
+        )
+    return buffer.getvalue()
@@ -0,0 +1,49 @@
+"""Slip gaji PDF dengan ReportLab."""
+from __future__ import annotations
+
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+
+def render(data: dict) -> bytes:
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - 30 * mm
+    pdf.setFont("Helvetica-Bold", 14)
+    pdf.drawString(20 * mm, y, f"Slip Gaji - {data['period_label']}")
+    y -= 10 * mm
+    pdf.setFont("Helvetica", 11)
+    pdf.drawString(20 * mm, y, f"Pegawai : {data['employee_name']}")
+    y -= 7 * mm
+    pdf.drawString(20 * mm, y, f"Jenis    : {data['employee_type']}")
+    y -= 7 * mm
+    pdf.drawString(20 * mm, y, f"Periode  : {data['period_label']}")
+    y -= 12 * mm
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawString(20 * mm, y, "Rincian Pendapatan")
+    pdf.setFont("Helvetica", 11)
+    y -= 8 * mm
+    for name, amount in data["earnings"]:
+        pdf.drawString(22 * mm, y, f"{name}")
+        pdf.drawRightString(width - 20 * mm, y, f"{amount:,.2f}")
+        y -= 6 * mm
+    y -= 4 * mm
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawString(20 * mm, y, "Rincian Potongan")
+    y -= 8 * mm
+    pdf.setFont("Helvetica", 11)
+    for name, amount in data["deductions"]:
+        pdf.drawString(22 * mm, y, f"{name}")
+        pdf.drawRightString(width - 20 * mm, y, f"{amount:,.2f}")
+        y -= 6 * mm
+    y -= 10 * mm
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawString(20 * mm, y, "Gaji Bersih")
+    pdf.drawRightString(width - 20 * mm, y, f"{data['net_pay']:,.2f}")
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
@@ -0,0 +1,13 @@
+"""Pembaca file impor Excel dengan openpyxl."""
+from __future__ import annotations
+
+from openpyxl import load_workbook
+
+
+def read_rows(upload_file):
+    # Mode read_only membiarkan file terbuka sampai workbook ditutup; tutup begitu baris habis dibaca.
+    workbook = load_workbook(upload_file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
@@ -0,0 +1,78 @@
+"""Kernel perhitungan total gaji dalam satuan sen (bilangan bulat).
+
+Nominal ``DecimalField(decimal_places=2)`` dibulatkan ke sen dengan
+``ROUND_HALF_EVEN`` (sama dengan kuantisasi Django saat menyimpan), lalu
+dijumlahkan sebagai integer di ``array('q')`` sehingga total seluruh entry
+dalam satu atau banyak periode dihitung dalam satu kali lintasan, tanpa
+membuat objek ``Decimal`` perantara per penjumlahan.
+"""
+from __future__ import annotations
+
+from array import array
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Iterable, Iterator
+
+from .models import PayrollComponent
+
+_HUNDRED = Decimal(100)
+
+
+def to_sen(amount: Decimal | int | str) -> int:
+    return int((Decimal(amount) * _HUNDRED).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_sen(value: int) -> Decimal:
+    return Decimal(value).scaleb(-2)
+
+
+class BatchTotals:
+    """Total pendapatan/potongan per entry dalam sen, disimpan di array paralel."""
+
+    __slots__ = ("entry_ids", "earnings", "deductions", "_slots")
+
+    def __init__(self, entry_ids: Iterable[int] = ()):
+        self.entry_ids = array("q")
+        self.earnings = array("q")
+        self.deductions = array("q")
+        self._slots: dict[int, int] = {}
+        for entry_id in entry_ids:
+            self._slot(entry_id)
+
+    def _slot(self, entry_id: int) -> int:
+        slot = self._slots.get(entry_id)
+        if slot is None:
+            slot = self._slots[entry_id] = len(self.entry_ids)
+            self.entry_ids.append(entry_id)
+            self.earnings.append(0)
+            self.deductions.append(0)
+        return slot
+
+    def __len__(self) -> int:
+        return len(self.entry_ids)
+
+    def add(self, rows: Iterable[tuple[int, str, Decimal]]) -> "BatchTotals":
+        """Tambahkan baris ``(entry_id, component_type, amount)`` dalam satu lintasan."""
+        earning, deduction = PayrollComponent.TYPE_EARNING, PayrollComponent.TYPE_DEDUCTION
+        earnings, deductions, slot_for = self.earnings, self.deductions, self._slot
+        for entry_id, component_type, amount in rows:
+            slot = slot_for(entry_id)
+            if component_type == earning:
+                earnings[slot] += to_sen(amount)
+            elif component_type == deduction:
+                deductions[slot] += to_sen(amount)
+        return self
+
+    def sen(self, entry_id: int) -> tuple[int, int, int]:
+        slot = self._slots[entry_id]
+        earnings, deductions = self.earnings[slot], self.deductions[slot]
+        return earnings, deductions, earnings - deductions
+
+    def __iter__(self) -> Iterator[tuple[int, Decimal, Decimal, Decimal]]:
+        """``(entry_id, total_earnings, total_deductions, net_pay)`` sebagai ``Decimal``."""
+        for entry_id, earnings, deductions in zip(self.entry_ids, self.earnings, self.deductions):
+            yield entry_id, from_sen(earnings), from_sen(deductions), from_sen(earnings - deductions)
+
+
+def batch_totals(rows: Iterable[tuple[int, str, Decimal]], entry_ids: Iterable[int] = ()) -> BatchTotals:
+    """Hitung total semua entry sekaligus; ``entry_ids`` memastikan entry tanpa item bernilai nol."""
+    return BatchTotals(entry_ids).add(rows)
@@ -0,0 +1,52 @@
+"""Cache katalog komponen gaji aktif per sekolah.
+
+Generate, tambah gaji pegawai, form tambah item, dan form komponen massal membaca
+daftar komponen aktif dari sini, bukan ``school.components.filter(is_active=True)``
+berulang kali per request. Nilai cache adalah tuple nilai kolom yang dibangun ulang
+menjadi instance ``PayrollComponent`` (tanpa query) saat dibaca. Setiap sekolah punya
+nomor versi yang dinaikkan oleh signal ``post_save``/``post_delete`` komponen, sehingga
+kunci lama otomatis tidak terpakai. Dengan lebih dari satu worker, ``CACHES`` harus
+memakai backend bersama agar kenaikan versi terlihat oleh semua worker.
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .metrics import record_cache
+from .models import PayrollComponent
+from .versioning import bump_version, current_version
+
+_FIELDS = tuple(field.attname for field in PayrollComponent._meta.concrete_fields)
+
+
+def _timeout() -> int:
+    return getattr(settings, "PAYROLL_COMPONENT_CACHE_TIMEOUT", 3600)
+
+
+def component_version(school_id: int) -> int:
+    return current_version(f"payroll:component-version:{school_id}")
+
+
+def bump_component_version(school_id: int) -> None:
+    bump_version(f"payroll:component-version:{school_id}")
+
+
+def active_components(school_id: int) -> list[PayrollComponent]:
+    """Komponen aktif sekolah (urut nama) sebagai instance baru di setiap pemanggilan."""
+    key = f"payroll:components:{school_id}:{component_version(school_id)}"
+    rows = cache.get(key)
+    record_cache("components", rows is not None)
+    if rows is None:
+        rows = list(
+            PayrollComponent.objects.filter(school_id=school_id, is_active=True)
+            .order_by(*PayrollComponent._meta.ordering, "pk")
+            .values_list(*_FIELDS)
+        )
+        cache.set(key, rows, timeout=_timeout())
+    return [PayrollComponent.from_db(DEFAULT_DB_ALIAS, _FIELDS, row) for row in rows]
+
+
+def component_changed(sender, instance: PayrollComponent, **kwargs) -> None:
+    bump_component_version(instance.school_id)
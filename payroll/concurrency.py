@@ -0,0 +1,102 @@
+"""Kunci per periode dan kunci idempoten untuk generate/finalisasi.
+
+``period_lock`` memakai ``SELECT ... FOR UPDATE`` pada baris periode bila backend
+mendukungnya (PostgreSQL/MySQL) dan tabel ``PeriodLock`` sebagai advisory lock di
+SQLite. Kunci hanya mengikat satu periode, jadi sekolah/periode lain tidak saling
+menunggu. Kunci advisory punya masa berlaku (``PAYROLL_PERIOD_LOCK_TTL``); proses
+yang kuncinya sudah kedaluwarsa dan diambil alih dibatalkan sebelum commit.
+"""
+from __future__ import annotations
+
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey, PayrollPeriod, PeriodLock
+
+
+class PeriodBusyError(Exception):
+    """Periode sedang dikunci oleh proses lain."""
+
+    def __init__(self, message: str = "Periode sedang diproses pengguna lain. Coba lagi sebentar lagi."):
+        super().__init__(message)
+
+
+def _lock_ttl() -> timedelta:
+    return timedelta(seconds=getattr(settings, "PAYROLL_PERIOD_LOCK_TTL", 600))
+
+
+def _acquire_advisory(period_id: int, operation: str) -> str:
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    fields = {"token": token, "operation": operation, "acquired_at": now, "expires_at": now + _lock_ttl()}
+    try:
+        with transaction.atomic():
+            PeriodLock.objects.create(period_id=period_id, **fields)
+        return token
+    except IntegrityError:
+        pass
+    # Ambil alih kunci yang kedaluwarsa (proses sebelumnya mati atau macet).
+    if PeriodLock.objects.filter(period_id=period_id, expires_at__lt=now).update(**fields):
+        return token
+    raise PeriodBusyError()
+
+
+@contextmanager
+def period_lock(period_id: int, operation: str, *, wait: bool = False):
+    """Jalankan blok di dalam transaksi sambil memegang kunci periode.
+
+    Menghasilkan objek periode yang dibaca ulang di bawah kunci. ``wait=False`` menolak
+    langsung bila periode sedang dikunci (dipakai generate/finalisasi); ``wait=True``
+    menunggu kunci baris singkat (edit item) bila backend mendukung row lock.
+    """
+    if connection.features.has_select_for_update:
+        with transaction.atomic():
+            nowait = not wait and connection.features.has_select_for_update_nowait
+            try:
+                period = PayrollPeriod.objects.select_for_update(nowait=nowait).get(pk=period_id)
+            except DatabaseError as exc:
+                raise PeriodBusyError() from exc
+            yield period
+        return
+
+    token = _acquire_advisory(period_id, operation)
+    try:
+        with transaction.atomic():
+            period = PayrollPeriod.objects.get(pk=period_id)
+            yield period
+            # Bila blok menghapus periode itu sendiri, baris kunci ikut terhapus (CASCADE).
+            deleted = not PayrollPeriod.objects.filter(pk=period_id).exists()
+            if not deleted and not PeriodLock.objects.filter(period_id=period_id, token=token).exists():
+                raise PeriodBusyError("Kunci periode kedaluwarsa dan diambil alih proses lain; perubahan dibatalkan.")
+    finally:
+        PeriodLock.objects.filter(period_id=period_id, token=token).delete()
+
+
+def claim_idempotency_key(user, operation: str, key: str | None, period=None) -> tuple[IdempotencyKey | None, bool]:
+    """Catat kiriman form; kembalikan ``(catatan, duplikat)``. Tanpa kunci: ``(None, False)``."""
+    if not key:
+        return None, False
+    key = key[:64]
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, "PAYROLL_IDEMPOTENCY_TTL", 86400))
+    IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user=user, operation=operation, key=key, period=period), False
+    except IntegrityError:
+        return IdempotencyKey.objects.filter(user=user, operation=operation, key=key).first(), True
+
+
+def complete_idempotency_key(record: IdempotencyKey | None) -> None:
+    if record:
+        IdempotencyKey.objects.filter(pk=record.pk).update(completed_at=timezone.now())
+
+
+def release_idempotency_key(record: IdempotencyKey | None) -> None:
+    """Hapus catatan kiriman yang gagal agar form yang sama boleh dikirim ulang."""
+    if record:
+        IdempotencyKey.objects.filter(pk=record.pk).delete()
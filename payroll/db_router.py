@@ -0,0 +1,183 @@
+"""Router replika baca untuk halaman laporan dan halaman yang banyak dibaca.
+
+View yang dibungkus ``read_replica`` membaca dari alias ``PAYROLL_REPLICA_DATABASE``
+(default ``"replica"``) untuk request GET/HEAD. Semua penulisan tetap ke ``default``.
+Bila alias tersebut tidak ada di ``DATABASES``, router tidak melakukan apa pun.
+
+Read-your-writes: setiap POST (atau metode tidak aman lain) memasang cookie
+``payroll_primary_until`` selama ``PAYROLL_REPLICA_STICKY_SECONDS`` sehingga halaman
+yang dibuka setelah redirect tetap membaca dari primary. Penulisan di tengah request
+yang sedang membaca replika juga memindahkan sisa request ke primary.
+
+Toleransi lag: untuk PostgreSQL lag replika diperiksa paling sering tiap
+``PAYROLL_REPLICA_LAG_CHECK_INTERVAL`` detik; bila melebihi
+``PAYROLL_REPLICA_MAX_LAG`` detik (atau replika tidak bisa dihubungi) pembacaan
+kembali ke primary. Backend lain tidak punya ukuran lag dan hanya mengandalkan
+jendela sticky.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "primary"
+REPLICA = "replica"
+STICKY_COOKIE = "payroll_primary_until"
+_SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_route: ContextVar[str | None] = ContextVar("payroll_db_route", default=None)
+_lag_state = {"checked_at": float("-inf"), "ok": True}
+
+_PG_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replica_alias() -> str:
+    return getattr(settings, "PAYROLL_REPLICA_DATABASE", "replica")
+
+
+def _sticky_seconds() -> int:
+    return getattr(settings, "PAYROLL_REPLICA_STICKY_SECONDS", 10)
+
+
+def replica_lag_seconds() -> float | None:
+    """Lag replika dalam detik, atau ``None`` bila backend tidak bisa mengukurnya."""
+    connection = connections[replica_alias()]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(_PG_LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def replica_available() -> bool:
+    if replica_alias() not in connections.databases:
+        return False
+    max_lag = getattr(settings, "PAYROLL_REPLICA_MAX_LAG", 5)
+    if max_lag is None:
+        return True
+    now = time.monotonic()
+    if now - _lag_state["checked_at"] < getattr(settings, "PAYROLL_REPLICA_LAG_CHECK_INTERVAL", 5):
+        return _lag_state["ok"]
+    try:
+        lag = replica_lag_seconds()
+    except DatabaseError:
+        logger.warning("Replika %s tidak dapat dihubungi; membaca dari primary.", replica_alias(), exc_info=True)
+        ok = False
+    else:
+        ok = lag is None or lag <= max_lag
+        if not ok and _lag_state["ok"]:
+            logger.warning("Lag replika %.1f detik melebihi batas %s detik; membaca dari primary.", lag, max_lag)
+    _lag_state.update(checked_at=now, ok=ok)
+    return ok
+
+
+def current_route() -> str | None:
+    return _route.get()
+
+
+@contextmanager
+def routed(route: str | None):
+    """Jalankan blok dengan keputusan routing tertentu (mis. hasil ``current_route()`` di view)."""
+    token = _route.set(route)
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+def read_replica(view):
+    """Baca dari replika untuk GET/HEAD, kecuali request sedang di jendela sticky primary."""
+
+    def _route_for(request):
+        if request.method not in _SAFE_METHODS or _route.get() == PRIMARY:
+            return _route.get()
+        return REPLICA
+
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with routed(_route_for(request)):
+                return await view(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with routed(_route_for(request)):
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _route.get() == REPLICA and replica_available():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if _route.get() == REPLICA:
+            # Sisa request membaca dari primary agar hasil tulis langsung terlihat.
+            _route.set(PRIMARY)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Pasang jendela sticky primary setelah request yang menulis (sync & async)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _initial_route(self, request) -> str | None:
+        try:
+            pinned_until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        return PRIMARY if pinned_until > time.time() else None
+
+    def _finish(self, request, response):
+        if request.method not in _SAFE_METHODS and replica_alias() in connections.databases:
+            sticky = _sticky_seconds()
+            response.set_cookie(
+                STICKY_COOKIE, str(int(time.time()) + sticky + 1), max_age=sticky + 1, httponly=True, samesite="Lax"
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routed(self._initial_route(request)):
+            response = self.get_response(request)
+        return self._finish(request, response)
+
+    async def __acall__(self, request):
+        with routed(self._initial_route(request)):
+            response = await self.get_response(request)
+        return self._finish(request, response)
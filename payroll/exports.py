@@ -0,0 +1,101 @@
+"""Render slip PDF dan ekspor periode.
+
+Fungsi render di modul ini hanya menerima data biasa (tanpa akses ORM) sehingga
+aman dijalankan di thread pool terbatas dari view async.
+"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+
+from .backends import get_backend
+from .metrics import PDF_RENDER_SECONDS
+from .models import PayrollComponent, PayrollEntry, PayrollPeriod
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = Lock()
+
+
+def _render_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "PAYROLL_RENDER_WORKERS", 4),
+                thread_name_prefix="payroll-render",
+            )
+    return _executor
+
+
+async def run_in_render_pool(func, *args):
+    """Jalankan render CPU-bound di executor terbatas agar event loop tetap responsif."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_render_executor(), func, *args)
+
+
+def slip_data(entry: PayrollEntry, items) -> dict:
+    return {
+        "period_label": entry.period.label,
+        "employee_name": entry.employee.full_name,
+        "employee_type": entry.employee.get_employee_type_display(),
+        "earnings": [
+            (item.component_name, item.amount)
+            for item in items
+            if item.component_type == PayrollComponent.TYPE_EARNING
+        ],
+        "deductions": [
+            (item.component_name, item.amount)
+            for item in items
+            if item.component_type == PayrollComponent.TYPE_DEDUCTION
+        ],
+        "net_pay": entry.net_pay,
+    }
+
+
+def render_slip_pdf(data: dict) -> bytes:
+    backend = get_backend("slip")
+    with PDF_RENDER_SECONDS.time():
+        return backend.render(data)
+
+
+def period_export_codes(period: PayrollPeriod) -> list[str]:
+    return list(
+        PayrollComponent.objects.filter(payrollentryitem__entry__period=period)
+        .order_by("-component_type", "code")  # pendapatan dulu, lalu potongan
+        .values_list("code", flat=True)
+        .distinct()
+    )
+
+
+def period_export_batch(period: PayrollPeriod, after_id: int, size: int) -> list[tuple]:
+    """Satu batch entry (keyset by id) dalam bentuk tuple biasa untuk dirender di luar ORM."""
+    entries = list(
+        period.entries.filter(id__gt=after_id)
+        .select_related("employee")
+        .prefetch_related("items__component")
+        .order_by("id")[:size]
+    )
+    return [
+        (
+            entry.id,
+            entry.employee.nip or "",
+            entry.employee.full_name,
+            entry.employee.email,
+            {item.component.code: item.amount for item in entry.items.all()},
+            entry.total_earnings,
+            entry.total_deductions,
+            entry.net_pay,
+        )
+        for entry in entries
+    ]
+
+
+def render_export_header(codes: list[str]) -> str:
+    return get_backend("export").render_header(codes)
+
+
+def render_export_rows(codes: list[str], rows: list[tuple]) -> str:
+    return get_backend("export").render_rows(codes, rows)
@@ -1,7 +1,9 @@
 from django import forms
-from django.forms import inlineformset_factory
+from django.forms import BaseInlineFormSet, inlineformset_factory
 
-from .models import Employee, PayrollComponent, PayrollEntry, PayrollEntryItem, PayrollPeriod
+from .catalog import active_components
+from .models import Employee, EmployeeComponentOverride, PayrollComponent, PayrollEntry, PayrollEntryItem, PayrollPeriod
+from .search import search_employees
 
 
 class EmployeeForm(forms.ModelForm):
@@ -52,6 +54,51 @@ class PayrollComponentForm(forms.ModelForm):
                 widget.attrs["class"] = "form-control"
 
 
+class EmployeeComponentOverrideForm(forms.ModelForm):
+    class Meta:
+        model = EmployeeComponentOverride
+        fields = ["component", "amount", "effective_from", "effective_until", "note"]
+        labels = {
+            "component": "Komponen",
+            "amount": "Nominal",
+            "effective_from": "Berlaku mulai",
+            "effective_until": "Berlaku sampai",
+            "note": "Catatan",
+        }
+        widgets = {
+            "effective_from": forms.DateInput(attrs={"type": "date"}),
+            "effective_until": forms.DateInput(attrs={"type": "date"}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        school = kwargs.pop("school")
+        super().__init__(*args, **kwargs)
+        self.fields["component"].queryset = school.components.filter(is_active=True)
+        self.fields["component"].empty_label = "Pilih komponen"
+        self.fields["effective_from"].help_text = "Kosongkan bila berlaku sejak awal. Dihitung per bulan."
+        self.fields["effective_until"].help_text = "Kosongkan bila berlaku seterusnya."
+        for name, field in self.fields.items():
+            widget = field.widget
+            if isinstance(widget, forms.Select):
+                widget.attrs["class"] = "form-select"
+            else:
+                widget.attrs["class"] = "form-control"
+
+    def clean_amount(self):
+        amount = self.cleaned_data["amount"]
+        if amount is not None and amount < 0:
+            raise forms.ValidationError("Nominal tidak boleh negatif.")
+        return amount
+
+    def clean(self):
+        cleaned = super().clean()
+        effective_from = cleaned.get("effective_from")
+        effective_until = cleaned.get("effective_until")
+        if effective_from and effective_until and effective_until.replace(day=1) < effective_from.replace(day=1):
+            self.add_error("effective_until", "Bulan akhir harus setelah bulan mulai.")
+        return cleaned
+
+
 class PayrollPeriodForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         self.school = kwargs.pop("school", None)
@@ -103,7 +150,9 @@ class PayrollGenerateForm(forms.Form):
     def __init__(self, *args, **kwargs):
         school = kwargs.pop("school", None)
         super().__init__(*args, **kwargs)
+        self.has_components = True
         if school:
+            self.has_components = bool(active_components(school.pk))
             self.fields["source_period"].queryset = PayrollPeriod.objects.filter(
                 school=school, status=PayrollPeriod.STATUS_FINAL
             ).order_by("-year", "-month")
@@ -111,6 +160,8 @@ class PayrollGenerateForm(forms.Form):
     def clean(self):
         cleaned = super().clean()
         method = cleaned.get("method")
+        if method in (self.METHOD_MANUAL, self.METHOD_IMPORT) and not self.has_components:
+            self.add_error("method", "Belum ada komponen gaji aktif.")
         if method == self.METHOD_COPY and not cleaned.get("source_period"):
             self.add_error("source_period", "Pilih periode sumber untuk metode copy.")
         if method == self.METHOD_IMPORT and not cleaned.get("upload_file"):
@@ -118,31 +169,106 @@ class PayrollGenerateForm(forms.Form):
         return cleaned
 
 
+class _PrefetchedItemField(forms.ModelChoiceField):
+    """Field pk formset yang mencari item dari daftar yang sudah dimuat, bukan query per baris."""
+
+    def __init__(self, objects, *args, **kwargs):
+        self._objects = objects
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self._objects[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise forms.ValidationError(self.error_messages["invalid_choice"], code="invalid_choice")
+
+
+class BasePayrollEntryItemFormSet(BaseInlineFormSet):
+    def __init__(self, *args, items=None, **kwargs):
+        self._items = list(items) if items is not None else None
+        super().__init__(*args, **kwargs)
+
+    def get_queryset(self):
+        if self._items is None:
+            return super().get_queryset()
+        return self._items
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        if self._items is not None:
+            pk_name = self._pk_field.name
+            pk_field = form.fields[pk_name]
+            form.fields[pk_name] = _PrefetchedItemField(
+                {item.pk: item for item in self._items},
+                pk_field.queryset,
+                initial=pk_field.initial,
+                required=False,
+                widget=pk_field.widget,
+            )
+
+
 PayrollEntryItemFormSet = inlineformset_factory(
     PayrollEntry,
     PayrollEntryItem,
+    formset=BasePayrollEntryItemFormSet,
     fields=["amount"],
     extra=0,
     can_delete=False,
 )
 
 
+class PeriodGridForm(forms.Form):
+    """Sel grid yang berubah saja: ``cell-<item_id>`` berisi nominal baru dan
+    ``version-<entry_id>`` berisi ``updated_at`` entry saat grid dimuat."""
+
+    def __init__(self, data, *, items):
+        super().__init__(data)
+        self.items = items
+        entry_ids = {item.entry_id for item in items.values()}
+        for item_id in items:
+            self.fields[f"cell-{item_id}"] = forms.DecimalField(
+                max_digits=12,
+                decimal_places=2,
+                min_value=0,
+                error_messages={"min_value": "Nominal tidak boleh negatif."},
+            )
+        for entry_id in entry_ids:
+            self.fields[f"version-{entry_id}"] = forms.CharField(required=False)
+
+    @staticmethod
+    def cell_ids(data) -> list[int]:
+        return [int(key[5:]) for key in data if key.startswith("cell-") and key[5:].isdigit()]
+
+    def amounts(self) -> dict[int, object]:
+        return {item_id: self.cleaned_data[f"cell-{item_id}"] for item_id in self.items}
+
+    def version(self, entry_id: int) -> str:
+        return self.cleaned_data.get(f"version-{entry_id}", "")
+
+
 class PayrollEntryItemAddForm(forms.Form):
-    component = forms.ModelChoiceField(queryset=PayrollComponent.objects.none(), label="Komponen")
+    component = forms.ChoiceField(label="Komponen")
     amount = forms.DecimalField(max_digits=12, decimal_places=2, required=False, label="Nominal")
 
     def __init__(self, *args, **kwargs):
         school = kwargs.pop("school")
         component_type = kwargs.pop("component_type")
+        components = kwargs.pop("components", None)
         super().__init__(*args, **kwargs)
         self.component_type = component_type
-        qs = PayrollComponent.objects.filter(
-            school=school,
-            component_type=component_type,
-            is_active=True,
-        )
-        self.fields["component"].queryset = qs
-        self.fields["component"].empty_label = "Pilih komponen"
+        if components is None:
+            components = active_components(school.pk)
+        self._components = {
+            str(component.pk): component for component in components if component.component_type == component_type
+        }
+        self.fields["component"].choices = [("", "Pilih komponen")] + [
+            (pk, str(component)) for pk, component in self._components.items()
+        ]
+
+    def clean_component(self):
+        return self._components[self.cleaned_data["component"]]
 
     def clean_amount(self):
         amount = self.cleaned_data["amount"]
@@ -151,15 +277,94 @@ class PayrollEntryItemAddForm(forms.Form):
         return amount
 
 
+class PeriodBulkComponentForm(forms.Form):
+    ACTION_ADD = "add"
+    ACTION_SET = "set"
+    ACTION_REMOVE = "remove"
+    ACTION_CHOICES = [
+        (ACTION_ADD, "Tambahkan ke entry yang belum memiliki komponen ini"),
+        (ACTION_SET, "Tambahkan atau ubah nominal di semua entry"),
+        (ACTION_REMOVE, "Hapus komponen dari entry"),
+    ]
+
+    action = forms.ChoiceField(choices=ACTION_CHOICES, label="Aksi")
+    component = forms.ChoiceField(label="Komponen")
+    amount = forms.DecimalField(max_digits=12, decimal_places=2, required=False, label="Nominal")
+    employee_type = forms.ChoiceField(
+        choices=[("", "Semua pegawai"), *Employee.EMPLOYEE_TYPES], required=False, label="Jenis pegawai"
+    )
+
+    def __init__(self, *args, **kwargs):
+        school = kwargs.pop("school")
+        super().__init__(*args, **kwargs)
+        self._components = {str(component.pk): component for component in active_components(school.pk)}
+        self.fields["component"].choices = [("", "Pilih komponen")] + [
+            (pk, str(component)) for pk, component in self._components.items()
+        ]
+        for field in self.fields.values():
+            field.widget.attrs["class"] = "form-select" if isinstance(field.widget, forms.Select) else "form-control"
+
+    def clean_component(self):
+        return self._components[self.cleaned_data["component"]]
+
+    def clean(self):
+        cleaned = super().clean()
+        amount = cleaned.get("amount")
+        if cleaned.get("action") in (self.ACTION_ADD, self.ACTION_SET):
+            if amount is None:
+                self.add_error("amount", "Nominal wajib diisi untuk aksi ini.")
+            elif amount < 0:
+                self.add_error("amount", "Nominal tidak boleh negatif.")
+        return cleaned
+
+
+class EmployeeFilterForm(forms.Form):
+    STATUS_ACTIVE = "active"
+    STATUS_INACTIVE = "inactive"
+
+    q = forms.CharField(required=False, label="Cari", max_length=100)
+    employee_type = forms.ChoiceField(
+        choices=[("", "Semua jenis"), *Employee.EMPLOYEE_TYPES], required=False, label="Jenis"
+    )
+    status = forms.ChoiceField(
+        choices=[("", "Semua status"), (STATUS_ACTIVE, "Aktif"), (STATUS_INACTIVE, "Non aktif")],
+        required=False,
+        label="Status",
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["q"].widget.attrs.update(
+            {"class": "form-control form-control-sm", "placeholder": "Nama, NIP, atau email"}
+        )
+        self.fields["employee_type"].widget.attrs["class"] = "form-select form-select-sm"
+        self.fields["status"].widget.attrs["class"] = "form-select form-select-sm"
+
+    def filter(self, employees):
+        if not self.is_valid():
+            return employees
+        data = self.cleaned_data
+        if data["employee_type"]:
+            employees = employees.filter(employee_type=data["employee_type"])
+        if data["status"]:
+            employees = employees.filter(is_active=data["status"] == self.STATUS_ACTIVE)
+        return search_employees(employees, data["q"])
+
+
 class PayrollEntryAddForm(forms.Form):
-    employee = forms.ModelChoiceField(queryset=Employee.objects.none(), label="Pegawai")
+    # Dipilih lewat autocomplete (employee_autocomplete), bukan select berisi semua pegawai.
+    employee = forms.ModelChoiceField(
+        queryset=Employee.objects.none(), label="Pegawai", widget=forms.HiddenInput
+    )
 
     def __init__(self, *args, **kwargs):
         school = kwargs.pop("school")
         period = kwargs.pop("period")
         super().__init__(*args, **kwargs)
         existing_employee_ids = period.entries.values_list("employee_id", flat=True)
-        queryset = school.employees.filter(is_active=True).exclude(id__in=existing_employee_ids)
-        self.fields["employee"].queryset = queryset
-        if not queryset.exists():
-            self.fields["employee"].empty_label = "Tidak ada pegawai tersedia"
+        self.fields["employee"].queryset = school.employees.filter(is_active=True).exclude(
+            id__in=existing_employee_ids
+        )
+        self.fields["employee"].error_messages["invalid_choice"] = (
+            "Pegawai tidak tersedia (non aktif atau sudah ada di periode ini)."
+        )
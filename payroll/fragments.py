@@ -0,0 +1,100 @@
+"""Cache fragmen HTML tabel gaji di halaman detail periode.
+
+Dua tingkat: seluruh isi tabel (kunci: status periode, ``updated_at`` periode,
+``updated_at`` entry terakhir, dan jumlah entry) dan per baris entry (kunci:
+``updated_at`` entry dan status periode). Perubahan satu entry hanya membuat baris
+itu dirender ulang; baris lain diambil dengan satu ``get_many``. Saat tabel masih
+cocok, entry tidak di-query sama sekali. Rename pegawai (nama tampil di baris dan
+menentukan urutan) menaikkan versi tabel sekolah lewat ``bump_fragment_version``.
+
+Fragmen tidak memuat token CSRF atau data per user sehingga aman dipakai bersama.
+"""
+from __future__ import annotations
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .metrics import CACHE_REQUESTS_TOTAL, record_cache
+from .models import PayrollPeriod
+from .versioning import bump_version, current_version
+
+# Naikkan bila markup _period_entry_row.html berubah agar fragmen lama tidak dipakai.
+_TEMPLATE_REVISION = 1
+
+
+def _timeout() -> int:
+    return getattr(settings, "PAYROLL_FRAGMENT_CACHE_TIMEOUT", 86400)
+
+
+def fragment_version(school_id: int) -> int:
+    return current_version(f"payroll:fragment-version:{school_id}")
+
+
+def bump_fragment_version(school_id: int) -> None:
+    bump_version(f"payroll:fragment-version:{school_id}")
+
+
+def _row_key(entry, status: str) -> str:
+    # Nama pegawai ikut di kunci baris: rename hanya merender ulang baris pegawai itu.
+    name = hashlib.sha1(entry.employee.full_name.encode()).hexdigest()[:12]
+    return f"payroll:fragment:{_TEMPLATE_REVISION}:period-row:{entry.pk}:{entry.updated_at.timestamp()}:{status}:{name}"
+
+
+def period_table_key(period: PayrollPeriod, state: dict, version: int) -> str:
+    digest = hashlib.sha1(
+        ":".join(
+            [
+                state["updated_at"].isoformat(),
+                state["last_entry"].isoformat() if state["last_entry"] else "",
+                str(state["entry_count"]),
+                state["status"],
+            ]
+        ).encode()
+    ).hexdigest()
+    return f"payroll:fragment:{_TEMPLATE_REVISION}:{period.school_id}:{version}:period-table:{period.pk}:{digest}"
+
+
+def period_entry_rows(period: PayrollPeriod, state: dict, version: int) -> str:
+    """HTML baris ``<tr>`` tabel entry periode, dari cache bila tersedia.
+
+    ``state`` adalah hasil query validator di ``period_detail`` (``updated_at``,
+    ``status``, ``last_entry``, ``entry_count``) sehingga cek tabel tidak butuh query.
+    """
+    table_key = period_table_key(period, state, version)
+    html = cache.get(table_key)
+    record_cache("period_table", html is not None)
+    if html is not None:
+        return mark_safe(html)
+
+    entries = list(
+        period.entries.select_related("employee").only(
+            "id",
+            "period_id",
+            "updated_at",
+            "total_earnings",
+            "total_deductions",
+            "net_pay",
+            "employee__full_name",
+        )
+    )
+    keys = [_row_key(entry, period.status) for entry in entries]
+    cached = cache.get_many(keys)
+    template = get_template("payroll/_period_entry_row.html")
+    rows = []
+    fresh = {}
+    for key, entry in zip(keys, entries):
+        row = cached.get(key)
+        if row is None:
+            row = fresh[key] = template.render({"period": period, "entry": entry})
+        rows.append(row)
+    CACHE_REQUESTS_TOTAL.inc(len(cached), cache="period_row", result="hit")
+    CACHE_REQUESTS_TOTAL.inc(len(fresh), cache="period_row", result="miss")
+    if fresh:
+        cache.set_many(fresh, timeout=_timeout())
+    html = "".join(rows)
+    cache.set(table_key, html, timeout=_timeout())
+    return mark_safe(html)
@@ -0,0 +1,131 @@
+"""Verifikasi total ``PayrollEntry`` terhadap item-itemnya (``verify_integrity``).
+
+Total tersimpan bisa menyimpang dari item bila item diubah lewat inline admin atau
+``UPDATE`` mentah. Pemeriksaan dilakukan database: satu query agregat ber-GROUP BY
+per periode yang hanya mengembalikan entry menyimpang (``HAVING``), sehingga entry
+yang benar tidak pernah dimuat ke Python. Periode diperiksa paralel oleh beberapa
+thread, masing-masing dengan koneksi database sendiri. Perbaikan dilakukan sesudahnya
+di thread pemanggil lewat ``refresh_entry_totals`` (kernel sen) per potongan entry,
+agar penulisan tidak saling berebut kunci.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Abs, Coalesce
+from django.utils import timezone
+
+from .models import PayrollComponent, PayrollEntry, PayrollPeriod
+from .portal import bump_portal_version
+from .rollups import refresh_rollups
+from .services import refresh_entry_totals
+
+# Selisih di bawah setengah sen dianggap sama (SQLite menjumlahkan desimal sebagai float).
+_TOLERANCE = Decimal("0.005")
+_CENT = Decimal("0.01")
+_REPAIR_CHUNK = 500
+_CHECK_CHUNK = 20
+
+
+def _item_sum(component_type: str):
+    return Coalesce(
+        Sum("items__amount", filter=Q(items__component_type=component_type)),
+        Value(Decimal("0")),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def period_drift(period_id: int) -> list[dict]:
+    """Entry periode yang totalnya tidak sama dengan jumlah item; satu query agregat."""
+    rows = list(
+        PayrollEntry.objects.filter(period_id=period_id)
+        .values("id", "total_earnings", "total_deductions", "net_pay")
+        .annotate(
+            item_earnings=_item_sum(PayrollComponent.TYPE_EARNING),
+            item_deductions=_item_sum(PayrollComponent.TYPE_DEDUCTION),
+        )
+        .alias(
+            earnings_diff=Abs(F("total_earnings") - F("item_earnings")),
+            deductions_diff=Abs(F("total_deductions") - F("item_deductions")),
+            net_diff=Abs(F("net_pay") - F("item_earnings") + F("item_deductions")),
+        )
+        .filter(Q(earnings_diff__gte=_TOLERANCE) | Q(deductions_diff__gte=_TOLERANCE) | Q(net_diff__gte=_TOLERANCE))
+        .order_by("id")
+    )
+    for row in rows:
+        row["item_earnings"] = row["item_earnings"].quantize(_CENT)
+        row["item_deductions"] = row["item_deductions"].quantize(_CENT)
+    return rows
+
+
+def _check_periods(period_ids: list[int]) -> list[tuple[int, list[dict]]]:
+    try:
+        return [(period_id, period_drift(period_id)) for period_id in period_ids]
+    finally:
+        # Thread pool tidak melewati siklus request, jadi koneksi thread ini ditutup sendiri.
+        connections.close_all()
+
+
+def verify_integrity(
+    periods,
+    *,
+    workers: int = 4,
+    repair: bool = False,
+    progress=None,
+) -> dict:
+    """Periksa (dan opsional perbaiki) seluruh entry pada queryset periode.
+
+    Mengembalikan ringkasan: jumlah periode & entry yang diperiksa, daftar entry
+    menyimpang (dengan ``school_id`` dan ``period_id``), serta jumlah yang diperbaiki.
+    ``progress(period_id, drift)`` dipanggil setiap satu periode selesai diperiksa.
+    """
+    scope = {
+        row["id"]: row
+        for row in periods.order_by("school_id", "year", "month").values("id", "school_id", "status")
+    }
+    summary = {
+        "periods": len(scope),
+        "entries": PayrollEntry.objects.filter(period__in=periods).count(),
+        "drift": [],
+        "repaired": 0,
+    }
+    if workers > 1:
+        period_ids = list(scope)
+        # Beberapa periode per tugas agar tiap thread tidak membuka koneksi baru untuk setiap periode.
+        chunks = [period_ids[start : start + _CHECK_CHUNK] for start in range(0, len(period_ids), _CHECK_CHUNK)]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="payroll-verify") as executor:
+            for results in executor.map(_check_periods, chunks):
+                for period_id, drift in results:
+                    _collect(summary, scope[period_id], drift, progress)
+    else:
+        for period_id in scope:
+            _collect(summary, scope[period_id], period_drift(period_id), progress)
+
+    if repair and summary["drift"]:
+        summary["repaired"] = _repair(summary["drift"])
+    return summary
+
+
+def _collect(summary: dict, period: dict, drift: list[dict], progress) -> None:
+    for row in drift:
+        row.update(period_id=period["id"], school_id=period["school_id"], period_status=period["status"])
+    summary["drift"].extend(drift)
+    if progress is not None:
+        progress(period["id"], drift)
+
+
+def _repair(drift: list[dict]) -> int:
+    entry_ids = [row["id"] for row in drift]
+    repaired = 0
+    for start in range(0, len(entry_ids), _REPAIR_CHUNK):
+        repaired += refresh_entry_totals(PayrollEntry.objects.filter(id__in=entry_ids[start : start + _REPAIR_CHUNK]))
+    # Rollup periode final hanya dihitung ulang bila ``updated_at`` periode berubah.
+    PayrollPeriod.objects.filter(pk__in={row["period_id"] for row in drift}).update(updated_at=timezone.now())
+    # Slip periode final di cache portal memuat total lama.
+    for school_id in {row["school_id"] for row in drift if row["period_status"] == PayrollPeriod.STATUS_FINAL}:
+        bump_portal_version(school_id)
+    refresh_rollups(sorted({row["school_id"] for row in drift}))
+    return repaired
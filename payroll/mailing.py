@@ -0,0 +1,278 @@
+"""Pengiriman slip gaji periode final lewat email.
+
+Baris ``SlipDelivery`` per entry diklaim batch demi batch (status ``sending`` dengan
+token run) sehingga dua pengiriman bersamaan tidak mengirim slip yang sama dua kali.
+Setiap batch dikerjakan oleh ``workers`` thread: masing-masing merender PDF dan
+memakai satu koneksi email (SMTP) yang dibuka sekali untuk banyak pesan. Hasil per
+pegawai disimpan setelah setiap batch, lalu pengiriman berhenti sejenak (``pause``)
+agar server SMTP tidak dibanjiri. Slip yang sudah terkirim tidak dikirim ulang;
+menjalankan ulang hanya mengirim yang gagal atau belum sempat dikirim.
+
+Halaman web hanya memasukkan slip ke antrean (``queue_period_slips``); cron
+``send_slips --queued`` yang mengirimnya, agar worker web tidak tertahan selama
+pengiriman berlangsung. Membatalkan finalisasi menghapus status pengiriman periode
+sehingga slip hasil koreksi dikirim lagi setelah periode difinalisasi ulang.
+
+Thread worker tidak menyentuh ORM: seluruh data slip disiapkan di thread pemanggil.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .exports import render_slip_pdf, slip_data
+from .models import PayrollEntry, PayrollPeriod, SlipDelivery
+
+logger = logging.getLogger(__name__)
+
+_MAX_ERROR_LENGTH = 500
+
+
+class SlipMailingError(Exception):
+    """Periode tidak dapat dikirimi slip (misalnya belum final)."""
+
+
+def sync_deliveries(period: PayrollPeriod) -> None:
+    """Buat baris ``SlipDelivery`` untuk entry final yang belum punya."""
+    missing = period.entries.filter(status=PayrollEntry.STATUS_FINAL, delivery__isnull=True).values_list(
+        "pk", flat=True
+    )
+    SlipDelivery.objects.bulk_create([SlipDelivery(entry_id=pk) for pk in missing], ignore_conflicts=True)
+
+
+def queue_period_slips(period: PayrollPeriod) -> int:
+    """Tandai slip yang belum terkirim/gagal sebagai ``pending``; kembalikan jumlah antrean.
+
+    Pengiriman sebenarnya dijalankan ``send_slips --queued`` (cron) di luar request web,
+    karena satu periode bisa memakan banyak batch SMTP dan jeda antar batch.
+    """
+    if period.status != PayrollPeriod.STATUS_FINAL:
+        raise SlipMailingError("Slip hanya dapat dikirim untuk periode final.")
+    sync_deliveries(period)
+    deliveries = SlipDelivery.objects.filter(entry__period=period)
+    deliveries.filter(status=SlipDelivery.STATUS_FAILED).update(status=SlipDelivery.STATUS_PENDING)
+    return deliveries.filter(status=SlipDelivery.STATUS_PENDING).count()
+
+
+def queued_periods():
+    """Periode final yang masih punya slip menunggu (atau klaim ``sending`` yang bisa kedaluwarsa)."""
+    return PayrollPeriod.objects.filter(
+        status=PayrollPeriod.STATUS_FINAL,
+        entries__delivery__status__in=[SlipDelivery.STATUS_PENDING, SlipDelivery.STATUS_SENDING],
+    ).distinct().order_by("pk")
+
+
+def delivery_counts(period: PayrollPeriod) -> dict[str, int]:
+    counts = {status: 0 for status, _ in SlipDelivery.STATUS_CHOICES}
+    rows = SlipDelivery.objects.filter(entry__period=period).values("status").order_by().annotate(total=Count("id"))
+    for row in rows:
+        counts[row["status"]] = row["total"]
+    return counts
+
+
+def _claim_batch(
+    period: PayrollPeriod, after_id: int, size: int, lease: timedelta
+) -> tuple[list[SlipDelivery], int] | None:
+    now = timezone.now()
+    claimable = Q(status__in=[SlipDelivery.STATUS_PENDING, SlipDelivery.STATUS_FAILED]) | Q(
+        status=SlipDelivery.STATUS_SENDING, claimed_at__lt=now - lease
+    )
+    candidates = list(
+        SlipDelivery.objects.filter(claimable, entry__period=period, pk__gt=after_id)
+        .order_by("pk")
+        .values_list("pk", flat=True)[:size]
+    )
+    if not candidates:
+        return None
+    token = uuid.uuid4().hex
+    # Filter diulang di UPDATE: baris yang keburu diklaim run lain tidak ikut terambil.
+    SlipDelivery.objects.filter(claimable, pk__in=candidates).update(
+        status=SlipDelivery.STATUS_SENDING, claim=token, claimed_at=now
+    )
+    claimed = list(
+        SlipDelivery.objects.filter(claim=token, status=SlipDelivery.STATUS_SENDING)
+        .select_related("entry__period__school", "entry__employee")
+        .prefetch_related("entry__items")
+        .order_by("pk")
+    )
+    # Kursor maju melewati seluruh kandidat, termasuk yang diambil run lain.
+    return claimed, candidates[-1]
+
+
+def _job(delivery: SlipDelivery, from_email: str) -> dict:
+    entry = delivery.entry
+    period = entry.period
+    context = {"entry": entry, "employee": entry.employee, "period": period, "school": period.school}
+    return {
+        "delivery_id": delivery.pk,
+        "to": entry.employee.email,
+        "from_email": from_email,
+        "subject": f"Slip gaji {period.label} - {period.school.name}",
+        "body": render_to_string("payroll/slip_email.txt", context),
+        "filename": f"slip-{period.year}-{period.month:02d}.pdf",
+        "data": slip_data(entry, list(entry.items.all())),
+    }
+
+
+def _open_connection():
+    connection = get_connection(fail_silently=False)
+    connection.open()
+    return connection
+
+
+def _close_connection(connection) -> None:
+    try:
+        connection.close()
+    except OSError:
+        logger.warning("Gagal menutup koneksi email.", exc_info=True)
+
+
+def _send_worker(jobs: queue.Queue, results: list, results_lock: threading.Lock) -> None:
+    """Ambil pekerjaan dari antrean sampai menerima ``None``; satu koneksi email per worker."""
+    connection = None
+    try:
+        while True:
+            job = jobs.get()
+            try:
+                if job is None:
+                    return
+                error = ""
+                try:
+                    if not job["to"]:
+                        raise ValueError("Pegawai tidak memiliki alamat email.")
+                    message = EmailMessage(job["subject"], job["body"], job["from_email"], [job["to"]])
+                    message.attach(job["filename"], render_slip_pdf(job["data"]), "application/pdf")
+                    for retry in (False, True):
+                        if connection is None:
+                            connection = _open_connection()
+                        message.connection = connection
+                        try:
+                            message.send()
+                            break
+                        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                            # Ditolak server; koneksi masih bisa dipakai untuk pesan lain.
+                            raise
+                        except OSError:
+                            # Koneksi putus (mis. batas pesan per koneksi): buka ulang dan coba sekali lagi.
+                            _close_connection(connection)
+                            connection = None
+                            if retry:
+                                raise
+                except Exception as exc:  # noqa: BLE001 - satu slip gagal tidak boleh menghentikan worker
+                    error = str(exc) or exc.__class__.__name__
+                with results_lock:
+                    results.append((job["delivery_id"], error[:_MAX_ERROR_LENGTH]))
+            finally:
+                jobs.task_done()
+    finally:
+        if connection is not None:
+            _close_connection(connection)
+
+
+def _save_results(deliveries: dict[int, SlipDelivery], results: list[tuple[int, str]]) -> tuple[int, int]:
+    now = timezone.now()
+    sent = failed = 0
+    for delivery_id, error in results:
+        delivery = deliveries[delivery_id]
+        delivery.attempts = F("attempts") + 1
+        delivery.claim = ""
+        delivery.email = delivery.entry.employee.email
+        delivery.last_error = error
+        delivery.updated_at = now
+        if error:
+            delivery.status = SlipDelivery.STATUS_FAILED
+            failed += 1
+        else:
+            delivery.status = SlipDelivery.STATUS_SENT
+            delivery.sent_at = now
+            sent += 1
+    SlipDelivery.objects.bulk_update(
+        [deliveries[delivery_id] for delivery_id, _ in results],
+        ["attempts", "claim", "email", "last_error", "status", "sent_at", "updated_at"],
+    )
+    return sent, failed
+
+
+def send_period_slips(
+    period: PayrollPeriod,
+    *,
+    workers: int | None = None,
+    batch_size: int | None = None,
+    pause: float | None = None,
+    progress=None,
+) -> dict:
+    """Kirim slip periode final yang belum terkirim; kembalikan ringkasan run.
+
+    ``progress(summary)`` (opsional) dipanggil setelah setiap batch tersimpan.
+    """
+    if period.status != PayrollPeriod.STATUS_FINAL:
+        raise SlipMailingError("Slip hanya dapat dikirim untuk periode final.")
+    workers = max(1, workers or getattr(settings, "PAYROLL_SLIP_EMAIL_WORKERS", 4))
+    batch_size = max(1, batch_size or getattr(settings, "PAYROLL_SLIP_EMAIL_BATCH_SIZE", 50))
+    pause = getattr(settings, "PAYROLL_SLIP_EMAIL_PAUSE", 1.0) if pause is None else pause
+    lease = timedelta(seconds=getattr(settings, "PAYROLL_SLIP_EMAIL_LEASE", 900))
+    from_email = getattr(settings, "PAYROLL_SLIP_FROM_EMAIL", None) or settings.DEFAULT_FROM_EMAIL
+
+    sync_deliveries(period)
+    summary = {"sent": 0, "failed": 0, "batches": 0, "elapsed": 0.0, "rate": 0.0}
+    jobs: queue.Queue = queue.Queue()
+    results: list[tuple[int, str]] = []
+    results_lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=_send_worker, args=(jobs, results, results_lock), name=f"payroll-mail-{index}", daemon=True
+        )
+        for index in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    cursor = 0
+    try:
+        while True:
+            batch = _claim_batch(period, cursor, batch_size, lease)
+            if batch is None:
+                break
+            deliveries, cursor = batch
+            if deliveries:
+                if summary["batches"] and pause:
+                    time.sleep(pause)
+                by_id = {delivery.pk: delivery for delivery in deliveries}
+                for delivery in deliveries:
+                    jobs.put(_job(delivery, from_email))
+                jobs.join()
+                with results_lock:
+                    batch_results, results[:] = list(results), []
+                sent, failed = _save_results(by_id, batch_results)
+                summary["sent"] += sent
+                summary["failed"] += failed
+                summary["batches"] += 1
+                if progress is not None:
+                    progress(summary)
+    finally:
+        for _ in threads:
+            jobs.put(None)
+        for thread in threads:
+            thread.join()
+        summary["elapsed"] = time.perf_counter() - start
+        if summary["elapsed"]:
+            summary["rate"] = summary["sent"] / summary["elapsed"]
+    logger.info(
+        "Slip periode %s: %s terkirim, %s gagal, %.1f pesan/detik.",
+        period.pk,
+        summary["sent"],
+        summary["failed"],
+        summary["rate"],
+    )
+    return summary
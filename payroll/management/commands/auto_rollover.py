@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from payroll.rollover import RolloverBusyError, in_window, next_month, parse_window, run_rollover
+
+
+class Command(BaseCommand):
+    help = (
+        "Buat dan generate draft periode bulan depan untuk sekolah aktif yang mengaktifkan rollover, memakai "
+        "metode rollover masing-masing sekolah. Jadwalkan lewat cron di jam sepi; hanya berjalan di dalam jendela "
+        "PAYROLL_ROLLOVER_WINDOW dan melanjutkan dari sekolah terakhir bila run sebelumnya terputus."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", help="Bulan target YYYY-MM (default: bulan depan).")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=getattr(settings, "PAYROLL_ROLLOVER_BATCH_SIZE", 10),
+            help="Jumlah sekolah per batch.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=getattr(settings, "PAYROLL_ROLLOVER_PAUSE", 2.0),
+            help="Jeda (detik) antar batch.",
+        )
+        parser.add_argument(
+            "--window",
+            default=getattr(settings, "PAYROLL_ROLLOVER_WINDOW", "22:00-05:00"),
+            help="Jendela off-peak HH:MM-HH:MM menurut TIME_ZONE.",
+        )
+        parser.add_argument("--force", action="store_true", help="Abaikan jendela off-peak.")
+        parser.add_argument("--restart", action="store_true", help="Ulangi dari awal (reset progres bulan target).")
+
+    def handle(self, *args, **options):
+        if options["month"]:
+            try:
+                year, month = (int(part) for part in options["month"].split("-", 1))
+            except ValueError as exc:
+                raise CommandError("Format --month harus YYYY-MM.") from exc
+            if not 1 <= month <= 12:
+                raise CommandError("Bulan harus 1-12.")
+        else:
+            year, month = next_month(timezone.localdate())
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size minimal 1.")
+        try:
+            window = parse_window(options["window"])
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        if options["force"]:
+            should_continue = lambda: True  # noqa: E731
+        else:
+            if not in_window(window):
+                self.stdout.write(f"Di luar jendela off-peak ({options['window']}); tidak ada yang diproses.")
+                return
+            should_continue = lambda: in_window(window)  # noqa: E731
+
+        try:
+            run = run_rollover(
+                year=year,
+                month=month,
+                batch_size=options["batch_size"],
+                pause=options["pause"],
+                lease=timedelta(seconds=getattr(settings, "PAYROLL_ROLLOVER_LEASE", 1800)),
+                should_continue=should_continue,
+                restart=options["restart"],
+            )
+        except RolloverBusyError as exc:
+            raise CommandError(str(exc)) from exc
+
+        summary = (
+            f"{run.created_count} periode dibuat, {run.generated_count} digenerate, "
+            f"{run.skipped_count} dilewati, {run.failed_count} gagal"
+        )
+        if run.finished_at:
+            self.stdout.write(self.style.SUCCESS(f"Rollover {month:02d}/{year} selesai: {summary}."))
+        else:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Rollover {month:02d}/{year} dihentikan (jendela habis) setelah sekolah ID "
+                    f"{run.last_school_id}: {summary}. Jalankan ulang untuk melanjutkan."
+                )
+            )
+        for error in run.errors:
+            self.stderr.write(f"Sekolah {error['school']}: {error['message']}")
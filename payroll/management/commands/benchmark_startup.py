@@ -0,0 +1,58 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+HEAVY_MODULES = ("reportlab", "openpyxl")
+
+# Boot worker seperti server WSGI: muat aplikasi lalu URLconf (yang mengimpor views).
+WORKER_SCRIPT = """
+import json, os, sys
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "payroll_site.settings")
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+print(json.dumps([name for name in {heavy!r} if name in sys.modules]))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Ukur waktu boot worker dan latensi perintah manage.py di proses baru, "
+        "serta library berat yang ikut termuat saat start."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=10, help="Jumlah proses per skenario.")
+        parser.add_argument(
+            "--command", default="check", help="Perintah manage.py yang diukur (default: check)."
+        )
+
+    def handle(self, *args, **options):
+        worker = [sys.executable, "-c", WORKER_SCRIPT.format(heavy=HEAVY_MODULES)]
+        manage = [sys.executable, "manage.py", *options["command"].split()]
+        timings = {"worker_boot": [], f"manage.py {options['command']}": []}
+        loaded = []
+        for _ in range(options["repeat"]):
+            elapsed, output = self._run(worker)
+            timings["worker_boot"].append(elapsed)
+            loaded = json.loads(output.strip().splitlines()[-1])
+            elapsed, _ = self._run(manage)
+            timings[f"manage.py {options['command']}"].append(elapsed)
+
+        for name, values in timings.items():
+            self.stdout.write(
+                f"{name:<28} median {statistics.median(values) * 1000:8.1f} ms   "
+                f"min {min(values) * 1000:8.1f} ms   (n={len(values)})"
+            )
+        self.stdout.write(f"Library berat termuat saat boot: {', '.join(loaded) or '-'}")
+
+    def _run(self, command):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True)
+        return time.perf_counter() - start, result.stdout
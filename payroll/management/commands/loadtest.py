@@ -0,0 +1,279 @@
+import json
+import math
+import random
+import subprocess
+import sys
+import threading
+import time
+from html.parser import HTMLParser
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from payroll.models import PayrollPeriod, User
+
+DEFAULT_MIX = "dashboard=40,period_detail=25,pdf=25,item_edit=8,generate=2"
+ROUTES = ("dashboard", "period_detail", "pdf", "item_edit", "generate")
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class _FirstFormParser(HTMLParser):
+    """Kumpulkan input form pertama tanpa atribut action (formset item di detail gaji)."""
+
+    def __init__(self):
+        super().__init__()
+        self.fields = []
+        self._state = "before"
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form" and self._state == "before" and "action" not in attrs:
+            self._state = "inside"
+        elif tag == "input" and self._state == "inside" and attrs.get("name"):
+            self.fields.append((attrs["name"], attrs.get("value") or ""))
+
+    def handle_endtag(self, tag):
+        if tag == "form" and self._state == "inside":
+            self._state = "done"
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return round(ordered[index] * 1000, 2)
+
+
+def _parse_mix(raw):
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            raise CommandError(f"Rute tidak dikenal di --mix: {name}. Pilihan: {', '.join(ROUTES)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError as exc:
+            raise CommandError(f"Bobot tidak valid untuk {name}.") from exc
+    if not any(weight > 0 for weight in mix.values()):
+        raise CommandError("Minimal satu rute harus memiliki bobot > 0.")
+    return mix
+
+
+class _VirtualUser:
+    def __init__(self, base_url, username, password, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), _NoRedirect)
+        self.username = username
+        self.password = password
+
+    def _csrf(self):
+        for cookie in self.cookies:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        return ""
+
+    def request(self, path, data=None):
+        """Kembalikan (status, body). Redirect (3xx) dianggap sukses dan tidak diikuti."""
+        url = self.base_url + path
+        payload = None
+        headers = {"Referer": url}
+        if data is not None:
+            payload = urlencode(data).encode()
+            headers["X-CSRFToken"] = self._csrf()
+        request = Request(url, data=payload, headers=headers)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except HTTPError as exc:
+            return exc.code, exc.read()
+
+    def login(self):
+        login_path = reverse("login")
+        self.request(login_path)
+        status, _ = self.request(
+            login_path,
+            {"username": self.username, "password": self.password, "csrfmiddlewaretoken": self._csrf()},
+        )
+        if status != 302:
+            raise CommandError(f"Login gagal untuk {self.username} (status {status}).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Uji beban HTTP terhadap server lokal dengan campuran lalu lintas hari gajian/akhir bulan. "
+        "Menghasilkan laporan JSON berisi latensi p50/p95/p99, throughput, dan tingkat error."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--start-server", action="store_true", help="Jalankan runserver lokal selama uji.")
+        parser.add_argument("--username", required=True, help="Akun admin sekolah untuk login.")
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--period", type=int, help="ID periode draft target (default: draft terbaru).")
+        parser.add_argument("--concurrency", type=int, default=10, help="Jumlah pengguna virtual.")
+        parser.add_argument("--duration", type=float, default=30.0, help="Lama uji dalam detik.")
+        parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Bobot per rute, default: {DEFAULT_MIX}")
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="Simpan laporan JSON ke file (default: stdout).")
+
+    def handle(self, *args, **options):
+        mix = _parse_mix(options["mix"])
+        user = User.objects.filter(username=options["username"]).select_related("school").first()
+        if user is None or not user.school:
+            raise CommandError("User tidak ditemukan atau tidak terhubung ke sekolah.")
+        periods = PayrollPeriod.objects.filter(school=user.school)
+        if options["period"]:
+            period = periods.filter(pk=options["period"]).first()
+        else:
+            period = periods.filter(status=PayrollPeriod.STATUS_DRAFT).order_by("-year", "-month").first()
+        if period is None:
+            raise CommandError("Periode target tidak ditemukan.")
+        entry_ids = list(period.entries.values_list("pk", flat=True))
+        if not entry_ids and any(mix.get(name) for name in ("pdf", "item_edit")):
+            raise CommandError("Periode target belum memiliki entry; generate terlebih dahulu.")
+        if period.status != PayrollPeriod.STATUS_DRAFT and any(mix.get(name) for name in ("generate", "item_edit")):
+            raise CommandError("Rute generate/item_edit butuh periode draft.")
+
+        server = None
+        if options["start_server"]:
+            server = self._start_server(options["base_url"])
+        try:
+            report = self._run(options, mix, period, entry_ids)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                handle.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Laporan disimpan ke {options['output']}."))
+        else:
+            self.stdout.write(output)
+
+    def _start_server(self, base_url):
+        address = base_url.split("://", 1)[-1].rstrip("/")
+        process = subprocess.Popen(
+            [sys.executable, "manage.py", "runserver", "--noreload", address],
+            cwd=settings.BASE_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        probe = _VirtualUser(base_url, "", "", timeout=1)
+        for _ in range(100):
+            try:
+                probe.request(reverse("login"))
+                return process
+            except (URLError, ConnectionError, OSError):
+                time.sleep(0.1)
+        process.terminate()
+        raise CommandError("Server lokal tidak dapat dijalankan.")
+
+    def _target(self, route, rng, period, entry_ids):
+        entry_id = rng.choice(entry_ids) if entry_ids else None
+        if route == "dashboard":
+            return reverse("dashboard")
+        if route == "period_detail":
+            return reverse("period_detail", args=[period.pk])
+        if route == "pdf":
+            return reverse("payroll_entry_pdf", args=[period.pk, entry_id])
+        if route == "generate":
+            return reverse("period_generate", args=[period.pk])
+        return reverse("payroll_entry_detail", args=[period.pk, entry_id])
+
+    def _hit(self, client, route, path):
+        if route == "generate":
+            return client.request(path, {"method": "manual", "csrfmiddlewaretoken": client._csrf()})
+        if route == "item_edit":
+            status, body = client.request(path)
+            if status != 200:
+                return status, body
+            parser = _FirstFormParser()
+            parser.feed(body.decode("utf-8", "replace"))
+            return client.request(path, parser.fields)
+        return client.request(path)
+
+    def _run(self, options, mix, period, entry_ids):
+        routes = [name for name, weight in mix.items() if weight > 0]
+        weights = [mix[name] for name in routes]
+        samples = {name: [] for name in routes}
+        errors = {name: 0 for name in routes}
+        locked = {name: 0 for name in routes}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options["duration"]
+
+        def worker(index):
+            rng = random.Random(options["seed"] + index)
+            client = _VirtualUser(options["base_url"], options["username"], options["password"], options["timeout"])
+            client.login()
+            while time.perf_counter() < deadline:
+                route = rng.choices(routes, weights)[0]
+                path = self._target(route, rng, period, entry_ids)
+                started = time.perf_counter()
+                try:
+                    status, body = self._hit(client, route, path)
+                except (URLError, ConnectionError, OSError, TimeoutError):
+                    status, body = 0, b""
+                elapsed = time.perf_counter() - started
+                with lock:
+                    samples[route].append(elapsed)
+                    if status == 0 or status >= 400:
+                        errors[route] += 1
+                    if b"database is locked" in body or b"database table is locked" in body:
+                        locked[route] += 1
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(options["concurrency"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        def summary(values, error_count, locked_count):
+            count = len(values)
+            return {
+                "requests": count,
+                "errors": error_count,
+                "error_rate": round(error_count / count, 4) if count else 0.0,
+                "sqlite_locked": locked_count,
+                "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+                "latency_ms": {
+                    "mean": round(sum(values) / count * 1000, 2) if count else None,
+                    "p50": _percentile(values, 50),
+                    "p95": _percentile(values, 95),
+                    "p99": _percentile(values, 99),
+                    "max": round(max(values) * 1000, 2) if count else None,
+                },
+            }
+
+        all_values = [value for values in samples.values() for value in values]
+        return {
+            "config": {
+                "base_url": options["base_url"],
+                "concurrency": options["concurrency"],
+                "duration_s": options["duration"],
+                "mix": mix,
+                "period_id": period.pk,
+                "entries": len(entry_ids),
+                "seed": options["seed"],
+            },
+            "elapsed_s": round(elapsed, 3),
+            "overall": summary(all_values, sum(errors.values()), sum(locked.values())),
+            "routes": {name: summary(samples[name], errors[name], locked[name]) for name in routes},
+        }
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.models import PayrollPeriod
+from payroll.portal import precompute_period
+
+
+class Command(BaseCommand):
+    help = "Render slip gaji periode final ke cache portal pegawai sebelum hari gajian."
+
+    def add_arguments(self, parser):
+        parser.add_argument("period_ids", nargs="+", type=int, help="ID periode final.")
+
+    def handle(self, *args, **options):
+        for period_id in options["period_ids"]:
+            period = PayrollPeriod.objects.filter(pk=period_id).first()
+            if period is None:
+                raise CommandError(f"Periode {period_id} tidak ditemukan.")
+            if period.status != PayrollPeriod.STATUS_FINAL:
+                raise CommandError(f"Periode {period} belum final.")
+            count = precompute_period(period)
+            self.stdout.write(self.style.SUCCESS(f"{count} slip periode {period} disimpan ke cache."))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from payroll.models import PayrollPeriod
+from payroll.profiling import profile_call
+from payroll.services import PayrollGenerationError, generate_payroll
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Profil generate_payroll untuk satu periode. Perubahan dibatalkan kecuali --commit."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--period", type=int, required=True, help="ID periode.")
+        parser.add_argument("--method", choices=["manual", "copy"], default="manual")
+        parser.add_argument("--source-period", type=int, help="ID periode sumber untuk metode copy.")
+        parser.add_argument("--commit", action="store_true", help="Simpan hasil generate.")
+
+    def handle(self, *args, **options):
+        period = PayrollPeriod.objects.select_related("school").filter(pk=options["period"]).first()
+        if period is None:
+            raise CommandError("Periode tidak ditemukan.")
+        source_period = None
+        if options["source_period"]:
+            source_period = PayrollPeriod.objects.filter(pk=options["source_period"], school=period.school).first()
+
+        def run():
+            generate_payroll(
+                period=period,
+                method=options["method"],
+                school=period.school,
+                user=None,
+                source_period=source_period,
+            )
+
+        try:
+            with transaction.atomic():
+                _, path = profile_call(f"generate_payroll {period} {options['method']}", run)
+                if not options["commit"]:
+                    raise _Rollback
+        except _Rollback:
+            pass
+        except PayrollGenerationError as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(self.style.SUCCESS(f"Profil disimpan: {path}"))
+        self.stdout.write(path.with_suffix(".txt").read_text(encoding="utf-8"))
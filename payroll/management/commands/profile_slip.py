@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.exports import render_slip_pdf, slip_data
+from payroll.models import PayrollEntry
+from payroll.profiling import profile_call
+
+
+class Command(BaseCommand):
+    help = "Profil render slip PDF (ReportLab) untuk satu entry gaji."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entry", type=int, required=True, help="ID entry gaji.")
+        parser.add_argument("--repeat", type=int, default=20, help="Jumlah render agar hot spot terlihat.")
+
+    def handle(self, *args, **options):
+        entry = (
+            PayrollEntry.objects.select_related("period", "employee")
+            .prefetch_related("items")
+            .filter(pk=options["entry"])
+            .first()
+        )
+        if entry is None:
+            raise CommandError("Entry tidak ditemukan.")
+        data = slip_data(entry, list(entry.items.all()))
+        render_slip_pdf(data)  # pemanasan: muat backend PDF di luar profil
+
+        def run():
+            for _ in range(options["repeat"]):
+                render_slip_pdf(data)
+
+        _, path = profile_call(f"render_slip_pdf entry {entry.pk} x{options['repeat']}", run)
+        self.stdout.write(self.style.SUCCESS(f"Profil disimpan: {path}"))
+        self.stdout.write(path.with_suffix(".txt").read_text(encoding="utf-8"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from payroll.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Perbarui rollup dashboard super admin. Jadwalkan lewat cron (misalnya tiap 10 menit); "
+        "periode final yang tidak berubah dilewati."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school", type=int, action="append", help="Batasi ke ID sekolah tertentu.")
+
+    def handle(self, *args, **options):
+        result = refresh_rollups(options["school"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Rollup diperbarui: {result['periods']} periode, {result['schools']} sekolah.")
+        )
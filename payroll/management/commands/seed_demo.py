@@ -67,6 +67,20 @@ class Command(BaseCommand):
                 },
             )
 
+        employee_user, created = User.objects.get_or_create(
+            username="ani",
+            defaults={
+                "email": "ani@sekolah.test",
+                "role": User.ROLE_EMPLOYEE,
+                "school": school,
+            },
+        )
+        if created:
+            employee_user.set_password("pegawai123")
+            employee_user.save()
+            self.stdout.write(self.style.SUCCESS("User pegawai ani/pegawai123 dibuat."))
+        Employee.objects.filter(school=school, email="ani@sekolah.test").update(user=employee_user)
+
         period, _ = PayrollPeriod.objects.get_or_create(school=school, month=1, year=2025)
         if not period.entries.exists():
             generate_payroll(period=period, method="manual", school=school, user=admin_user)
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.mailing import SlipMailingError, queued_periods, send_period_slips
+from payroll.models import PayrollPeriod, SlipDelivery
+
+
+class Command(BaseCommand):
+    help = (
+        "Kirim slip gaji periode final ke email pegawai. Slip yang sudah terkirim dilewati, "
+        "sehingga menjalankan ulang hanya mengirim yang gagal atau belum terkirim. "
+        "Dengan --queued, kirim antrean dari halaman Kirim Slip (jalankan dari cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("period_ids", nargs="*", type=int, help="ID periode final.")
+        parser.add_argument(
+            "--queued",
+            action="store_true",
+            help="Kirim semua periode final yang slipnya dimasukkan ke antrean lewat halaman web.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "PAYROLL_SLIP_EMAIL_WORKERS", 4),
+            help="Jumlah thread render & kirim (masing-masing satu koneksi SMTP).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=getattr(settings, "PAYROLL_SLIP_EMAIL_BATCH_SIZE", 50),
+            help="Jumlah slip per batch.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=getattr(settings, "PAYROLL_SLIP_EMAIL_PAUSE", 1.0),
+            help="Jeda (detik) antar batch.",
+        )
+        parser.add_argument(
+            "--resend",
+            action="store_true",
+            help="Kirim ulang juga slip yang sudah terkirim.",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--workers dan --batch-size minimal 1.")
+        if not options["period_ids"] and not options["queued"]:
+            raise CommandError("Sebutkan ID periode atau gunakan --queued.")
+        period_ids = list(options["period_ids"])
+        if options["queued"]:
+            period_ids += [pk for pk in queued_periods().values_list("pk", flat=True) if pk not in period_ids]
+        for period_id in period_ids:
+            period = PayrollPeriod.objects.filter(pk=period_id).first()
+            if period is None:
+                raise CommandError(f"Periode {period_id} tidak ditemukan.")
+            if options["resend"]:
+                SlipDelivery.objects.filter(entry__period=period, status=SlipDelivery.STATUS_SENT).update(
+                    status=SlipDelivery.STATUS_PENDING
+                )
+
+            def progress(summary, period=period):
+                self.stdout.write(
+                    f"Periode {period}: batch {summary['batches']}, {summary['sent']} terkirim, "
+                    f"{summary['failed']} gagal"
+                )
+
+            try:
+                summary = send_period_slips(
+                    period,
+                    workers=options["workers"],
+                    batch_size=options["batch_size"],
+                    pause=options["pause"],
+                    progress=progress if options["verbosity"] > 1 else None,
+                )
+            except SlipMailingError as exc:
+                raise CommandError(f"Periode {period}: {exc}") from exc
+            style = self.style.WARNING if summary["failed"] else self.style.SUCCESS
+            self.stdout.write(
+                style(
+                    f"Periode {period}: {summary['sent']} slip terkirim, {summary['failed']} gagal dalam "
+                    f"{summary['elapsed']:.1f} detik ({summary['rate']:.1f} pesan/detik)."
+                )
+            )
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.integrity import verify_integrity
+from payroll.models import PayrollPeriod
+
+
+class Command(BaseCommand):
+    help = (
+        "Periksa apakah total setiap entry gaji (pendapatan, potongan, gaji bersih) sama dengan "
+        "jumlah item-itemnya. Keluar dengan status gagal bila ada yang menyimpang, kecuali --repair."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school", type=int, action="append", help="Batasi ke ID sekolah (boleh berulang).")
+        parser.add_argument("--period", type=int, action="append", help="Batasi ke ID periode (boleh berulang).")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "PAYROLL_INTEGRITY_WORKERS", 4),
+            help="Jumlah thread pemeriksa paralel (masing-masing satu koneksi database).",
+        )
+        parser.add_argument("--repair", action="store_true", help="Hitung ulang total entry yang menyimpang.")
+        parser.add_argument("--show", type=int, default=20, help="Jumlah entry menyimpang yang ditampilkan.")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers minimal 1.")
+        periods = PayrollPeriod.objects.all()
+        if options["school"]:
+            periods = periods.filter(school_id__in=options["school"])
+        if options["period"]:
+            periods = periods.filter(pk__in=options["period"])
+
+        def progress(period_id, drift):
+            if drift:
+                self.stdout.write(f"Periode {period_id}: {len(drift)} entry menyimpang")
+
+        summary = verify_integrity(
+            periods,
+            workers=options["workers"],
+            repair=options["repair"],
+            progress=progress if options["verbosity"] > 1 else None,
+        )
+        drift = summary["drift"]
+        for row in drift[: options["show"]]:
+            self.stdout.write(
+                f"Entry {row['id']} (sekolah {row['school_id']}, periode {row['period_id']}): "
+                f"tersimpan {row['total_earnings']}/{row['total_deductions']}/{row['net_pay']}, "
+                f"dari item {row['item_earnings']}/{row['item_deductions']}/"
+                f"{row['item_earnings'] - row['item_deductions']}"
+            )
+        if len(drift) > options["show"]:
+            self.stdout.write(f"... dan {len(drift) - options['show']} entry lain.")
+        checked = f"{summary['entries']} entry di {summary['periods']} periode diperiksa"
+        if not drift:
+            self.stdout.write(self.style.SUCCESS(f"{checked}; semua total sesuai item."))
+        elif options["repair"]:
+            self.stdout.write(self.style.WARNING(f"{checked}; {summary['repaired']} entry diperbaiki."))
+        else:
+            raise CommandError(f"{checked}; {len(drift)} entry menyimpang. Jalankan dengan --repair untuk memperbaiki.")
@@ -0,0 +1,340 @@
+"""Registry metrik in-process dengan format teks Prometheus.
+
+Tidak memakai dependensi tambahan. Setiap proses menyimpan counter/histogram di
+memori; bila ``PAYROLL_METRICS_MULTIPROC_DIR`` diisi, snapshot proses ditulis
+ke direktori tersebut (``metrics-<pid>.json``) dan endpoint ``/metrics``
+menjumlahkan seluruh file sehingga angka dari semua worker ikut terlihat.
+
+Snapshot ditulis oleh thread latar tiap ``PAYROLL_METRICS_FLUSH_INTERVAL`` detik
+(dan sekali saat proses keluar), bukan di jalur request. File milik proses yang
+sudah mati dihapus saat ``/metrics`` mengumpulkan snapshot.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "Registry", name: str, documentation: str, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["buckets"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def _copy_value(value):
+    if isinstance(value, dict):
+        return {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+    return value
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill(pid, 0) di Windows mengirim CTRL_C_EVENT; anggap hidup.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self.lock = Lock()
+        self.metrics: dict[str, _Metric] = {}
+        self._flusher_pid: int | None = None
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.metrics.setdefault(name, Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(self, name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                name: [[list(key), _copy_value(value)] for key, value in metric.values.items()]
+                for name, metric in self.metrics.items()
+            }
+
+    # --- mode multiproses -------------------------------------------------
+
+    def _directory(self) -> Path | None:
+        directory = getattr(settings, "PAYROLL_METRICS_MULTIPROC_DIR", None)
+        return Path(directory) if directory else None
+
+    def start_flusher(self) -> None:
+        """Mulai thread flush latar, sekali per proses (juga di worker hasil fork)."""
+        pid = os.getpid()
+        if self._flusher_pid == pid or self._directory() is None:
+            return
+        with self.lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+        threading.Thread(target=self._flush_loop, name="payroll-metrics-flush", daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(getattr(settings, "PAYROLL_METRICS_FLUSH_INTERVAL", 5.0))
+            try:
+                self.flush()
+            except OSError:
+                logger.warning("Gagal menulis snapshot metrik.", exc_info=True)
+
+    def flush(self) -> None:
+        """Tulis snapshot proses ini ke ``metrics-<pid>.json``."""
+        directory = self._directory()
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"metrics-{os.getpid()}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _collect(self) -> dict[str, dict[tuple, object]]:
+        snapshots = [self.snapshot()]
+        directory = self._directory()
+        if directory is not None and directory.exists():
+            own = f"metrics-{os.getpid()}.json"
+            for path in directory.glob("metrics-*.json"):
+                if path.name == own:
+                    continue
+                pid = path.stem.removeprefix("metrics-")
+                if pid.isdigit() and not _pid_alive(int(pid)):
+                    path.unlink(missing_ok=True)
+                    continue
+                try:
+                    snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+                except (OSError, ValueError):
+                    continue
+        merged: dict[str, dict[tuple, object]] = {name: {} for name in self.metrics}
+        for snapshot in snapshots:
+            for name, series in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                target = merged[name]
+                for key, value in series:
+                    key = tuple(key)
+                    if metric.kind == "counter":
+                        target[key] = target.get(key, 0.0) + value
+                    else:
+                        state = target.setdefault(
+                            key, {"buckets": [0] * (len(metric.buckets) + 1), "sum": 0.0, "count": 0}
+                        )
+                        state["buckets"] = [a + b for a, b in zip(state["buckets"], value["buckets"])]
+                        state["sum"] += value["sum"]
+                        state["count"] += value["count"]
+        return merged
+
+    def render(self) -> str:
+        lines = []
+        for name, series in self._collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(series.items()):
+                if metric.kind == "counter":
+                    lines.append(f"{name}{_labels(metric.labelnames, key)} {_format(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip([*metric.buckets, "+Inf"], value["buckets"]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _format(bound)
+                    lines.append(f"{name}_bucket{_labels(metric.labelnames, key, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(metric.labelnames, key)} {_format(value['sum'])}")
+                lines.append(f"{name}_count{_labels(metric.labelnames, key)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+REQUEST_SECONDS = registry.histogram(
+    "payroll_http_request_duration_seconds", "Latensi request per nama URL.", ["view", "method"]
+)
+REQUESTS_TOTAL = registry.counter(
+    "payroll_http_requests_total", "Jumlah request per nama URL dan status.", ["view", "method", "status"]
+)
+DB_QUERIES_TOTAL = registry.counter("payroll_db_queries_total", "Jumlah query database per nama URL.", ["view"])
+DB_SECONDS_TOTAL = registry.counter("payroll_db_query_seconds_total", "Total waktu query database.", ["view"])
+PDF_RENDER_SECONDS = registry.histogram("payroll_pdf_render_seconds", "Durasi render slip PDF.")
+GENERATION_SECONDS = registry.histogram(
+    "payroll_generation_seconds", "Durasi generate payroll per metode.", ["method"]
+)
+GENERATION_PHASE_SECONDS_TOTAL = registry.counter(
+    "payroll_generation_phase_seconds_total", "Total durasi per fase generate.", ["method", "phase"]
+)
+GENERATION_ROWS_TOTAL = registry.counter(
+    "payroll_generation_rows_total", "Jumlah baris yang diproses per fase generate.", ["method", "phase"]
+)
+CACHE_REQUESTS_TOTAL = registry.counter(
+    "payroll_cache_requests_total", "Akses cache aplikasi (hit/miss).", ["cache", "result"]
+)
+
+
+def record_generation(summary: dict) -> None:
+    method = summary.get("method", "")
+    GENERATION_SECONDS.observe(summary["total_ms"] / 1000, method=method)
+    for phase, stats in summary["phases"].items():
+        GENERATION_PHASE_SECONDS_TOTAL.inc(stats["duration_ms"] / 1000, method=method, phase=phase)
+        GENERATION_ROWS_TOTAL.inc(stats["rows"], method=method, phase=phase)
+
+
+def record_cache(cache_name: str, hit: bool) -> None:
+    CACHE_REQUESTS_TOTAL.inc(cache=cache_name, result="hit" if hit else "miss")
+
+
+_request_stats: ContextVar[dict | None] = ContextVar("payroll_request_stats", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats["queries"] += 1
+        stats["seconds"] += time.perf_counter() - start
+
+
+def _install_query_counter(connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+# ContextVar ikut tersalin ke thread sync_to_async, sehingga query dari view
+# async tetap tercatat pada request yang benar.
+connection_created.connect(_install_query_counter)
+
+
+class MetricsMiddleware:
+    """Catat latensi request dan query database per nama URL (sync & async)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        if connection.connection is not None:
+            _install_query_counter(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = {"queries": 0, "seconds": 0.0}
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self._record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = {"queries": 0, "seconds": 0.0}
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self._record(request, response, time.perf_counter() - start, stats)
+        return response
+
+    def _record(self, request, response, elapsed, stats):
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match else "") or "unresolved"
+        REQUEST_SECONDS.observe(elapsed, view=view, method=request.method)
+        REQUESTS_TOTAL.inc(view=view, method=request.method, status=response.status_code)
+        DB_QUERIES_TOTAL.inc(stats["queries"], view=view)
+        DB_SECONDS_TOTAL.inc(stats["seconds"], view=view)
+        registry.start_flusher()
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.9 on 2026-10-18 23:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0002_alter_employee_unique_together_employee_nip_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeComponentOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('effective_from', models.DateField(blank=True, null=True)),
+                ('effective_until', models.DateField(blank=True, null=True)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('component', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='employee_overrides', to='payroll.payrollcomponent')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='component_overrides', to='payroll.employee')),
+            ],
+            options={
+                'ordering': ['component__name', 'effective_from'],
+                'indexes': [models.Index(fields=['employee', 'component', 'effective_from'], name='override_lookup_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-18 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0003_employeecomponentoverride'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollperiod',
+            name='generation_stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 4.2.9 on 2026-10-18 23:27
+
+from django.db import migrations, models
+
+FTS_TABLE = "payroll_employee_fts"
+
+SQLITE_FORWARD = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "full_name, nip, email, content='payroll_employee', content_rowid='id', tokenize='trigram')",
+    f"""CREATE TRIGGER payroll_employee_fts_ai AFTER INSERT ON payroll_employee BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, full_name, nip, email) VALUES (new.id, new.full_name, new.nip, new.email);
+    END""",
+    f"""CREATE TRIGGER payroll_employee_fts_ad AFTER DELETE ON payroll_employee BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_name, nip, email)
+        VALUES ('delete', old.id, old.full_name, old.nip, old.email);
+    END""",
+    f"""CREATE TRIGGER payroll_employee_fts_au AFTER UPDATE OF full_name, nip, email ON payroll_employee BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_name, nip, email)
+        VALUES ('delete', old.id, old.full_name, old.nip, old.email);
+        INSERT INTO {FTS_TABLE}(rowid, full_name, nip, email) VALUES (new.id, new.full_name, new.nip, new.email);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS payroll_employee_fts_ai",
+    "DROP TRIGGER IF EXISTS payroll_employee_fts_ad",
+    "DROP TRIGGER IF EXISTS payroll_employee_fts_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+POSTGRES_FORWARD = [
+    "CREATE INDEX payroll_employee_name_key_like ON payroll_employee (school_id, name_key varchar_pattern_ops)",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX payroll_employee_search_trgm ON payroll_employee "
+    "USING gin (full_name gin_trgm_ops, nip gin_trgm_ops, email gin_trgm_ops)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS payroll_employee_search_trgm",
+    "DROP INDEX IF EXISTS payroll_employee_name_key_like",
+]
+
+
+def _sqlite_has_trigram(connection):
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.payroll_fts_probe USING fts5(x, tokenize='trigram')")
+        except Exception:
+            return False
+        cursor.execute("DROP TABLE temp.payroll_fts_probe")
+    return True
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite" and _sqlite_has_trigram(connection):
+        statements = SQLITE_FORWARD
+    elif connection.vendor == "postgresql":
+        statements = POSTGRES_FORWARD
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def fill_name_key(apps, schema_editor):
+    Employee = apps.get_model("payroll", "Employee")
+    employees = list(Employee.objects.only("id", "full_name"))
+    for employee in employees:
+        employee.name_key = employee.full_name.lower()
+    Employee.objects.bulk_update(employees, ["name_key"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0004_payrollperiod_generation_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='name_key',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_name_key, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['school', 'name_key'], name='employee_name_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['school', 'employee_type', 'name_key'], name='employee_type_name_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
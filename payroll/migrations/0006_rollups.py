@@ -0,0 +1,47 @@
+# Generated by Django 4.2.9 on 2026-10-18 23:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0005_employee_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchoolRollup',
+            fields=[
+                ('school', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='payroll.school')),
+                ('employee_count', models.PositiveIntegerField(default=0)),
+                ('active_employee_count', models.PositiveIntegerField(default=0)),
+                ('component_count', models.PositiveIntegerField(default=0)),
+                ('draft_period_count', models.PositiveIntegerField(default=0)),
+                ('final_period_count', models.PositiveIntegerField(default=0)),
+                ('latest_net_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('year_net_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('refreshed_at', models.DateTimeField()),
+                ('latest_period', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='payroll.payrollperiod')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PeriodRollup',
+            fields=[
+                ('period', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='payroll.payrollperiod')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('final', 'Final')], max_length=10)),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('total_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_deductions', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('net_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('refreshed_at', models.DateTimeField()),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_rollups', to='payroll.school')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'year', 'month'], name='period_rollup_month_idx'), models.Index(fields=['school', 'year', 'month'], name='period_rollup_school_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.9 on 2026-10-19 00:10
+
+from django.db import migrations, models
+
+
+def opt_out_existing_schools(apps, schema_editor):
+    # Versi awal 0008 mengisi 'copy' untuk semua sekolah lama; rollover otomatis harus dipilih sendiri.
+    School = apps.get_model('payroll', 'School')
+    School.objects.exclude(rollover_method='none').update(rollover_method='none')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0009_slip_delivery'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='school',
+            name='rollover_method',
+            field=models.CharField(choices=[('none', 'Tidak otomatis'), ('manual', 'Generate dari komponen'), ('copy', 'Salin periode sebelumnya')], default='none', max_length=10),
+        ),
+        migrations.RunPython(opt_out_existing_schools, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from datetime import date
 from decimal import Decimal
 
 from django.contrib.auth.models import AbstractUser
@@ -7,18 +8,42 @@ from django.utils import timezone
 
 
 class School(models.Model):
+    ROLLOVER_NONE = "none"
+    ROLLOVER_MANUAL = "manual"
+    ROLLOVER_COPY = "copy"
+    ROLLOVER_CHOICES = [
+        (ROLLOVER_NONE, "Tidak otomatis"),
+        (ROLLOVER_MANUAL, "Generate dari komponen"),
+        (ROLLOVER_COPY, "Salin periode sebelumnya"),
+    ]
+
     name = models.CharField(max_length=255)
     code = models.CharField(max_length=50, unique=True)
     address = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
+    # Metode draft periode bulan depan yang dibuat perintah ``auto_rollover`` (opt-in per sekolah).
+    rollover_method = models.CharField(max_length=10, choices=ROLLOVER_CHOICES, default=ROLLOVER_NONE)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["name"]
 
+    # ``name`` saat dimuat; signal portal menaikkan versi cache bila nama sekolah berubah.
+    _loaded_name = None
+
     def __str__(self) -> str:
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_name = instance.__dict__.get("name")
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_name = self.name
+
 
 class User(AbstractUser):
     ROLE_SUPER_ADMIN = "super_admin"
@@ -37,6 +62,12 @@ class User(AbstractUser):
     def is_school_admin(self) -> bool:
         return self.role == self.ROLE_SCHOOL_ADMIN
 
+    def is_employee(self) -> bool:
+        return self.role == self.ROLE_EMPLOYEE
+
+    def is_super_admin(self) -> bool:
+        return self.role == self.ROLE_SUPER_ADMIN
+
 
 class Employee(models.Model):
     TYPE_TEACHER = "teacher"
@@ -48,6 +79,8 @@ class Employee(models.Model):
 
     school = models.ForeignKey(School, on_delete=models.CASCADE, related_name="employees")
     full_name = models.CharField(max_length=255)
+    # Nama huruf kecil untuk pencarian prefiks berbasis indeks (range scan, bukan LIKE).
+    name_key = models.CharField(max_length=255, blank=True, editable=False)
     nip = models.CharField(max_length=50, null=True, blank=True)
     email = models.EmailField()
     employee_type = models.CharField(max_length=20, choices=EMPLOYEE_TYPES)
@@ -67,16 +100,37 @@ class Employee(models.Model):
                 name="unique_school_nip",
             ),
         ]
+        indexes = [
+            models.Index(fields=["school", "name_key"], name="employee_name_key_idx"),
+            models.Index(fields=["school", "employee_type", "name_key"], name="employee_type_name_idx"),
+        ]
+
+    # ``user_id`` dan ``full_name`` saat dimuat; signal portal membandingkannya untuk mendeteksi
+    # tautan akun atau nama yang berubah.
+    _loaded_user_id = None
+    _loaded_full_name = None
 
     def __str__(self) -> str:
         return f"{self.full_name} - {self.school.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_user_id = instance.__dict__.get("user_id")
+        instance._loaded_full_name = instance.__dict__.get("full_name")
+        return instance
+
     def save(self, *args, **kwargs):
+        self.name_key = self.full_name.lower()
+        if kwargs.get("update_fields") is not None and "full_name" in kwargs["update_fields"]:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "name_key"}
         if self.email:
             self.email = self.email.lower()
         if self.nip:
             self.nip = self.nip.strip() or None
         super().save(*args, **kwargs)
+        self._loaded_user_id = self.user_id
+        self._loaded_full_name = self.full_name
 
 
 class PayrollComponent(models.Model):
@@ -109,6 +163,34 @@ class PayrollComponent(models.Model):
         super().save(*args, **kwargs)
 
 
+class EmployeeComponentOverride(models.Model):
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="component_overrides")
+    component = models.ForeignKey(PayrollComponent, on_delete=models.CASCADE, related_name="employee_overrides")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    effective_from = models.DateField(null=True, blank=True)
+    effective_until = models.DateField(null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["component__name", "effective_from"]
+        indexes = [
+            models.Index(fields=["employee", "component", "effective_from"], name="override_lookup_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.employee.full_name} - {self.component.code}"
+
+    def save(self, *args, **kwargs):
+        # Berlaku per bulan, jadi tanggal selalu dinormalisasi ke tanggal 1.
+        if self.effective_from:
+            self.effective_from = self.effective_from.replace(day=1)
+        if self.effective_until:
+            self.effective_until = self.effective_until.replace(day=1)
+        super().save(*args, **kwargs)
+
+
 class PayrollPeriod(models.Model):
     STATUS_DRAFT = "draft"
     STATUS_FINAL = "final"
@@ -130,6 +212,7 @@ class PayrollPeriod(models.Model):
         User, on_delete=models.SET_NULL, null=True, blank=True, related_name="finalized_periods"
     )
     note = models.CharField(max_length=255, blank=True)
+    generation_stats = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -144,11 +227,15 @@ class PayrollPeriod(models.Model):
     def label(self) -> str:
         return f"{self.month:02d}/{self.year}"
 
+    @property
+    def first_day(self) -> date:
+        return date(self.year, self.month, 1)
+
     def mark_generated(self, user: User | None = None) -> None:
         self.generated_at = timezone.now()
         if user:
             self.generated_by = user
-        self.save(update_fields=["generated_at", "generated_by", "updated_at"])
+        self.save(update_fields=["generated_at", "generated_by", "generation_stats", "updated_at"])
 
     def finalize(self, user: User | None = None) -> None:
         self.status = self.STATUS_FINAL
@@ -182,8 +269,9 @@ class PayrollEntry(models.Model):
     def __str__(self) -> str:
         return f"{self.employee.full_name} - {self.period.label}"
 
-    def recalculate_totals(self) -> None:
-        items = self.items.all()
+    def recalculate_totals(self, items=None) -> None:
+        if items is None:
+            items = self.items.all()
         earnings = sum((item.amount for item in items if item.component_type == PayrollComponent.TYPE_EARNING), Decimal("0"))
         deductions = sum(
             (item.amount for item in items if item.component_type == PayrollComponent.TYPE_DEDUCTION), Decimal("0")
@@ -211,3 +299,124 @@ class PayrollEntryItem(models.Model):
             self.component_type = self.component.component_type
         super().save(*args, **kwargs)
         self.entry.recalculate_totals()
+
+
+class PeriodRollup(models.Model):
+    """Ringkasan per periode untuk dashboard super admin, diisi oleh ``refresh_rollups``."""
+
+    period = models.OneToOneField(PayrollPeriod, on_delete=models.CASCADE, primary_key=True, related_name="rollup")
+    school = models.ForeignKey(School, on_delete=models.CASCADE, related_name="period_rollups")
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=PayrollPeriod.STATUS_CHOICES)
+    entry_count = models.PositiveIntegerField(default=0)
+    total_earnings = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_deductions = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    net_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "year", "month"], name="period_rollup_month_idx"),
+            models.Index(fields=["school", "year", "month"], name="period_rollup_school_idx"),
+        ]
+
+
+class SchoolRollup(models.Model):
+    """Ringkasan per sekolah; satu baris per sekolah sehingga dashboard tidak mengagregasi data mentah."""
+
+    school = models.OneToOneField(School, on_delete=models.CASCADE, primary_key=True, related_name="rollup")
+    employee_count = models.PositiveIntegerField(default=0)
+    active_employee_count = models.PositiveIntegerField(default=0)
+    component_count = models.PositiveIntegerField(default=0)
+    draft_period_count = models.PositiveIntegerField(default=0)
+    final_period_count = models.PositiveIntegerField(default=0)
+    latest_period = models.ForeignKey(
+        PayrollPeriod, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    latest_net_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    year_net_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField()
+
+
+class PeriodLock(models.Model):
+    """Advisory lock per periode untuk backend tanpa ``SELECT ... FOR UPDATE`` (SQLite)."""
+
+    period = models.OneToOneField(PayrollPeriod, on_delete=models.CASCADE, primary_key=True, related_name="lock")
+    token = models.CharField(max_length=32)
+    operation = models.CharField(max_length=30)
+    acquired_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+
+class IdempotencyKey(models.Model):
+    """Kunci idempoten per pengiriman form generate/finalisasi untuk menggabungkan kiriman ganda."""
+
+    key = models.CharField(max_length=64)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    operation = models.CharField(max_length=30)
+    period = models.ForeignKey(PayrollPeriod, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "operation", "key"], name="unique_idempotency_key"),
+        ]
+
+
+class RolloverRun(models.Model):
+    """Progres ``auto_rollover`` per bulan target, agar run yang terputus bisa dilanjutkan."""
+
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    # Sekolah diproses urut ID; semua sekolah dengan ID <= kursor sudah selesai.
+    last_school_id = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    generated_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-year", "-month"]
+        unique_together = ("year", "month")
+
+    def __str__(self) -> str:
+        return f"Rollover {self.month:02d}/{self.year}"
+
+
+class SlipDelivery(models.Model):
+    """Status pengiriman slip gaji lewat email per entry, agar pengiriman ulang hanya menyasar yang gagal."""
+
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Menunggu"),
+        (STATUS_SENDING, "Sedang dikirim"),
+        (STATUS_SENT, "Terkirim"),
+        (STATUS_FAILED, "Gagal"),
+    ]
+
+    entry = models.OneToOneField(PayrollEntry, on_delete=models.CASCADE, related_name="delivery")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    email = models.EmailField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Token run yang sedang mengirim; baris "sending" yang melewati masa sewa boleh diambil run lain.
+    claim = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["entry__employee__full_name"]
+
+    def __str__(self) -> str:
+        return f"{self.entry} ({self.get_status_display()})"
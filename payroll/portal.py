@@ -0,0 +1,131 @@
+"""Portal slip gaji pegawai.
+
+Data yang ditampilkan hanya berasal dari periode final sehingga daftar slip dan
+PDF-nya aman disimpan di cache. Setiap sekolah memiliki nomor versi cache yang
+dinaikkan saat periode difinalisasi atau dibatalkan, saat tautan pegawai ke akun
+user berubah, dan saat nama pegawai atau sekolah berubah; kunci lama otomatis tidak
+terpakai lagi. Versi yang sama menjadi bagian ETag PDF slip, sehingga browser
+memvalidasi ulang alih-alih menyimpan lama.
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+from .exports import render_slip_pdf, slip_data
+from .metrics import record_cache
+from .models import Employee, PayrollEntry, PayrollPeriod, School
+from .versioning import bump_version, current_version
+
+
+def _timeout() -> int:
+    return getattr(settings, "PAYROLL_PORTAL_CACHE_TIMEOUT", 3600)
+
+
+def portal_version(school_id: int) -> int:
+    return current_version(f"payroll:portal-version:{school_id}")
+
+
+def bump_portal_version(school_id: int) -> None:
+    bump_version(f"payroll:portal-version:{school_id}")
+
+
+def employee_saved(sender, instance: Employee, **kwargs) -> None:
+    # Daftar slip di-cache per user: akun yang dilepas/dipindah tidak boleh melihat daftar lama.
+    # Nama pegawai tercetak di PDF slip yang di-cache.
+    if instance.user_id != instance._loaded_user_id or instance.full_name != instance._loaded_full_name:
+        bump_portal_version(instance.school_id)
+
+
+def school_saved(sender, instance: School, created: bool, **kwargs) -> None:
+    if not created and instance.name != instance._loaded_name:
+        bump_portal_version(instance.pk)
+
+
+def employee_deleted(sender, instance: Employee, **kwargs) -> None:
+    if instance.user_id:
+        bump_portal_version(instance.school_id)
+
+
+def slip_etag(school_id: int, entry_id: int) -> str:
+    return quote_etag(f"slip-{school_id}-{portal_version(school_id)}-{entry_id}")
+
+
+def _listing_key(school_id: int, user_id: int) -> str:
+    return f"payroll:portal:{school_id}:{portal_version(school_id)}:user:{user_id}"
+
+
+def _slip_key(school_id: int, entry_id: int) -> str:
+    return f"payroll:portal:{school_id}:{portal_version(school_id)}:slip:{entry_id}"
+
+
+def build_slip_listing(employee: Employee | None) -> list[dict]:
+    if employee is None:
+        return []
+    entries = (
+        PayrollEntry.objects.filter(
+            employee=employee,
+            status=PayrollEntry.STATUS_FINAL,
+            period__status=PayrollPeriod.STATUS_FINAL,
+        )
+        .order_by("-period__year", "-period__month")
+        .values("pk", "period__month", "period__year", "total_earnings", "total_deductions", "net_pay")
+    )
+    return [
+        {
+            "entry_id": row["pk"],
+            "label": f"{row['period__month']:02d}/{row['period__year']}",
+            "total_earnings": row["total_earnings"],
+            "total_deductions": row["total_deductions"],
+            "net_pay": row["net_pay"],
+        }
+        for row in entries
+    ]
+
+
+def slip_listing(user) -> list[dict]:
+    """Daftar slip final milik user pegawai; cache hit tidak menyentuh database."""
+    key = _listing_key(user.school_id, user.pk)
+    listing = cache.get(key)
+    record_cache("portal_listing", listing is not None)
+    if listing is None:
+        employee = Employee.objects.filter(user=user, school_id=user.school_id).first()
+        listing = build_slip_listing(employee)
+        cache.set(key, listing, timeout=_timeout())
+    return listing
+
+
+def cached_slip_pdf(school_id: int, entry_id: int) -> bytes | None:
+    content = cache.get(_slip_key(school_id, entry_id))
+    record_cache("portal_slip", content is not None)
+    return content
+
+
+def store_slip_pdf(school_id: int, entry_id: int, content: bytes) -> None:
+    cache.set(_slip_key(school_id, entry_id), content, timeout=_timeout())
+
+
+def load_slip_data(entry_id: int) -> dict:
+    entry = PayrollEntry.objects.select_related("period", "employee").prefetch_related("items").get(pk=entry_id)
+    return slip_data(entry, list(entry.items.all()))
+
+
+def precompute_period(period: PayrollPeriod) -> int:
+    """Render dan simpan seluruh slip periode final ke cache sebelum jam sibuk."""
+    entries = (
+        period.entries.filter(status=PayrollEntry.STATUS_FINAL)
+        .select_related("period", "employee")
+        .prefetch_related("items")
+    )
+    count = 0
+    for entry in entries:
+        store_slip_pdf(period.school_id, entry.pk, render_slip_pdf(slip_data(entry, list(entry.items.all()))))
+        if entry.employee.user_id:
+            cache.set(
+                _listing_key(period.school_id, entry.employee.user_id),
+                build_slip_listing(entry.employee),
+                timeout=_timeout(),
+            )
+        count += 1
+    return count
@@ -0,0 +1,119 @@
+"""Profiling opsional untuk request dan pemanggilan service.
+
+Aktif hanya bila ``PAYROLL_PROFILING_ENABLED`` bernilai True. Request dari user
+staff diprofil saat membawa header ``X-Profile: 1`` atau query ``?profile=1``.
+Hasil cProfile disimpan di ``PAYROLL_PROFILE_DIR`` (file ``.prof`` untuk
+``pstats``/snakeviz dan ringkasan ``.txt``), maksimal ``PAYROLL_PROFILE_RETENTION``
+profil terbaru.
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import re
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+
+def profile_dir() -> Path:
+    return Path(getattr(settings, "PAYROLL_PROFILE_DIR", settings.BASE_DIR / "profiles"))
+
+
+def _prune(directory: Path) -> None:
+    retention = getattr(settings, "PAYROLL_PROFILE_RETENTION", 50)
+    profiles = sorted(directory.glob("*.prof"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for stale in profiles[retention:]:
+        stale.unlink(missing_ok=True)
+        stale.with_suffix(".txt").unlink(missing_ok=True)
+
+
+def store_profile(profiler: cProfile.Profile, label: str) -> Path:
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", label).strip("-")[:80] or "profile"
+    path = directory / f"{timezone.now():%Y%m%d-%H%M%S-%f}-{slug}.prof"
+    profiler.dump_stats(path)
+
+    summary = io.StringIO()
+    summary.write(f"{label}\n\n")
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(40)
+    path.with_suffix(".txt").write_text(summary.getvalue(), encoding="utf-8")
+
+    _prune(directory)
+    return path
+
+
+def profile_call(label: str, func, *args, **kwargs):
+    """Jalankan ``func`` di bawah cProfile; kembalikan (hasil, path profil)."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+    return result, store_profile(profiler, label)
+
+
+def _profile_requested(request) -> bool:
+    if not getattr(settings, "PAYROLL_PROFILING_ENABLED", False):
+        return False
+    return request.headers.get("X-Profile") == "1" or request.GET.get("profile") == "1"
+
+
+def _is_staff(request) -> bool:
+    user = getattr(request, "user", None)
+    return bool(user and user.is_authenticated and user.is_staff)
+
+
+class ProfilingMiddleware:
+    """Harus dipasang setelah AuthenticationMiddleware dan CsrfViewMiddleware.
+
+    cProfile merekam satu thread. Di WSGI seluruh request diprofil. Di ASGI event
+    loop dipakai bersama coroutine request lain, jadi yang diprofil hanya view sync,
+    di thread tempat view itu dijalankan (lewat ``process_view``); view async (slip
+    PDF, ekspor, portal) tidak diprofil per request. Render slip PDF berjalan di
+    thread pool, sehingga gunakan perintah ``profile_slip`` agar waktu ReportLab
+    ikut terekam.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not (_profile_requested(request) and _is_staff(request)):
+            return self.get_response(request)
+        response, path = profile_call(f"{request.method} {request.path}", self.get_response, request)
+        response["X-Profile-Id"] = path.name
+        return response
+
+    async def __acall__(self, request):
+        if _profile_requested(request) and await sync_to_async(_is_staff)(request):
+            request._payroll_profile = True
+        response = await self.get_response(request)
+        path = getattr(request, "_payroll_profile_path", None)
+        if path is not None:
+            response["X-Profile-Id"] = path.name
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Hanya di jalur ASGI; Django menjalankan method sync ini di thread yang sama
+        # dengan view sync, jadi profiler tidak merekam coroutine request lain.
+        if not getattr(request, "_payroll_profile", False) or iscoroutinefunction(view_func):
+            return None
+        response, path = profile_call(
+            f"{request.method} {request.path}", view_func, request, *view_args, **view_kwargs
+        )
+        request._payroll_profile_path = path
+        return response
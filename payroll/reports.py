@@ -0,0 +1,85 @@
+"""Laporan perbandingan antar periode yang dihitung di database."""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db.models import Case, CharField, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import PayrollEntry, PayrollEntryItem, PayrollPeriod
+
+_ZERO = Value(Decimal("0"), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _status(present_base: str, present_current: str):
+    return Case(
+        When(**{f"{present_base}": 0}, then=Value("new")),
+        When(**{f"{present_current}": 0}, then=Value("missing")),
+        default=Value("changed"),
+        output_field=CharField(),
+    )
+
+
+def employee_differences(base: PayrollPeriod, current: PayrollPeriod):
+    """Pegawai baru/hilang atau yang gaji bersihnya berubah, satu baris per pegawai."""
+    in_base = Q(period=base)
+    in_current = Q(period=current)
+    return (
+        PayrollEntry.objects.filter(period__in=[base, current])
+        .values("employee_id", "employee__full_name", "employee__nip")
+        .annotate(
+            present_base=Count("id", filter=in_base),
+            present_current=Count("id", filter=in_current),
+            net_base=Coalesce(Sum("net_pay", filter=in_base), _ZERO),
+            net_current=Coalesce(Sum("net_pay", filter=in_current), _ZERO),
+        )
+        .annotate(delta=F("net_current") - F("net_base"), change=_status("present_base", "present_current"))
+        .filter(~Q(present_base=F("present_current")) | ~Q(net_base=F("net_current")))
+        .order_by("employee__full_name", "employee_id")
+    )
+
+
+def component_differences(base: PayrollPeriod, current: PayrollPeriod):
+    """Pasangan (pegawai, komponen) yang nominalnya berbeda atau hanya ada di salah satu periode."""
+    in_base = Q(entry__period=base)
+    in_current = Q(entry__period=current)
+    return (
+        PayrollEntryItem.objects.filter(entry__period__in=[base, current])
+        .values(
+            "entry__employee_id",
+            "entry__employee__full_name",
+            "component_id",
+            "component__code",
+            "component__name",
+            "component_type",
+        )
+        .annotate(
+            present_base=Count("id", filter=in_base),
+            present_current=Count("id", filter=in_current),
+            amount_base=Coalesce(Sum("amount", filter=in_base), _ZERO),
+            amount_current=Coalesce(Sum("amount", filter=in_current), _ZERO),
+        )
+        .annotate(delta=F("amount_current") - F("amount_base"), change=_status("present_base", "present_current"))
+        .filter(~Q(present_base=F("present_current")) | ~Q(amount_base=F("amount_current")))
+        .order_by("entry__employee__full_name", "entry__employee_id", "component__code")
+    )
+
+
+def period_totals(base: PayrollPeriod, current: PayrollPeriod) -> dict:
+    totals = PayrollEntry.objects.filter(period__in=[base, current]).aggregate(
+        net_base=Coalesce(Sum("net_pay", filter=Q(period=base)), _ZERO),
+        net_current=Coalesce(Sum("net_pay", filter=Q(period=current)), _ZERO),
+        count_base=Count("id", filter=Q(period=base)),
+        count_current=Count("id", filter=Q(period=current)),
+    )
+    totals["delta"] = totals["net_current"] - totals["net_base"]
+    return totals
+
+
+def previous_period(period: PayrollPeriod) -> PayrollPeriod | None:
+    return (
+        PayrollPeriod.objects.filter(school_id=period.school_id)
+        .filter(Q(year__lt=period.year) | Q(year=period.year, month__lt=period.month))
+        .order_by("-year", "-month")
+        .first()
+    )
@@ -0,0 +1,150 @@
+"""Pembuatan otomatis draft periode bulan depan (``auto_rollover``).
+
+Sekolah aktif diproses urut ID dalam batch kecil. Setelah setiap batch, kursor dan
+hitungan disimpan ke ``RolloverRun`` sehingga run yang terputus (jendela off-peak
+habis, proses dimatikan) dilanjutkan dari sekolah berikutnya. Periode yang sudah
+digenerate atau final dilewati, jadi mengulang batch tidak menggandakan data.
+Kegagalan satu sekolah dicatat di ``RolloverRun.errors`` lalu run berlanjut.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Callable
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import PayrollPeriod, RolloverRun, School
+from .rollups import refresh_rollups
+from .services import PayrollGenerationError, generate_payroll
+
+logger = logging.getLogger(__name__)
+
+_MAX_ERRORS = 200
+
+
+class RolloverBusyError(Exception):
+    """Run untuk bulan yang sama sedang berjalan di proses lain."""
+
+
+def next_month(today: date) -> tuple[int, int]:
+    if today.month == 12:
+        return today.year + 1, 1
+    return today.year, today.month + 1
+
+
+def parse_window(raw: str) -> tuple[dt_time, dt_time]:
+    """``"22:00-05:00"`` -> (22:00, 05:00). Jendela boleh melewati tengah malam."""
+    try:
+        start, end = (datetime.strptime(part.strip(), "%H:%M").time() for part in raw.split("-", 1))
+    except ValueError as exc:
+        raise ValueError(f"Format jendela tidak valid: {raw!r} (contoh: 22:00-05:00).") from exc
+    return start, end
+
+
+def in_window(window: tuple[dt_time, dt_time], now: datetime | None = None) -> bool:
+    start, end = window
+    current = timezone.localtime(now).time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+def _claim(run: RolloverRun, lease: timedelta) -> bool:
+    now = timezone.now()
+    claimed = RolloverRun.objects.filter(
+        Q(lease_until__isnull=True) | Q(lease_until__lt=now), pk=run.pk
+    ).update(lease_until=now + lease)
+    run.lease_until = now + lease
+    return bool(claimed)
+
+
+def _source_period(school: School, year: int, month: int) -> PayrollPeriod | None:
+    return (
+        school.periods.filter(Q(year__lt=year) | Q(year=year, month__lt=month), status=PayrollPeriod.STATUS_FINAL)
+        .order_by("-year", "-month")
+        .first()
+    )
+
+
+def _record_failure(run: RolloverRun, school: School, message: str) -> None:
+    run.failed_count += 1
+    if len(run.errors) < _MAX_ERRORS:
+        run.errors.append({"school": school.pk, "message": message})
+
+
+def _rollover_school(run: RolloverRun, school: School) -> None:
+    period, created = PayrollPeriod.objects.get_or_create(
+        school=school,
+        year=run.year,
+        month=run.month,
+        defaults={"note": "Dibuat otomatis (rollover)"},
+    )
+    if created:
+        run.created_count += 1
+    elif period.generated_at or period.status == PayrollPeriod.STATUS_FINAL:
+        run.skipped_count += 1
+        return
+    method = school.rollover_method
+    source = _source_period(school, run.year, run.month) if method == School.ROLLOVER_COPY else None
+    if source is None:
+        method = School.ROLLOVER_MANUAL
+    try:
+        generate_payroll(period=period, method=method, school=school, user=None, source_period=source)
+    except PayrollGenerationError as exc:
+        _record_failure(run, school, str(exc))
+        return
+    run.generated_count += 1
+
+
+def run_rollover(
+    *,
+    year: int,
+    month: int,
+    batch_size: int,
+    pause: float,
+    lease: timedelta,
+    should_continue: Callable[[], bool] = lambda: True,
+    restart: bool = False,
+) -> RolloverRun:
+    """Proses sekolah yang belum selesai untuk bulan target, batch demi batch.
+
+    Berhenti saat semua sekolah selesai atau ``should_continue()`` bernilai salah
+    (misalnya jendela off-peak habis); progres sudah tersimpan di ``RolloverRun``.
+    """
+    run, _ = RolloverRun.objects.get_or_create(year=year, month=month)
+    if not _claim(run, lease):
+        raise RolloverBusyError(f"Rollover {month:02d}/{year} sedang dijalankan proses lain.")
+    try:
+        if restart:
+            run.last_school_id = 0
+            run.finished_at = None
+            run.errors = []
+            run.created_count = run.generated_count = run.skipped_count = run.failed_count = 0
+            run.save()
+        if run.finished_at:
+            return run
+        schools = School.objects.filter(is_active=True).exclude(rollover_method=School.ROLLOVER_NONE).order_by("pk")
+        while should_continue():
+            batch = list(schools.filter(pk__gt=run.last_school_id)[:batch_size])
+            if not batch:
+                run.finished_at = timezone.now()
+                run.save()
+                break
+            for school in batch:
+                try:
+                    _rollover_school(run, school)
+                except Exception as exc:  # noqa: BLE001 - satu sekolah gagal tidak boleh menghentikan rollover
+                    logger.exception("Rollover %02d/%s gagal untuk sekolah %s.", month, year, school.pk)
+                    _record_failure(run, school, str(exc) or exc.__class__.__name__)
+            refresh_rollups([school.pk for school in batch])
+            run.last_school_id = batch[-1].pk
+            run.lease_until = timezone.now() + lease
+            run.save()
+            if pause:
+                time.sleep(pause)
+        return run
+    finally:
+        RolloverRun.objects.filter(pk=run.pk).update(lease_until=None)
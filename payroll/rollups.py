@@ -0,0 +1,168 @@
+"""Rollup dashboard super admin.
+
+Dashboard hanya membaca ``SchoolRollup``/``PeriodRollup``. Rollup dihitung ulang
+dengan query agregat berkelompok (jumlah query tetap, tidak tergantung jumlah
+sekolah) oleh perintah terjadwal ``refresh_rollups`` dan untuk satu sekolah
+setelah generate/finalisasi/pembatalan/hapus periode. Periode final yang status
+dan ``updated_at``-nya tidak berubah sejak rollup terakhir dilewati.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    Employee,
+    PayrollComponent,
+    PayrollEntry,
+    PayrollPeriod,
+    PeriodRollup,
+    School,
+    SchoolRollup,
+)
+
+_CHUNK = 500
+_PERIOD_FIELDS = [
+    "school",
+    "year",
+    "month",
+    "status",
+    "entry_count",
+    "total_earnings",
+    "total_deductions",
+    "net_total",
+    "refreshed_at",
+]
+_SCHOOL_FIELDS = [
+    "employee_count",
+    "active_employee_count",
+    "component_count",
+    "draft_period_count",
+    "final_period_count",
+    "latest_period",
+    "latest_net_total",
+    "year_net_total",
+    "refreshed_at",
+]
+
+
+def _stale_periods(school_ids: list[int] | None):
+    periods = PayrollPeriod.objects.all()
+    if school_ids is not None:
+        periods = periods.filter(school_id__in=school_ids)
+    return periods.filter(
+        Q(rollup__isnull=True)
+        | Q(status=PayrollPeriod.STATUS_DRAFT)
+        | ~Q(rollup__status=F("status"))
+        | Q(updated_at__gt=F("rollup__refreshed_at"))
+    )
+
+
+def _refresh_periods(school_ids: list[int] | None, now) -> int:
+    stale = list(_stale_periods(school_ids).order_by().values("id", "school_id", "year", "month", "status"))
+    for start in range(0, len(stale), _CHUNK):
+        chunk = stale[start : start + _CHUNK]
+        totals = {
+            row["period_id"]: row
+            for row in PayrollEntry.objects.filter(period_id__in=[period["id"] for period in chunk])
+            .values("period_id")
+            .annotate(
+                entry_count=Count("id"),
+                total_earnings=Sum("total_earnings"),
+                total_deductions=Sum("total_deductions"),
+                net_total=Sum("net_pay"),
+            )
+            .order_by()
+        }
+        PeriodRollup.objects.bulk_create(
+            [
+                PeriodRollup(
+                    period_id=period["id"],
+                    school_id=period["school_id"],
+                    year=period["year"],
+                    month=period["month"],
+                    status=period["status"],
+                    entry_count=totals.get(period["id"], {}).get("entry_count", 0),
+                    total_earnings=totals.get(period["id"], {}).get("total_earnings") or 0,
+                    total_deductions=totals.get(period["id"], {}).get("total_deductions") or 0,
+                    net_total=totals.get(period["id"], {}).get("net_total") or 0,
+                    refreshed_at=now,
+                )
+                for period in chunk
+            ],
+            update_conflicts=True,
+            unique_fields=["period"],
+            update_fields=_PERIOD_FIELDS,
+        )
+    return len(stale)
+
+
+def _grouped(queryset, **aggregates) -> dict[int, dict]:
+    return {row["school_id"]: row for row in queryset.values("school_id").annotate(**aggregates).order_by()}
+
+
+def _refresh_schools(school_ids: list[int] | None, now) -> int:
+    schools = School.objects.all()
+    if school_ids is not None:
+        schools = schools.filter(id__in=school_ids)
+    ids = list(schools.values_list("id", flat=True))
+    scope = {"school_id__in": ids} if school_ids is not None else {}
+    employees = _grouped(
+        Employee.objects.filter(**scope), total=Count("id"), active=Count("id", filter=Q(is_active=True))
+    )
+    components = _grouped(PayrollComponent.objects.filter(**scope), total=Count("id"))
+    rollups = PeriodRollup.objects.filter(**scope)
+    periods = _grouped(
+        rollups,
+        draft=Count("period_id", filter=Q(status=PayrollPeriod.STATUS_DRAFT)),
+        final=Count("period_id", filter=Q(status=PayrollPeriod.STATUS_FINAL)),
+        year_total=Sum("net_total", filter=Q(status=PayrollPeriod.STATUS_FINAL, year=now.year)),
+    )
+    latest: dict[int, tuple[int, Decimal]] = {}
+    # Urut menurun per sekolah: baris pertama yang ditemui adalah periode terbaru.
+    for school_id, period_id, net_total in rollups.order_by("school_id", "-year", "-month").values_list(
+        "school_id", "period_id", "net_total"
+    ).iterator(chunk_size=2000):
+        latest.setdefault(school_id, (period_id, net_total))
+
+    objects = []
+    for school_id in ids:
+        employee_row = employees.get(school_id, {})
+        period_row = periods.get(school_id, {})
+        latest_period_id, latest_net_total = latest.get(school_id, (None, 0))
+        objects.append(
+            SchoolRollup(
+                school_id=school_id,
+                employee_count=employee_row.get("total", 0),
+                active_employee_count=employee_row.get("active", 0),
+                component_count=components.get(school_id, {}).get("total", 0),
+                draft_period_count=period_row.get("draft", 0),
+                final_period_count=period_row.get("final", 0),
+                latest_period_id=latest_period_id,
+                latest_net_total=latest_net_total,
+                year_net_total=period_row.get("year_total") or 0,
+                refreshed_at=now,
+            )
+        )
+    SchoolRollup.objects.bulk_create(
+        objects,
+        batch_size=_CHUNK,
+        update_conflicts=True,
+        unique_fields=["school"],
+        update_fields=_SCHOOL_FIELDS,
+    )
+    return len(objects)
+
+
+def refresh_rollups(school_ids: Iterable[int] | None = None) -> dict[str, int]:
+    """Perbarui rollup semua sekolah (``None``) atau sekolah tertentu saja."""
+    school_ids = list(school_ids) if school_ids is not None else None
+    now = timezone.now()
+    with transaction.atomic():
+        periods = _refresh_periods(school_ids, now)
+        schools = _refresh_schools(school_ids, now)
+    return {"periods": periods, "schools": schools}
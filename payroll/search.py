@@ -0,0 +1,111 @@
+"""Pencarian pegawai berbasis indeks.
+
+- Prefiks nama/NIP/email memakai range scan pada indeks B-tree (``name_key`` huruf
+  kecil, ``email`` yang selalu disimpan huruf kecil, dan ``nip``), bukan ``LIKE``.
+- Mode teks penuh (substring, minimal 3 karakter) memakai tabel FTS5 trigram di
+  SQLite atau indeks GIN ``pg_trgm`` di PostgreSQL bila dibuat oleh migrasi 0005.
+  Indeks GIN dibuat pada kolom apa adanya, jadi pencarian memakai ``kolom ILIKE``;
+  ``icontains`` Django menghasilkan ``UPPER(kolom) LIKE`` yang tidak memakai indeks.
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import CharField, Q
+from django.db.models.lookups import IContains
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "payroll_employee_fts"
+_MAX_CHAR = "\U0010ffff"
+_fulltext_backend: str | None = None
+
+# Trigger sinkronisasi FTS. SQLite membangun ulang tabel saat AlterField sehingga
+# trigger ikut terhapus; ensure_fulltext_triggers() memasangnya lagi setelah migrate.
+_SQLITE_TRIGGERS = {
+    "payroll_employee_fts_ai": f"""CREATE TRIGGER IF NOT EXISTS payroll_employee_fts_ai
+        AFTER INSERT ON payroll_employee BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, full_name, nip, email) VALUES (new.id, new.full_name, new.nip, new.email);
+    END""",
+    "payroll_employee_fts_ad": f"""CREATE TRIGGER IF NOT EXISTS payroll_employee_fts_ad
+        AFTER DELETE ON payroll_employee BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_name, nip, email)
+        VALUES ('delete', old.id, old.full_name, old.nip, old.email);
+    END""",
+    "payroll_employee_fts_au": f"""CREATE TRIGGER IF NOT EXISTS payroll_employee_fts_au
+        AFTER UPDATE OF full_name, nip, email ON payroll_employee BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, full_name, nip, email)
+        VALUES ('delete', old.id, old.full_name, old.nip, old.email);
+        INSERT INTO {FTS_TABLE}(rowid, full_name, nip, email) VALUES (new.id, new.full_name, new.nip, new.email);
+    END""",
+}
+
+
+@CharField.register_lookup
+class TrigramContains(IContains):
+    """``kolom ILIKE '%q%'`` (PostgreSQL) tanpa ``UPPER()``, sesuai ekspresi indeks ``gin_trgm_ops``."""
+
+    lookup_name = "trigram_contains"
+
+    def get_rhs_op(self, connection, rhs):
+        return f"ILIKE {rhs}"
+
+
+def fulltext_backend() -> str:
+    """``"fts5"``, ``"trigram"``, atau ``""`` bila tidak tersedia/dimatikan."""
+    global _fulltext_backend
+    if not getattr(settings, "PAYROLL_EMPLOYEE_FULLTEXT", True):
+        return ""
+    if _fulltext_backend is None:
+        if connection.vendor == "sqlite":
+            _fulltext_backend = "fts5" if FTS_TABLE in connection.introspection.table_names() else ""
+        elif connection.vendor == "postgresql":
+            _fulltext_backend = "trigram"
+        else:
+            _fulltext_backend = ""
+    return _fulltext_backend
+
+
+def ensure_fulltext_triggers(using="default", **kwargs) -> None:
+    conn = connections[using]
+    if conn.vendor != "sqlite" or FTS_TABLE not in conn.introspection.table_names():
+        return
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'payroll_employee_fts_%'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [sql for name, sql in _SQLITE_TRIGGERS.items() if name not in existing]
+        for sql in missing:
+            cursor.execute(sql)
+        if missing:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _prefix(field: str, value: str) -> Q:
+    if connection.vendor == "sqlite":
+        # Perbandingan BINARY: range ini memakai indeks, berbeda dengan LIKE 'x%' yang case-insensitive.
+        return Q(**{f"{field}__gte": value, f"{field}__lt": value + _MAX_CHAR})
+    return Q(**{f"{field}__startswith": value})
+
+
+def _fulltext(query: str) -> Q | None:
+    backend = fulltext_backend()
+    if len(query) < 3 or not backend:
+        return None
+    if backend == "fts5":
+        phrase = '"' + query.replace('"', '""') + '"'
+        return Q(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [phrase]))
+    return (
+        Q(full_name__trigram_contains=query) | Q(nip__trigram_contains=query) | Q(email__trigram_contains=query)
+    )
+
+
+def search_employees(employees, query: str):
+    """Saring queryset pegawai berdasarkan prefiks nama/NIP/email atau substring (teks penuh)."""
+    query = " ".join(query.split())
+    if not query:
+        return employees
+    key = query.lower()
+    match = _prefix("name_key", key) | _prefix("email", key) | _prefix("nip", query)
+    fulltext = _fulltext(query)
+    if fulltext is not None:
+        match |= fulltext
+    return employees.filter(match)
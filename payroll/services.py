@@ -1,14 +1,24 @@
 from __future__ import annotations
 
+import logging
+import time
 from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from decimal import Decimal
 from typing import Iterable
 
-from django.db import transaction
-from openpyxl import load_workbook
+from django.utils import timezone
+from django.db.models import F, Q
 
+from .backends import get_backend
+from .calculation import batch_totals
+from .catalog import active_components
+from .concurrency import PeriodBusyError, period_lock
+from .metrics import record_generation
 from .models import (
     Employee,
+    EmployeeComponentOverride,
     PayrollComponent,
     PayrollEntry,
     PayrollEntryItem,
@@ -18,15 +28,104 @@ from .models import (
 )
 
 
+logger = logging.getLogger(__name__)
+
+
 class PayrollGenerationError(Exception):
     """High level error during payroll generation."""
 
 
+class _Span:
+    __slots__ = ("rows",)
+
+    def __init__(self) -> None:
+        self.rows = 0
+
+
+class _RunTrace:
+    """Akumulasi durasi & jumlah baris per fase selama satu kali generate."""
+
+    def __init__(self, name: str, **context) -> None:
+        self.name = name
+        self.context = context
+        self.started_at = timezone.now()
+        self._start = time.perf_counter()
+        self.phases: dict[str, dict] = {}
+
+    def record(self, phase: str, duration: float, rows: int) -> None:
+        stats = self.phases.setdefault(phase, {"calls": 0, "rows": 0, "duration_ms": 0.0})
+        stats["calls"] += 1
+        stats["rows"] += rows
+        stats["duration_ms"] += duration * 1000
+
+    def summary(self) -> dict:
+        return {
+            "run": self.name,
+            **self.context,
+            "started_at": self.started_at.isoformat(),
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 2),
+            "phases": {
+                phase: {**stats, "duration_ms": round(stats["duration_ms"], 2)}
+                for phase, stats in self.phases.items()
+            },
+        }
+
+    def emit(self) -> dict:
+        summary = self.summary()
+        for phase, stats in summary["phases"].items():
+            logger.info(
+                "payroll span %s.%s %.2fms rows=%s",
+                self.name,
+                phase,
+                stats["duration_ms"],
+                stats["rows"],
+                extra={"payroll_span": {"run": self.name, "phase": phase, **self.context, **stats}},
+            )
+        logger.info(
+            "payroll run %s %.2fms",
+            self.name,
+            summary["total_ms"],
+            extra={"payroll_run": summary},
+        )
+        return summary
+
+
+_current_trace: ContextVar[_RunTrace | None] = ContextVar("payroll_trace", default=None)
+
+
+@contextmanager
+def _span(phase: str):
+    """Ukur satu fase; tanpa trace aktif hanya biaya satu lookup ContextVar."""
+    trace = _current_trace.get()
+    span = _Span()
+    if trace is None:
+        yield span
+        return
+    start = time.perf_counter()
+    try:
+        yield span
+    finally:
+        trace.record(phase, time.perf_counter() - start, span.rows)
+
+
+@contextmanager
+def _trace_run(name: str, **context):
+    trace = _RunTrace(name, **context)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
 def _ensure_entry(period: PayrollPeriod, employee: Employee) -> PayrollEntry:
-    entry, _ = PayrollEntry.objects.get_or_create(period=period, employee=employee)
-    entry.status = PayrollEntry.STATUS_DRAFT
-    entry.save(update_fields=["status", "updated_at"])
-    entry.items.all().delete()
+    with _span("ensure_entry") as span:
+        entry, _ = PayrollEntry.objects.get_or_create(period=period, employee=employee)
+        entry.status = PayrollEntry.STATUS_DRAFT
+        entry.save(update_fields=["status", "updated_at"])
+        span.rows = 1
+    with _span("delete_items") as span:
+        span.rows, _ = entry.items.all().delete()
     return entry
 
 
@@ -43,43 +142,101 @@ def _create_items(entry: PayrollEntry, components: Iterable[PayrollComponent], a
                 amount=amount,
             )
         )
-    PayrollEntryItem.objects.bulk_create(items)
-    entry.recalculate_totals()
+    with _span("insert_items") as span:
+        PayrollEntryItem.objects.bulk_create(items)
+        span.rows = len(items)
+
+
+def refresh_entry_totals(entries) -> int:
+    """Hitung ulang total seluruh entry pada queryset dengan kernel sen.
+
+    Entry dengan total yang sama ditulis bersama dalam satu ``UPDATE ... WHERE id IN``;
+    pada payroll sekolah jumlah kombinasi total biasanya jauh lebih kecil dari jumlah pegawai.
+    """
+    with _span("recalculate_totals") as span:
+        entry_ids = list(entries.order_by().values_list("id", flat=True))
+        rows = PayrollEntryItem.objects.filter(entry_id__in=entries.values("id")).values_list(
+            "entry_id", "component_type", "amount"
+        )
+        totals = batch_totals(rows.iterator(chunk_size=5000), entry_ids)
+        groups: dict[tuple, list[int]] = defaultdict(list)
+        for entry_id, earnings, deductions, net_pay in totals:
+            groups[earnings, deductions, net_pay].append(entry_id)
+        now = timezone.now()
+        for (earnings, deductions, net_pay), ids in groups.items():
+            for start in range(0, len(ids), 500):
+                PayrollEntry.objects.filter(id__in=ids[start : start + 500]).update(
+                    total_earnings=earnings, total_deductions=deductions, net_pay=net_pay, updated_at=now
+                )
+        span.rows = len(totals)
+    return len(totals)
 
 
 def _copy_from_period(target_period: PayrollPeriod, source_period: PayrollPeriod) -> None:
-    for entry in source_period.entries.select_related("employee"):
+    with _span("load_source") as span:
+        source_entries = list(source_period.entries.select_related("employee"))
+        span.rows = len(source_entries)
+    for entry in source_entries:
         target_entry = _ensure_entry(target_period, entry.employee)
-        items = [
-            PayrollEntryItem(
-                entry=target_entry,
-                component=item.component,
-                component_name=item.component_name,
-                component_type=item.component_type,
-                amount=item.amount,
-            )
-            for item in entry.items.all()
-        ]
-        PayrollEntryItem.objects.bulk_create(items)
-        target_entry.recalculate_totals()
+        with _span("load_source_items") as span:
+            items = [
+                PayrollEntryItem(
+                    entry=target_entry,
+                    component=item.component,
+                    component_name=item.component_name,
+                    component_type=item.component_type,
+                    amount=item.amount,
+                )
+                for item in entry.items.all()
+            ]
+            span.rows = len(items)
+        with _span("insert_items") as span:
+            PayrollEntryItem.objects.bulk_create(items)
+            span.rows = len(items)
+
 
+def _override_amounts(
+    period: PayrollPeriod, school: School, employee: Employee | None = None
+) -> dict[int, dict[str, Decimal]]:
+    """Nominal khusus pegawai yang berlaku pada periode, dimuat dengan satu query."""
+    first_day = period.first_day
+    overrides = EmployeeComponentOverride.objects.filter(
+        employee__school=school,
+        component__is_active=True,
+    ).filter(
+        Q(effective_from__isnull=True) | Q(effective_from__lte=first_day),
+        Q(effective_until__isnull=True) | Q(effective_until__gte=first_day),
+    )
+    if employee is not None:
+        overrides = overrides.filter(employee=employee)
+    # Override dengan tanggal mulai paling baru menimpa yang lebih lama.
+    rows = overrides.order_by(F("effective_from").asc(nulls_first=True), "id").values_list(
+        "employee_id", "component__code", "amount"
+    )
+    data: dict[int, dict[str, Decimal]] = defaultdict(dict)
+    for employee_id, component_code, amount in rows:
+        data[employee_id][component_code] = amount
+    return data
 
-def _manual_generation(period: PayrollPeriod, school: School) -> None:
-    components = list(school.components.filter(is_active=True))
-    employees = list(school.employees.filter(is_active=True))
+
+def _manual_generation(
+    period: PayrollPeriod, school: School, components: list[PayrollComponent], employees: list[Employee]
+) -> None:
+    with _span("load_overrides") as span:
+        overrides = _override_amounts(period, school)
+        span.rows = sum(len(amounts) for amounts in overrides.values())
     for employee in employees:
         entry = _ensure_entry(period, employee)
-        _create_items(entry, components, {})
+        _create_items(entry, components, overrides.get(employee.id, {}))
 
 
 def _import_amounts(upload_file, school: School) -> dict[str, dict[str, Decimal]]:
     try:
-        workbook = load_workbook(upload_file, data_only=True)
-    except Exception as exc:  # pragma: no cover - openpyxl specific errors
+        rows = iter(get_backend("import").read_rows(upload_file))
+        header = list(next(rows, ()))
+    except Exception as exc:  # pragma: no cover - backend specific errors
         raise PayrollGenerationError("File Excel tidak valid.") from exc
 
-    sheet = workbook.active
-    header = [cell.value for cell in next(sheet.iter_rows(min_row=1, max_row=1))]
     try:
         email_idx = header.index("email")
         component_idx = header.index("component_code")
@@ -88,10 +245,12 @@ def _import_amounts(upload_file, school: School) -> dict[str, dict[str, Decimal]
         raise PayrollGenerationError("Kolom wajib: email, component_code, amount.") from exc
 
     data: dict[str, dict[str, Decimal]] = defaultdict(dict)
-    for row in sheet.iter_rows(min_row=2):
-        email = row[email_idx].value
-        component_code = row[component_idx].value
-        amount = row[amount_idx].value
+    width = max(email_idx, component_idx, amount_idx) + 1
+    for row in rows:
+        row = (*row, *(None,) * (width - len(row)))
+        email = row[email_idx]
+        component_code = row[component_idx]
+        amount = row[amount_idx]
         if not email or not component_code:
             continue
         try:
@@ -121,38 +280,128 @@ def generate_payroll(
     source_period: PayrollPeriod | None = None,
     upload_file=None,
 ) -> None:
-    components = list(school.components.filter(is_active=True))
-    if not components:
-        raise PayrollGenerationError("Belum ada komponen gaji aktif.")
-    employees = list(school.employees.filter(is_active=True))
-    if not employees:
-        raise PayrollGenerationError("Belum ada pegawai aktif.")
-
-    with transaction.atomic():
-        if method == "manual":
-            _manual_generation(period, school)
-        elif method == "copy":
-            if not source_period:
-                raise PayrollGenerationError("Periode sumber wajib diisi untuk copy.")
-            _copy_from_period(period, source_period)
-        elif method == "import":
-            amount_map = _import_amounts(upload_file, school)
-            for employee in employees:
-                entry = _ensure_entry(period, employee)
-                mapped_amounts = amount_map.get(employee.email.lower(), {})
-                _create_items(entry, components, mapped_amounts)
-        else:
+    with _trace_run("generate_payroll", period_id=period.pk, school_id=school.pk, method=method) as trace:
+        with _span("load_components") as span:
+            components = active_components(school.pk)
+            span.rows = len(components)
+        if not components:
+            raise PayrollGenerationError("Belum ada komponen gaji aktif.")
+        with _span("load_employees") as span:
+            employees = list(school.employees.filter(is_active=True))
+            span.rows = len(employees)
+        if not employees:
+            raise PayrollGenerationError("Belum ada pegawai aktif.")
+
+        if method not in ("manual", "copy", "import"):
             raise PayrollGenerationError("Metode generate tidak dikenal.")
+        if method == "copy" and not source_period:
+            raise PayrollGenerationError("Periode sumber wajib diisi untuk copy.")
+        if method == "import":
+            # Parsing file dilakukan sebelum mengambil kunci agar kunci periode dipegang sesingkat mungkin.
+            with _span("import_parse") as span:
+                amount_map = _import_amounts(upload_file, school)
+                span.rows = sum(len(amounts) for amounts in amount_map.values())
+
+        try:
+            with period_lock(period.pk, "generate") as locked_period:
+                if locked_period.status != PayrollPeriod.STATUS_DRAFT:
+                    raise PayrollGenerationError("Periode sudah final.")
+                if method == "manual":
+                    _manual_generation(period, school, components, employees)
+                elif method == "copy":
+                    _copy_from_period(period, source_period)
+                else:
+                    with _span("load_overrides") as span:
+                        overrides = _override_amounts(period, school)
+                        span.rows = sum(len(amounts) for amounts in overrides.values())
+                    for employee in employees:
+                        entry = _ensure_entry(period, employee)
+                        mapped_amounts = {
+                            **overrides.get(employee.id, {}),
+                            **amount_map.get(employee.email.lower(), {}),
+                        }
+                        _create_items(entry, components, mapped_amounts)
+                refresh_entry_totals(period.entries.all())
 
-        period.mark_generated(user)
+                period.generation_stats = trace.emit()
+                period.mark_generated(user)
+        except PeriodBusyError as exc:
+            raise PayrollGenerationError(str(exc)) from exc
+        record_generation(period.generation_stats)
 
 
 def add_employee_payroll_entry(*, period: PayrollPeriod, employee: Employee, school: School) -> PayrollEntry:
     if employee.school_id != school.id:
         raise PayrollGenerationError("Pegawai tidak berasal dari sekolah ini.")
-    components = list(school.components.filter(is_active=True))
+    components = active_components(school.pk)
     if not components:
         raise PayrollGenerationError("Belum ada komponen gaji aktif.")
-    entry = _ensure_entry(period, employee)
-    _create_items(entry, components, {})
+    overrides = _override_amounts(period, school, employee=employee)
+    try:
+        with period_lock(period.pk, "edit", wait=True) as locked_period:
+            if locked_period.status != PayrollPeriod.STATUS_DRAFT:
+                raise PayrollGenerationError("Periode final tidak dapat diubah.")
+            entry = _ensure_entry(period, employee)
+            _create_items(entry, components, overrides.get(employee.id, {}))
+            entry.recalculate_totals()
+    except PeriodBusyError as exc:
+        raise PayrollGenerationError(str(exc)) from exc
     return entry
+
+
+def apply_component_to_period(
+    *,
+    period: PayrollPeriod,
+    component: PayrollComponent,
+    action: str,
+    amount: Decimal | None = None,
+    employee_type: str = "",
+) -> dict[str, int]:
+    """Tambah/ubah/hapus satu komponen di semua entry periode (opsional per jenis pegawai).
+
+    ``action``: ``add`` hanya entry yang belum punya komponen, ``set`` juga menimpa nominal
+    yang ada, ``remove`` menghapus item komponen. Total dihitung ulang sekali di akhir.
+    """
+    if period.status != PayrollPeriod.STATUS_DRAFT:
+        raise PayrollGenerationError("Periode final tidak dapat diubah.")
+    if component.school_id != period.school_id:
+        raise PayrollGenerationError("Komponen tidak berasal dari sekolah ini.")
+    entries = period.entries.all()
+    if employee_type:
+        entries = entries.filter(employee__employee_type=employee_type)
+    counts = {"created": 0, "updated": 0, "deleted": 0}
+    try:
+        with period_lock(period.pk, "bulk_component", wait=True) as locked_period:
+            if locked_period.status != PayrollPeriod.STATUS_DRAFT:
+                raise PayrollGenerationError("Periode final tidak dapat diubah.")
+            existing = PayrollEntryItem.objects.filter(entry__in=entries, component=component)
+            if action == "remove":
+                counts["deleted"], _ = existing.delete()
+            elif action in ("add", "set"):
+                if action == "set":
+                    counts["updated"] = existing.update(
+                        amount=amount, component_name=component.name, component_type=component.component_type
+                    )
+                missing_ids = entries.exclude(items__component=component).order_by().values_list("id", flat=True)
+                created = PayrollEntryItem.objects.bulk_create(
+                    [
+                        PayrollEntryItem(
+                            entry_id=entry_id,
+                            component=component,
+                            component_name=component.name,
+                            component_type=component.component_type,
+                            amount=amount,
+                        )
+                        for entry_id in missing_ids.iterator()
+                    ],
+                    batch_size=500,
+                )
+                counts["created"] = len(created)
+            else:
+                raise PayrollGenerationError("Aksi tidak dikenal.")
+            if any(counts.values()):
+                refresh_entry_totals(entries)
+    except PeriodBusyError as exc:
+        raise PayrollGenerationError(str(exc)) from exc
+    return counts
+
@@ -0,0 +1,165 @@
+"""Aset statis ber-fingerprint dan terkompresi, tanpa dependensi tambahan.
+
+``collectstatic`` memakai ``CompressedManifestStaticFilesStorage``: nama file
+diberi hash isi (``style.3f2a9c1d.css``) lalu setiap aset teks ditulis juga
+sebagai ``.gz`` dan, bila paket ``brotli`` terpasang, ``.br``. Middleware
+``StaticFilesMiddleware`` melayani isi ``STATIC_ROOT`` langsung dari proses
+aplikasi: varian terkompresi dipilih sesuai ``Accept-Encoding`` dan file ber-hash
+dikirim dengan ``Cache-Control: public, max-age=31536000, immutable`` sehingga
+kunjungan berikutnya tidak perlu memvalidasi ulang.
+"""
+from __future__ import annotations
+
+import gzip
+import mimetypes
+import os
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, HttpResponseNotAllowed
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".map", ".svg", ".html", ".txt", ".json", ".xml", ".ico", ".ttf"}
+_MIN_SIZE = 256
+_IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def compress_file(path: Path) -> list[str]:
+    """Tulis ``path.gz`` (dan ``path.br``) bila hasilnya cukup lebih kecil; kembalikan sufiks yang ditulis."""
+    if path.suffix.lower() not in COMPRESSIBLE_EXTENSIONS:
+        return []
+    data = path.read_bytes()
+    if len(data) < _MIN_SIZE:
+        return []
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    brotli = _brotli()
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    written = []
+    for suffix, compressed in variants.items():
+        # Simpan hanya bila hemat minimal 5%; sisanya tidak sebanding dengan biaya dekompresi.
+        if len(compressed) < len(data) * 0.95:
+            path.with_name(path.name + suffix).write_bytes(compressed)
+            written.append(suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage yang juga menulis varian ``.gz``/``.br`` setelah ``collectstatic``.
+
+    Tanpa manifest (pengembangan atau tes sebelum ``collectstatic``) URL jatuh ke nama
+    asli alih-alih gagal.
+    """
+
+    def url(self, name, force=False):
+        if not force and not self.hashed_files:
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        names = {*paths, *self.hashed_files.values()}
+        for name in sorted(names):
+            if self.exists(name):
+                compress_file(Path(self.path(name)))
+
+
+def _hashed_names() -> set[str]:
+    hashed_files = getattr(staticfiles_storage, "hashed_files", None) or {}
+    return set(hashed_files.values())
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """Layani ``STATIC_URL`` dari ``STATIC_ROOT`` dengan varian terkompresi dan header cache panjang."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        self.prefix = "/" + settings.STATIC_URL.lstrip("/")
+        self.root = Path(settings.STATIC_ROOT).resolve() if settings.STATIC_ROOT else None
+        self.hashed = _hashed_names()
+        self.max_age = getattr(settings, "PAYROLL_STATIC_MAX_AGE", 3600)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self._serve(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        response = self._serve(request)
+        return response if response is not None else await self.get_response(request)
+
+    def _resolve(self, path: str) -> Path | None:
+        if self.root is None or not path.startswith(self.prefix):
+            return None
+        name = path[len(self.prefix):]
+        if not name or Path(name).suffix in (".gz", ".br"):
+            return None
+        target = (self.root / name).resolve()
+        if self.root not in target.parents or not target.is_file():
+            return None
+        return target
+
+    def _serve(self, request):
+        target = self._resolve(request.path_info)
+        if target is None:
+            return None
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        name = target.relative_to(self.root).as_posix()
+        immutable = name in self.hashed
+        stat = target.stat()
+        if not immutable:
+            not_modified = get_conditional_response(request, last_modified=int(stat.st_mtime))
+            if not_modified is not None:
+                self._cache_headers(not_modified, immutable, stat)
+                return not_modified
+
+        accepted = _accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        served, encoding = target, None
+        for suffix, token in ((".br", "br"), (".gz", "gzip")):
+            variant = target.with_name(target.name + suffix)
+            if token in accepted and variant.is_file():
+                served, encoding = variant, token
+                break
+        content_type, _ = mimetypes.guess_type(target.name)
+        response = FileResponse(served.open("rb"), content_type=content_type or "application/octet-stream")
+        response.headers.pop("Content-Disposition", None)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        if target.with_name(target.name + ".gz").is_file() or target.with_name(target.name + ".br").is_file():
+            patch_vary_headers(response, ["Accept-Encoding"])
+        self._cache_headers(response, immutable, stat)
+        return response
+
+    def _cache_headers(self, response, immutable: bool, stat: os.stat_result) -> None:
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        response["Cache-Control"] = _IMMUTABLE if immutable else f"public, max-age={self.max_age}"
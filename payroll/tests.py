@@ -1,3 +1,1436 @@
-from django.test import TestCase
-
-# Create your tests here.
+import asyncio
+import gzip
+import hmac
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import ROUND_HALF_EVEN, Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import db_router, metrics, portal, rollover, search, staticfiles, views
+from .management.commands import loadtest
+from .backends import get_backend
+from .calculation import batch_totals, from_sen, to_sen
+from .catalog import active_components, component_version
+from .concurrency import PeriodBusyError, period_lock
+from .db_router import REPLICA, current_route
+from .integrity import period_drift, verify_integrity
+from .mailing import SlipMailingError, queued_periods, send_period_slips
+from .models import (
+    Employee,
+    EmployeeComponentOverride,
+    IdempotencyKey,
+    PayrollComponent,
+    PayrollEntry,
+    PayrollEntryItem,
+    PayrollPeriod,
+    PeriodLock,
+    School,
+    SchoolRollup,
+    SlipDelivery,
+    User,
+)
+from .reports import component_differences, employee_differences
+from .portal import portal_version
+from .search import fulltext_backend, search_employees
+from .rollups import refresh_rollups
+from .services import (
+    PayrollGenerationError,
+    add_employee_payroll_entry,
+    apply_component_to_period,
+    generate_payroll,
+    refresh_entry_totals,
+)
+
+
+class PayrollTestCase(TestCase):
+    """Satu sekolah dengan admin, tiga komponen, dan beberapa pegawai aktif."""
+
+    employee_count = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(name="SD Uji", code="SDU")
+        cls.admin = User.objects.create_user(
+            username="admin", password="rahasia", role=User.ROLE_SCHOOL_ADMIN, school=cls.school
+        )
+        cls.basic = PayrollComponent.objects.create(
+            school=cls.school,
+            name="Gaji Pokok",
+            code="GPOK",
+            component_type=PayrollComponent.TYPE_EARNING,
+            default_amount=Decimal("1000000"),
+        )
+        cls.transport = PayrollComponent.objects.create(
+            school=cls.school,
+            name="Transport",
+            code="TRANS",
+            component_type=PayrollComponent.TYPE_EARNING,
+            is_fixed=False,
+            default_amount=Decimal("50000"),
+        )
+        cls.bpjs = PayrollComponent.objects.create(
+            school=cls.school,
+            name="BPJS",
+            code="BPJS",
+            component_type=PayrollComponent.TYPE_DEDUCTION,
+            default_amount=Decimal("100000"),
+        )
+        cls.employees = [
+            Employee.objects.create(
+                school=cls.school,
+                full_name=f"Pegawai {index}",
+                nip=f"NIP{index}",
+                email=f"pegawai{index}@sekolah.test",
+                employee_type=Employee.TYPE_TEACHER,
+            )
+            for index in range(cls.employee_count)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def make_period(self, month=9, year=2026, generate=True) -> PayrollPeriod:
+        period = PayrollPeriod.objects.create(school=self.school, year=year, month=month)
+        if generate:
+            generate_payroll(period=period, method="manual", school=self.school, user=self.admin)
+        return period
+
+    def finalize(self, period: PayrollPeriod) -> PayrollPeriod:
+        self.client.post(reverse("period_finalize", args=[period.pk]), {"idempotency_key": f"final-{period.pk}"})
+        period.refresh_from_db()
+        self.assertEqual(period.status, PayrollPeriod.STATUS_FINAL)
+        return period
+
+
+class PeriodLockTests(PayrollTestCase):
+    def test_delete_draft_period(self):
+        period = self.make_period()
+        response = self.client.post(reverse("period_delete", args=[period.pk]))
+        self.assertRedirects(response, reverse("period_list"))
+        self.assertFalse(PayrollPeriod.objects.filter(pk=period.pk).exists())
+        self.assertFalse(PayrollEntry.objects.filter(period_id=period.pk).exists())
+        self.assertFalse(PeriodLock.objects.exists())
+
+    def test_lock_taken_over_rolls_back(self):
+        period = self.make_period(generate=False)
+        with self.assertRaises(PeriodBusyError):
+            with period_lock(period.pk, "edit") as locked:
+                locked.note = "berubah"
+                locked.save(update_fields=["note"])
+                PeriodLock.objects.filter(period_id=period.pk).update(token="proses-lain")
+        period.refresh_from_db()
+        self.assertEqual(period.note, "")
+
+    def test_busy_period_rejects_second_lock(self):
+        period = self.make_period(generate=False)
+        with period_lock(period.pk, "generate"):
+            with self.assertRaises(PeriodBusyError):
+                with period_lock(period.pk, "finalize"):
+                    pass
+
+
+class EntryQueryCountTests(PayrollTestCase):
+    """Detail gaji, tambah item, dan hapus item memakai jumlah query tetap, berapa pun komponennya."""
+
+    def setUp(self):
+        super().setUp()
+        self.period = self.make_period()
+        self.entry = self.period.entries.order_by("pk").first()
+        self.detail_url = reverse("payroll_entry_detail", args=[self.period.pk, self.entry.pk])
+        self.spare = self.add_components(1, on_entry=False)[0]
+
+    def add_components(self, count, on_entry=True):
+        start = PayrollComponent.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            components = [
+                PayrollComponent.objects.create(
+                    school=self.school,
+                    name=f"Tunjangan {start + index}",
+                    code=f"T{start + index}",
+                    component_type=PayrollComponent.TYPE_EARNING,
+                    default_amount=Decimal("1000"),
+                )
+                for index in range(count)
+            ]
+        if on_entry:
+            PayrollEntryItem.objects.bulk_create(
+                PayrollEntryItem(
+                    entry=self.entry,
+                    component=component,
+                    component_name=component.name,
+                    component_type=component.component_type,
+                    amount=component.default_amount,
+                )
+                for component in components
+            )
+            refresh_entry_totals(PayrollEntry.objects.filter(pk=self.entry.pk))
+        return components
+
+    def assertFixedQueries(self):
+        self.client.get(self.detail_url)  # katalog komponen masuk cache
+        with self.assertNumQueries(6):
+            self.assertEqual(self.client.get(self.detail_url).status_code, 200)
+        add_url = reverse(
+            "payroll_entry_add_item", args=[self.period.pk, self.entry.pk, PayrollComponent.TYPE_EARNING]
+        )
+        with self.assertNumQueries(17):
+            response = self.client.post(add_url, {"earn_add-component": self.spare.pk, "earn_add-amount": "5000"})
+        self.assertRedirects(response, self.detail_url, fetch_redirect_response=False)
+        added = self.entry.items.get(component=self.spare)
+        with self.assertNumQueries(17):
+            self.client.post(reverse("payroll_entry_delete_item", args=[self.period.pk, self.entry.pk, added.pk]))
+        self.assertFalse(PayrollEntryItem.objects.filter(pk=added.pk).exists())
+
+    def test_query_count_does_not_grow_with_components(self):
+        self.assertEqual(self.entry.items.count(), 3)
+        self.assertFixedQueries()
+        self.add_components(27)
+        self.assertEqual(self.entry.items.count(), 30)
+        self.assertFixedQueries()
+
+class IdempotencyTests(PayrollTestCase):
+    def test_duplicate_generate_is_processed_once(self):
+        period = self.make_period(generate=False)
+        url = reverse("period_generate", args=[period.pk])
+        data = {"method": "manual", "idempotency_key": "gen-1"}
+        with mock.patch.object(views, "generate_payroll", wraps=generate_payroll) as generate:
+            self.client.post(url, data)
+            response = self.client.post(url, data, follow=True)
+            self.assertEqual(generate.call_count, 1)
+            self.assertContains(response, "Permintaan ini sudah diproses.")
+            self.client.post(url, {**data, "idempotency_key": "gen-2"})
+            self.assertEqual(generate.call_count, 2)
+        self.assertEqual(IdempotencyKey.objects.filter(operation="generate").exclude(completed_at=None).count(), 2)
+
+    def test_duplicate_finalize_while_first_is_running(self):
+        period = self.make_period()
+        IdempotencyKey.objects.create(user=self.admin, operation="finalize", key="final-1", period=period)
+        response = self.client.post(
+            reverse("period_finalize", args=[period.pk]), {"idempotency_key": "final-1"}, follow=True
+        )
+        self.assertContains(response, "Permintaan yang sama masih diproses.")
+        period.refresh_from_db()
+        self.assertEqual(period.status, PayrollPeriod.STATUS_DRAFT)
+
+    def test_failed_submission_releases_its_key(self):
+        period = self.make_period()
+        with period_lock(period.pk, "generate"):
+            response = self.client.post(
+                reverse("period_finalize", args=[period.pk]), {"idempotency_key": "final-1"}, follow=True
+            )
+        self.assertNotContains(response, "Periode berhasil difinalisasi.")
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.finalize(period)
+
+
+class EntryTotalsTests(PayrollTestCase):
+    """Total entry dihitung dari item di database setelah kunci periode diperoleh."""
+
+    def setUp(self):
+        super().setUp()
+        self.period = self.make_period()
+        self.entry = PayrollEntry.objects.filter(period=self.period).order_by("pk").first()
+        self.deduction = self.entry.items.get(component_type=PayrollComponent.TYPE_DEDUCTION)
+
+    @contextmanager
+    def concurrent_edit(self):
+        """Ubah item lain tepat sebelum kunci diambil, seperti edit yang baru saja di-commit proses lain."""
+
+        @contextmanager
+        def lock_after_edit(*args, **kwargs):
+            PayrollEntryItem.objects.filter(pk=self.deduction.pk).update(amount=Decimal("250000"))
+            with period_lock(*args, **kwargs) as locked:
+                yield locked
+
+        with mock.patch.object(views, "period_lock", lock_after_edit):
+            yield
+
+    def assertTotalsMatchItems(self):
+        self.assertEqual(period_drift(self.period.pk), [])
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.total_deductions, Decimal("250000"))
+
+    def test_add_item(self):
+        url = reverse(
+            "payroll_entry_add_item", args=[self.period.pk, self.entry.pk, PayrollComponent.TYPE_EARNING]
+        )
+        with self.concurrent_edit():
+            self.client.post(url, {"earn_add-component": self.transport.pk, "earn_add-amount": "75000"})
+        self.assertTrue(self.entry.items.filter(component=self.transport, amount=Decimal("75000")).exists())
+        self.assertTotalsMatchItems()
+
+    def test_delete_item(self):
+        earning = self.entry.items.filter(component_type=PayrollComponent.TYPE_EARNING).first()
+        url = reverse("payroll_entry_delete_item", args=[self.period.pk, self.entry.pk, earning.pk])
+        with self.concurrent_edit():
+            self.client.post(url)
+        self.assertFalse(PayrollEntryItem.objects.filter(pk=earning.pk).exists())
+        self.assertTotalsMatchItems()
+
+    def test_edit_amounts(self):
+        items = list(self.entry.items.all())
+        earning = next(item for item in items if item.component_type == PayrollComponent.TYPE_EARNING)
+        data = {
+            "items-TOTAL_FORMS": len(items),
+            "items-INITIAL_FORMS": len(items),
+            "items-MIN_NUM_FORMS": 0,
+            "items-MAX_NUM_FORMS": 1000,
+        }
+        for index, item in enumerate(items):
+            data[f"items-{index}-id"] = item.pk
+            data[f"items-{index}-entry"] = self.entry.pk
+            data[f"items-{index}-amount"] = "1200000" if item.pk == earning.pk else item.amount
+        with self.concurrent_edit():
+            self.client.post(reverse("payroll_entry_detail", args=[self.period.pk, self.entry.pk]), data)
+        earning.refresh_from_db()
+        self.assertEqual(earning.amount, Decimal("1200000"))
+        self.assertTotalsMatchItems()
+
+
+class CacheHeaderTests(PayrollTestCase):
+    def assertRevalidated(self, url):
+        # Kunjungan pertama memasang cookie CSRF yang ikut menjadi bagian ETag halaman.
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        self.assertIn("Last-Modified", response)
+        repeat = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat["Cache-Control"], "private, no-cache")
+
+    def test_final_pages_are_revalidated(self):
+        period = self.finalize(self.make_period())
+        entry = period.entries.first()
+        self.assertRevalidated(reverse("period_detail", args=[period.pk]))
+        self.assertRevalidated(reverse("payroll_entry_detail", args=[period.pk, entry.pk]))
+
+    def test_draft_pages_are_revalidated(self):
+        period = self.make_period()
+        entry = period.entries.first()
+        self.assertRevalidated(reverse("period_detail", args=[period.pk]))
+        self.assertRevalidated(reverse("payroll_entry_detail", args=[period.pk, entry.pk]))
+
+
+class PortalTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        self.period = self.finalize(self.make_period())
+        self.user = User.objects.create_user(
+            username="pegawai", password="rahasia", role=User.ROLE_EMPLOYEE, school=self.school
+        )
+        self.link(self.employees[0])
+        self.client.force_login(self.user)
+
+    def link(self, employee, user=None):
+        employee.user = user or self.user
+        employee.save()
+
+    def entry_of(self, employee) -> PayrollEntry:
+        return PayrollEntry.objects.get(period=self.period, employee=employee)
+
+    def listed_entries(self):
+        response = self.client.get(reverse("portal_slip_list"))
+        return [slip["entry_id"] for slip in response.context["slips"]]
+
+    def test_slip_pdf_is_revalidated(self):
+        url = reverse("portal_slip_pdf", args=[self.entry_of(self.employees[0]).pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        repeat = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_relinking_employee_refreshes_listing(self):
+        old_entry = self.entry_of(self.employees[0])
+        self.assertEqual(self.listed_entries(), [old_entry.pk])
+        old_etag = self.client.get(reverse("portal_slip_pdf", args=[old_entry.pk]))["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.employees[0].user = None
+            self.employees[0].save()
+            self.link(self.employees[1])
+
+        self.assertEqual(self.listed_entries(), [self.entry_of(self.employees[1]).pk])
+        response = self.client.get(reverse("portal_slip_pdf", args=[old_entry.pk]), HTTP_IF_NONE_MATCH=old_etag)
+        self.assertEqual(response.status_code, 404)
+
+    def test_saving_without_relinking_keeps_cache(self):
+        self.listed_entries()
+        # Cache hit: query yang tersisa hanya memuat sesi dan user.
+        with self.assertNumQueries(2):
+            self.listed_entries()
+        employee = Employee.objects.get(pk=self.employees[0].pk)
+        employee.position = "Wali kelas"
+        employee.save()
+        with self.assertNumQueries(2):
+            self.listed_entries()
+
+    def test_renaming_employee_or_school_refreshes_slip(self):
+        url = reverse("portal_slip_pdf", args=[self.entry_of(self.employees[0]).pk])
+        etag = self.client.get(url)["ETag"]
+        for instance, field in ((Employee.objects.get(pk=self.employees[0].pk), "full_name"), (self.school, "name")):
+            with self.subTest(field=field), self.captureOnCommitCallbacks(execute=True):
+                setattr(instance, field, getattr(instance, field) + " Baru")
+                instance.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            School.objects.get(pk=self.school.pk).save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_cache_timeout_default_matches_settings(self):
+        with override_settings():
+            del settings.PAYROLL_PORTAL_CACHE_TIMEOUT
+            default = portal._timeout()
+        self.assertEqual(default, settings.PAYROLL_PORTAL_CACHE_TIMEOUT)
+
+
+def _decimal_sum(amounts) -> Decimal:
+    """Jalur acuan: kuantisasi ke sen (seperti DecimalField) lalu jumlahkan sebagai Decimal."""
+    cent = Decimal("0.01")
+    return sum((Decimal(amount).quantize(cent, rounding=ROUND_HALF_EVEN) for amount in amounts), Decimal("0"))
+
+
+class CalculationKernelTests(SimpleTestCase):
+    EARNING = PayrollComponent.TYPE_EARNING
+    DEDUCTION = PayrollComponent.TYPE_DEDUCTION
+
+    def test_to_sen_rounds_half_even(self):
+        cases = {
+            "0.005": 0,
+            "0.015": 2,
+            "0.025": 2,
+            "0.035": 4,
+            "1.125": 112,
+            "1.135": 114,
+            "-0.005": 0,
+            "-0.015": -2,
+            "-1.125": -112,
+        }
+        for amount, expected in cases.items():
+            with self.subTest(amount=amount):
+                self.assertEqual(to_sen(amount), expected)
+                self.assertEqual(from_sen(to_sen(amount)), _decimal_sum([amount]))
+
+    def test_to_sen_accepts_int_str_and_large_values(self):
+        self.assertEqual(to_sen(1500000), 150000000)
+        self.assertEqual(to_sen("2750000.50"), 275000050)
+        largest = Decimal("9999999999.99")  # batas max_digits=12 PayrollEntryItem.amount
+        self.assertEqual(to_sen(largest), 999999999999)
+        self.assertEqual(to_sen(-largest), -999999999999)
+        self.assertEqual(from_sen(to_sen(largest)), largest)
+
+    def test_batch_totals_match_decimal_path(self):
+        rng = random.Random(20261019)
+        rows = []
+        for _ in range(2000):
+            amount = Decimal(rng.randrange(-10**9, 10**12)).scaleb(-3)
+            rows.append((rng.randrange(1, 40), rng.choice([self.EARNING, self.DEDUCTION]), amount))
+        totals = batch_totals(rows)
+        for entry_id, earnings, deductions, net_pay in totals:
+            with self.subTest(entry_id=entry_id):
+                expected_earnings = _decimal_sum(a for e, t, a in rows if e == entry_id and t == self.EARNING)
+                expected_deductions = _decimal_sum(a for e, t, a in rows if e == entry_id and t == self.DEDUCTION)
+                self.assertEqual(earnings, expected_earnings)
+                self.assertEqual(deductions, expected_deductions)
+                self.assertEqual(net_pay, expected_earnings - expected_deductions)
+
+    def test_batch_totals_large_and_negative_totals(self):
+        largest = Decimal("9999999999.99")
+        rows = [(1, self.EARNING, largest)] * 1000 + [(2, self.DEDUCTION, largest), (2, self.EARNING, "0.01")]
+        totals = dict((entry_id, rest) for entry_id, *rest in batch_totals(rows, entry_ids=[3]))
+        self.assertEqual(totals[1], [largest * 1000, Decimal("0.00"), largest * 1000])
+        self.assertEqual(totals[2], [Decimal("0.01"), largest, Decimal("0.01") - largest])
+        self.assertEqual(totals[3], [Decimal("0.00")] * 3)
+        self.assertEqual(batch_totals(rows).sen(2), (1, 999999999999, 1 - 999999999999))
+
+
+class AsyncResponseTests(PayrollTestCase):
+    employee_count = 5
+
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.admin)
+        self.period = self.make_period()
+
+    @override_settings(PAYROLL_EXPORT_BATCH_SIZE=2)
+    def test_export_streams_every_entry_in_bounded_queries(self):
+        async def consume(response):
+            return b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+        # Sesi, user, sekolah, periode, kode kolom; lalu tiga batch (entry, item, komponen) dan satu
+        # batch kosong penutup. Jumlah query tumbuh per batch, bukan per entry.
+        with self.assertNumQueries(15):
+            response = self.client.get(reverse("period_export", args=[self.period.pk]))
+            content = async_to_sync(consume)(response)
+        self.assertEqual(response.status_code, 200)
+        for employee in self.employees:
+            self.assertIn(employee.full_name, content)
+
+    async def test_slow_slip_render_keeps_event_loop_responsive(self):
+        entry = await PayrollEntry.objects.filter(period=self.period).afirst()
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        def slow_render(data):
+            time.sleep(0.3)
+            return b"%PDF-1.4 uji"
+
+        with mock.patch.object(views, "render_slip_pdf", slow_render):
+            beat = asyncio.create_task(heartbeat())
+            response = await self.async_client.get(reverse("payroll_entry_pdf", args=[self.period.pk, entry.pk]))
+            beat.cancel()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"%PDF-1.4 uji")
+        # Render memblokir 0,3 detik di thread pool; event loop tetap berdetak selama itu.
+        self.assertGreaterEqual(ticks, 15)
+
+
+class EmployeeSearchTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        self.siti = Employee.objects.create(
+            school=self.school,
+            full_name="Siti Rahmawati",
+            nip="19870412",
+            email="Siti.R@Sekolah.test",
+            employee_type=Employee.TYPE_STAFF,
+        )
+
+    def found(self, query):
+        return set(search_employees(self.school.employees.all(), query).values_list("full_name", flat=True))
+
+    def test_prefix_matches_name_nip_and_email(self):
+        self.assertEqual(self.found("siTI"), {"Siti Rahmawati"})
+        self.assertEqual(self.found("1987"), {"Siti Rahmawati"})
+        self.assertEqual(self.found("siti.r@"), {"Siti Rahmawati"})
+        self.assertEqual(self.found("pegawai"), {f"Pegawai {index}" for index in range(self.employee_count)})
+        self.assertEqual(self.found("  "), {employee.full_name for employee in self.school.employees.all()})
+
+    def test_substring_uses_fulltext_index(self):
+        if not fulltext_backend():
+            self.skipTest("SQLite tanpa tokenizer FTS5 trigram.")
+        self.assertEqual(self.found("rahma"), {"Siti Rahmawati"})
+        self.assertEqual(self.found("ra"), set())  # di bawah 3 karakter hanya prefiks
+
+    def test_postgres_substring_is_index_friendly(self):
+        with mock.patch.object(search, "fulltext_backend", return_value="trigram"):
+            sql = str(search_employees(Employee.objects.all(), "rahma").query)
+        self.assertIn('"full_name" ILIKE %rahma%', sql)
+        self.assertNotIn("UPPER(", sql)
+
+    def test_autocomplete(self):
+        response = self.client.get(reverse("employee_autocomplete"), {"q": "siti"})
+        self.assertEqual(response.json(), {"results": [{"id": self.siti.pk, "text": "Siti Rahmawati (19870412)"}]})
+
+
+class ComponentCatalogTests(PayrollTestCase):
+    def test_catalog_is_cached_until_a_component_changes(self):
+        self.assertEqual([c.code for c in active_components(self.school.pk)], ["BPJS", "GPOK", "TRANS"])
+        with self.assertNumQueries(0):
+            cached = active_components(self.school.pk)
+        self.assertEqual([c.default_amount for c in cached], [Decimal("100000"), Decimal("1000000"), Decimal("50000")])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.transport.is_active = False
+            self.transport.save()
+        self.assertEqual([c.code for c in active_components(self.school.pk)], ["BPJS", "GPOK"])
+
+    def test_version_bumps_only_after_commit(self):
+        before = component_version(self.school.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.basic.default_amount = Decimal("1250000")
+            self.basic.save()
+            self.assertEqual(component_version(self.school.pk), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(component_version(self.school.pk), before)
+
+    def test_evicted_version_does_not_revive_stale_entries(self):
+        before = component_version(self.school.pk)
+        active_components(self.school.pk)
+        cache.delete(f"payroll:component-version:{self.school.pk}")
+        self.assertNotEqual(component_version(self.school.pk), before)
+        with self.assertNumQueries(1):
+            active_components(self.school.pk)
+
+
+class RolloverTests(PayrollTestCase):
+    def run_rollover(self, **kwargs):
+        return rollover.run_rollover(
+            year=2026, month=10, batch_size=1, pause=0, lease=timedelta(minutes=5), **kwargs
+        )
+
+    def test_schools_are_not_opted_in_by_default(self):
+        school = School.objects.create(name="SMP Baru", code="SMPB")
+        self.assertEqual(school.rollover_method, School.ROLLOVER_NONE)
+        run = self.run_rollover()
+        self.assertEqual(run.created_count, 0)
+        self.assertFalse(PayrollPeriod.objects.filter(year=2026, month=10).exists())
+
+    def test_failing_school_is_recorded_and_run_continues(self):
+        self.make_period(month=9)
+        School.objects.filter(pk=self.school.pk).update(rollover_method=School.ROLLOVER_COPY)
+        broken = School.objects.create(name="SD Rusak", code="SDR", rollover_method=School.ROLLOVER_MANUAL)
+        later = School.objects.create(name="SD Akhir", code="SDA", rollover_method=School.ROLLOVER_MANUAL)
+        PayrollComponent.objects.create(
+            school=later, name="Gaji Pokok", code="GPOK", component_type=PayrollComponent.TYPE_EARNING
+        )
+        Employee.objects.create(
+            school=later, full_name="Pegawai Akhir", email="akhir@sekolah.test", employee_type=Employee.TYPE_STAFF
+        )
+        real_generate = rollover.generate_payroll
+
+        def flaky_generate(**kwargs):
+            if kwargs["school"].pk == broken.pk:
+                raise RuntimeError("koneksi terputus")
+            return real_generate(**kwargs)
+
+        with mock.patch.object(rollover, "generate_payroll", flaky_generate), self.assertLogs("payroll.rollover"):
+            run = self.run_rollover()
+
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual((run.created_count, run.generated_count, run.failed_count), (3, 2, 1))
+        self.assertEqual(run.errors, [{"school": broken.pk, "message": "koneksi terputus"}])
+        copied = PayrollPeriod.objects.get(school=self.school, year=2026, month=10)
+        self.assertEqual(copied.entries.count(), self.employee_count)
+        self.assertTrue(PayrollPeriod.objects.filter(school=later, year=2026, month=10).exists())
+
+        rerun = self.run_rollover()
+        self.assertEqual(rerun.generated_count, 2)
+
+    def test_copy_uses_the_latest_final_period_only(self):
+        School.objects.filter(pk=self.school.pk).update(rollover_method=School.ROLLOVER_COPY)
+        final = self.finalize(self.make_period(month=8))
+        PayrollEntryItem.objects.filter(entry__period=final, component=self.transport).update(amount=Decimal("75000"))
+        draft = self.make_period(month=9)
+        PayrollEntryItem.objects.filter(entry__period=draft, component=self.transport).update(amount=Decimal("99000"))
+
+        self.assertEqual(rollover._source_period(self.school, 2026, 10), final)
+        self.run_rollover()
+        amounts = PayrollEntryItem.objects.filter(
+            entry__period__year=2026, entry__period__month=10, component=self.transport
+        ).values_list("amount", flat=True)
+        self.assertEqual(set(amounts), {Decimal("75000")})
+
+
+class RolloverMigrationTests(TransactionTestCase):
+    before = [("payroll", "0009_slip_delivery")]
+    after = [("payroll", "0010_school_rollover_opt_in")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_existing_schools_are_opted_out(self):
+        apps = self.migrate(self.before)
+        # Versi awal 0008 mengisi 'copy' untuk setiap sekolah.
+        apps.get_model("payroll", "School").objects.create(name="SD Lama", code="SDL", rollover_method="copy")
+        self.migrate(self.after)
+        school = School.objects.get(code="SDL")
+        self.assertEqual(school.rollover_method, School.ROLLOVER_NONE)
+        run = rollover.run_rollover(year=2026, month=10, batch_size=10, pause=0, lease=timedelta(minutes=5))
+        self.assertEqual(run.created_count, 0)
+        self.assertFalse(school.periods.exists())
+
+
+class SchoolOverviewTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        self.superadmin = User.objects.create_user(username="pusat", password="rahasia", role=User.ROLE_SUPER_ADMIN)
+        self.client.force_login(self.superadmin)
+        self.other = School.objects.create(name="SMP Lain", code="SMPL")
+        self.make_period()
+        self.routes = []
+
+    def refresh(self, data=None):
+        def tracked_refresh(school_ids=None):
+            self.routes.append(current_route())
+            return refresh_rollups(school_ids)
+
+        with mock.patch.object(views, "refresh_rollups", tracked_refresh):
+            return self.client.post(reverse("school_overview_refresh"), data or {})
+
+    def test_refresh_one_school_on_primary(self):
+        response = self.refresh({"school": self.school.pk})
+        self.assertRedirects(response, reverse("school_overview"))
+        self.assertNotIn(REPLICA, self.routes)
+        rollup = SchoolRollup.objects.get(school=self.school)
+        self.assertEqual(rollup.active_employee_count, self.employee_count)
+        self.assertFalse(SchoolRollup.objects.filter(school=self.other).exists())
+
+    def test_refresh_without_school_fills_missing_rollups_only(self):
+        refresh_rollups([self.school.pk])
+        refreshed_at = SchoolRollup.objects.get(school=self.school).refreshed_at
+        self.refresh()
+        self.assertEqual(SchoolRollup.objects.get(school=self.school).refreshed_at, refreshed_at)
+        self.assertTrue(SchoolRollup.objects.filter(school=self.other).exists())
+
+    def test_overview_is_read_only(self):
+        refresh_rollups()
+        response = self.client.get(reverse("school_overview"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["totals"]["schools"], 2)
+        self.assertEqual(self.client.post(reverse("school_overview")).status_code, 405)
+
+
+class MetricsTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(PAYROLL_METRICS_MULTIPROC_DIR=self.directory, PAYROLL_METRICS_TOKEN="rahasia")
+        override.enable()
+        self.addCleanup(override.disable)
+        metrics.registry._flusher_pid = None
+        self.addCleanup(setattr, metrics.registry, "_flusher_pid", None)
+
+    def scrape(self):
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer rahasia")
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def write_snapshot(self, pid, count):
+        snapshot = {"payroll_pdf_render_seconds": [[[], {"buckets": [count] + [0] * 12, "sum": 0.0, "count": count}]]}
+        path = os.path.join(self.directory, f"metrics-{pid}.json")
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(snapshot, handle)
+        return path
+
+    def test_requests_do_not_write_snapshots(self):
+        with mock.patch.object(metrics.threading, "Thread") as thread, mock.patch.object(
+            metrics.registry, "flush"
+        ) as flush:
+            self.client.get(reverse("period_list"))
+            self.client.get(reverse("period_list"))
+        flush.assert_not_called()
+        thread.assert_called_once_with(target=metrics.registry._flush_loop, name="payroll-metrics-flush", daemon=True)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_scrape_merges_live_workers_and_prunes_dead_ones(self):
+        own = metrics.PDF_RENDER_SECONDS.values.get((), {}).get("count", 0)
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        dead_path = self.write_snapshot(dead.pid, 1000)
+        self.write_snapshot(os.getppid(), 7)
+
+        body = self.scrape()
+        self.assertIn(f"payroll_pdf_render_seconds_count {own + 7}", body)
+        self.assertIn("payroll_http_requests_total{", body)
+        self.assertFalse(os.path.exists(dead_path))
+
+    def test_token_is_compared_in_constant_time(self):
+        self.client.logout()
+        with mock.patch("payroll.views.hmac.compare_digest", wraps=hmac.compare_digest) as compare:
+            self.scrape()
+        compare.assert_called_once_with(b"Bearer rahasia", b"Bearer rahasia")
+        for header in ("Bearer salah", "Bearer rahasiä", ""):
+            with self.subTest(header=header):
+                response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION=header)
+                self.assertEqual(response.status_code, 403)
+
+
+class SessionTests(PayrollTestCase):
+    def test_db_sessions_by_default_and_flash_messages_in_cookie(self):
+        self.assertEqual(settings.SESSION_ENGINE, "django.contrib.sessions.backends.db")
+        self.client.logout()
+        self.assertTrue(self.client.login(username="admin", password="rahasia"))
+        session = Session.objects.get()
+        period = self.make_period()
+
+        response = self.client.post(reverse("period_finalize", args=[period.pk]), {"idempotency_key": "sesi"})
+        self.assertIn("messages", response.cookies)
+        self.assertEqual(Session.objects.get().session_data, session.session_data)
+        page = self.client.get(response.url)
+        self.assertContains(page, "Periode berhasil difinalisasi.")
+
+
+class ProfilingTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        User.objects.filter(pk=self.admin.pk).update(is_staff=True)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(PAYROLL_PROFILING_ENABLED=True, PAYROLL_PROFILE_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.directory = directory.name
+        self.async_client.force_login(self.admin)
+        self.period = self.make_period()
+
+    def summary(self, response) -> str:
+        path = os.path.join(self.directory, response["X-Profile-Id"])
+        with open(path.replace(".prof", ".txt"), encoding="utf-8") as handle:
+            return handle.read()
+
+    def test_wsgi_request_is_profiled(self):
+        response = self.client.get(reverse("period_list"), {"profile": "1"})
+        self.assertIn("period_list", self.summary(response))
+
+    async def test_asgi_profiles_sync_view_in_its_own_thread(self):
+        response = await self.async_client.get(reverse("period_detail", args=[self.period.pk]), {"profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        summary = await asyncio.to_thread(self.summary, response)
+        self.assertIn("period_detail", summary)
+        self.assertNotIn("base_events.py", summary)
+
+    async def test_asgi_skips_async_views(self):
+        entry = await PayrollEntry.objects.filter(period=self.period).afirst()
+        url = reverse("payroll_entry_pdf", args=[self.period.pk, entry.pk])
+        response = await self.async_client.get(url, {"profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class BackendRegistryTests(SimpleTestCase):
+    def test_default_backends(self):
+        data = {
+            "period_label": "09/2026",
+            "employee_name": "Pegawai",
+            "employee_type": "Guru",
+            "earnings": [("Gaji Pokok", Decimal("1000000"))],
+            "deductions": [],
+            "net_pay": Decimal("1000000"),
+        }
+        self.assertTrue(get_backend("slip").render(data).startswith(b"%PDF"))
+        export = get_backend("export")
+        self.assertEqual(export.extension, "csv")
+        row = (1, "NIP0", "Pegawai", "p@sekolah.test", {"GPOK": Decimal("10")}, Decimal("10"), 0, Decimal("10"))
+        self.assertEqual(export.render_rows(["GPOK", "BPJS"], [row]), "NIP0,Pegawai,p@sekolah.test,10,0,10,0,10\r\n")
+
+    @override_settings(PAYROLL_BACKENDS={"export": "payroll.backends.xlsx"})
+    def test_setting_overrides_one_role(self):
+        self.assertEqual(get_backend("export").__name__, "payroll.backends.xlsx")
+        self.assertEqual(get_backend("slip").__name__, "payroll.backends.pdf")
+
+    def test_unknown_role(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_backend("fax")
+
+    def test_xlsx_reader_closes_the_workbook(self):
+        from openpyxl import Workbook
+
+        upload = BytesIO()
+        sheet = Workbook()
+        sheet.active.append(["email", "component_code", "amount"])
+        sheet.active.append(["pegawai0@sekolah.test", "TRANS", 75000])
+        sheet.save(upload)
+        upload.seek(0)
+        reader = get_backend("import")
+        opened = []
+
+        def load_workbook(*args, **kwargs):
+            opened.append(real_load(*args, **kwargs))
+            return opened[-1]
+
+        real_load = reader.load_workbook
+        with mock.patch.object(reader, "load_workbook", load_workbook):
+            rows = list(reader.read_rows(upload))
+        self.assertEqual(rows[1], ("pegawai0@sekolah.test", "TRANS", 75000))
+        self.assertIsNone(opened[0]._archive.fp)
+
+    def test_heavy_libraries_load_lazily(self):
+        code = (
+            "import sys, django; django.setup(); import payroll.urls; "
+            "print(sorted(name for name in ('reportlab', 'openpyxl') if name in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "payroll_site.settings"},
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+class ComponentOverrideTests(PayrollTestCase):
+    def override(self, employee, component, amount, effective_from=None, effective_until=None):
+        return EmployeeComponentOverride.objects.create(
+            employee=employee,
+            component=component,
+            amount=Decimal(amount),
+            effective_from=effective_from,
+            effective_until=effective_until,
+        )
+
+    def amount(self, period, employee, component):
+        return period.entries.get(employee=employee).items.get(component=component).amount
+
+    def test_generation_applies_the_override_in_effect(self):
+        first, second = self.employees[:2]
+        self.override(first, self.basic, "2000000")
+        self.override(first, self.basic, "2500000", effective_from=date(2026, 8, 20))
+        self.override(first, self.basic, "9999999", effective_from=date(2026, 10, 1))
+        self.override(second, self.basic, "0", effective_until=date(2026, 8, 1))
+
+        period = self.make_period(month=9)
+        # Override terbaru yang sudah berlaku menang; tanggal dibulatkan ke awal bulan.
+        self.assertEqual(self.amount(period, first, self.basic), Decimal("2500000"))
+        self.assertEqual(self.amount(period, first, self.bpjs), Decimal("100000"))
+        # Override yang sudah berakhir tidak dipakai.
+        self.assertEqual(self.amount(period, second, self.basic), Decimal("1000000"))
+        self.assertEqual(period.entries.get(employee=first).net_pay, Decimal("2400000"))
+
+    def test_added_employee_gets_override(self):
+        period = self.make_period(generate=False)
+        employee = self.employees[0]
+        self.override(employee, self.bpjs, "150000")
+        entry = add_employee_payroll_entry(period=period, employee=employee, school=self.school)
+        self.assertEqual(entry.total_deductions, Decimal("150000"))
+
+    def test_generation_query_count_does_not_grow_with_overrides(self):
+        def generate_queries(month):
+            period = self.make_period(month=month, generate=False)
+            with CaptureQueriesContext(connection) as context:
+                generate_payroll(period=period, method="manual", school=self.school, user=self.admin)
+            return len(context)
+
+        generate_queries(8)  # katalog komponen masuk cache
+        baseline = generate_queries(9)
+        for employee in self.employees:
+            for component in (self.basic, self.transport, self.bpjs):
+                self.override(employee, component, "1000")
+        self.assertEqual(generate_queries(10), baseline)
+
+    def test_override_form_rejects_reversed_range(self):
+        url = reverse("employee_overrides", args=[self.employees[0].pk])
+        response = self.client.post(
+            url,
+            {
+                "component": self.basic.pk,
+                "amount": "1000",
+                "effective_from": "2026-10-01",
+                "effective_until": "2026-09-01",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(EmployeeComponentOverride.objects.exists())
+        response = self.client.post(url, {"component": self.basic.pk, "amount": "1000"})
+        self.assertRedirects(response, url)
+        self.assertTrue(EmployeeComponentOverride.objects.filter(employee=self.employees[0]).exists())
+
+
+class LoadtestTests(PayrollTestCase):
+    def test_mix_parsing(self):
+        mix = loadtest._parse_mix("dashboard=3, pdf=1,generate=0")
+        self.assertEqual(mix, {"dashboard": 3.0, "pdf": 1.0, "generate": 0.0})
+        for raw in ("dashbord=1", "pdf=banyak", "pdf=0,generate=0"):
+            with self.subTest(raw=raw), self.assertRaises(CommandError):
+                loadtest._parse_mix(raw)
+
+    def test_percentile_is_nearest_rank_in_milliseconds(self):
+        values = [index / 1000 for index in range(100, 0, -1)]
+        self.assertEqual(loadtest._percentile(values, 50), 50.0)
+        self.assertEqual(loadtest._percentile(values, 99), 99.0)
+        self.assertEqual(loadtest._percentile([0.25], 95), 250.0)
+        self.assertIsNone(loadtest._percentile([], 50))
+
+    def test_item_formset_fields_are_replayed(self):
+        period = self.make_period()
+        entry = period.entries.first()
+        body = self.client.get(reverse("payroll_entry_detail", args=[period.pk, entry.pk])).content
+        parser = loadtest._FirstFormParser()
+        parser.feed(body.decode())
+        names = [name for name, _ in parser.fields]
+        self.assertIn("csrfmiddlewaretoken", names)
+        self.assertIn("items-TOTAL_FORMS", names)
+        response = self.client.post(
+            reverse("payroll_entry_detail", args=[period.pk, entry.pk]),
+            urlencode(parser.fields),
+            content_type="application/x-www-form-urlencoded",
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_write_routes_need_a_draft_period(self):
+        self.finalize(self.make_period())
+        with self.assertRaisesMessage(CommandError, "butuh periode draft"):
+            call_command(
+                "loadtest", username="admin", password="rahasia", period=PayrollPeriod.objects.get().pk, duration=0
+            )
+
+
+class GenerationStatsTests(PayrollTestCase):
+    def test_generation_records_phase_spans(self):
+        period = self.make_period(generate=False)
+        with self.assertLogs("payroll.services", "INFO") as logs:
+            generate_payroll(period=period, method="manual", school=self.school, user=self.admin)
+        period.refresh_from_db()
+        stats = period.generation_stats
+        self.assertEqual((stats["run"], stats["method"], stats["period_id"]), ("generate_payroll", "manual", period.pk))
+        self.assertEqual(stats["phases"]["load_employees"]["calls"], 1)
+        self.assertEqual(stats["phases"]["load_employees"]["rows"], 3)
+        self.assertEqual(stats["phases"]["insert_items"]["rows"], 9)
+        spans = [record.payroll_span for record in logs.records if hasattr(record, "payroll_span")]
+        self.assertEqual({span["phase"] for span in spans}, set(stats["phases"]))
+        self.assertTrue(any(hasattr(record, "payroll_run") for record in logs.records))
+
+        response = self.client.get(reverse("period_detail", args=[period.pk]))
+        self.assertContains(response, "Generate terakhir (manual)")
+        self.assertContains(response, "insert_items")
+
+    def test_spans_outside_a_run_are_not_recorded(self):
+        period = self.make_period()
+        with self.assertNoLogs("payroll.services", "INFO"):
+            add_employee_payroll_entry(
+                period=period,
+                employee=Employee.objects.create(school=self.school, full_name="Baru", nip="NIP9"),
+                school=self.school,
+            )
+
+
+class PeriodCompareTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        self.base = self.make_period(month=8)
+        self.current = self.make_period(month=9)
+        first, _, third = self.employees
+        PayrollEntryItem.objects.filter(entry__period=self.current, entry__employee=first, component=self.basic).update(
+            amount=Decimal("1200000")
+        )
+        self.current.entries.filter(employee=third).delete()
+        self.newcomer = Employee.objects.create(school=self.school, full_name="Pegawai Baru", nip="NIP9")
+        add_employee_payroll_entry(period=self.current, employee=self.newcomer, school=self.school)
+        refresh_entry_totals(self.current.entries.all())
+
+    def test_differences_are_computed_per_employee_and_component(self):
+        employees = {row["employee__full_name"]: row for row in employee_differences(self.base, self.current)}
+        self.assertEqual(set(employees), {"Pegawai 0", "Pegawai 2", "Pegawai Baru"})
+        self.assertEqual(employees["Pegawai 0"]["change"], "changed")
+        self.assertEqual(employees["Pegawai 0"]["delta"], Decimal("200000"))
+        self.assertEqual(employees["Pegawai 2"]["change"], "missing")
+        self.assertEqual(employees["Pegawai 2"]["delta"], Decimal("-900000"))
+        self.assertEqual(employees["Pegawai Baru"]["change"], "new")
+
+        components = list(component_differences(self.base, self.current))
+        changed = [row for row in components if row["entry__employee__full_name"] == "Pegawai 0"]
+        self.assertEqual([(row["component__code"], row["delta"]) for row in changed], [("GPOK", Decimal("200000"))])
+        self.assertEqual(len(components), 1 + 3 + 3)
+
+    def test_compare_view_defaults_to_previous_period_and_exports_csv(self):
+        url = reverse("period_compare", args=[self.current.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["base"], self.base)
+        self.assertEqual(response.context["totals"]["count_current"], 3)
+        response = self.client.get(url, {"with": self.base.pk, "format": "csv"})
+        rows = [line.split(",") for line in response.content.decode().splitlines()]
+        self.assertEqual(rows[0], ["pegawai", "komponen", "status", "08/2026", "09/2026", "selisih"])
+        changed = [row for row in rows if row[:3] == ["Pegawai 0", "GAJI BERSIH", "changed"]]
+        self.assertEqual([Decimal(value) for value in changed[0][3:]], [900000, 1100000, 200000])
+
+    def test_invalid_base_falls_back_to_previous_period(self):
+        response = self.client.get(reverse("period_compare", args=[self.current.pk]), {"with": "abc"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["base"], self.base)
+
+    def test_first_period_has_nothing_to_compare(self):
+        response = self.client.get(reverse("period_compare", args=[self.base.pk]))
+        self.assertRedirects(response, reverse("period_detail", args=[self.base.pk]))
+
+
+class PeriodGridTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        self.period = self.make_period()
+        self.url = reverse("period_grid", args=[self.period.pk])
+        self.first, self.second = self.period.entries.order_by("employee__full_name")[:2]
+
+    def cell(self, entry, component):
+        return entry.items.get(component=component)
+
+    def post(self, *cells):
+        data = {"page": 1}
+        for entry, component, amount, version in cells:
+            data[f"cell-{self.cell(entry, component).pk}"] = amount
+            data[f"version-{entry.pk}"] = version or entry.updated_at.isoformat()
+        return self.client.post(self.url, data, follow=True)
+
+    def test_grid_renders_every_entry(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context["rows"]), 3)
+        self.assertContains(response, f'data-name="cell-{self.cell(self.first, self.transport).pk}"')
+
+    def test_changed_cells_are_saved_and_totals_refreshed(self):
+        response = self.post(
+            (self.first, self.transport, "75000", None),
+            (self.second, self.bpjs, "0", None),
+        )
+        self.assertContains(response, "2 nominal diperbarui.")
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.first.net_pay, Decimal("975000"))
+        self.assertEqual(self.second.total_deductions, Decimal("0"))
+
+    def test_stale_entry_is_rejected(self):
+        stale = self.first.updated_at.isoformat()
+        PayrollEntry.objects.filter(pk=self.first.pk).update(updated_at=self.first.updated_at + timedelta(seconds=1))
+        response = self.post(
+            (self.first, self.transport, "75000", stale),
+            (self.second, self.transport, "60000", None),
+        )
+        self.assertContains(response, "1 nominal diperbarui.")
+        self.assertContains(response, "Perubahan untuk Pegawai 0 tidak disimpan")
+        self.assertEqual(self.cell(self.first, self.transport).amount, Decimal("0"))
+        self.assertEqual(self.cell(self.second, self.transport).amount, Decimal("60000"))
+
+    def test_redirect_keeps_only_a_numeric_page(self):
+        for page, expected in (("2", 2), ("1&next=//evil.test", 1), ("", 1)):
+            with self.subTest(page=page):
+                response = self.client.post(self.url, {"page": page})
+                self.assertRedirects(response, f"{self.url}?page={expected}", fetch_redirect_response=False)
+
+    def test_invalid_amount_saves_nothing(self):
+        response = self.post(
+            (self.first, self.transport, "75000", None),
+            (self.second, self.bpjs, "-1", None),
+        )
+        self.assertContains(response, "Nominal tidak boleh negatif.")
+        self.assertEqual(self.cell(self.first, self.transport).amount, Decimal("0"))
+
+
+class BulkComponentTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        self.period = self.make_period()
+        self.url = reverse("period_bulk_component", args=[self.period.pk])
+        Employee.objects.filter(pk=self.employees[2].pk).update(employee_type=Employee.TYPE_STAFF)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bonus = PayrollComponent.objects.create(
+                school=self.school,
+                name="Tunjangan Wali Kelas",
+                code="TWK",
+                component_type=PayrollComponent.TYPE_EARNING,
+                default_amount=Decimal("0"),
+            )
+
+    def net_pay(self):
+        return dict(self.period.entries.values_list("employee__nip", "net_pay"))
+
+    def test_add_set_and_remove_through_the_view(self):
+        data = {"component": self.bonus.pk, "amount": "200000", "employee_type": Employee.TYPE_TEACHER}
+        response = self.client.post(self.url, {**data, "action": "add"}, follow=True)
+        self.assertContains(response, "2 ditambahkan, 0 diubah, 0 dihapus")
+        expected = {"NIP0": Decimal("1100000"), "NIP1": Decimal("1100000"), "NIP2": Decimal("900000")}
+        self.assertEqual(self.net_pay(), expected)
+
+        data.update(action="set", amount="250000", employee_type="")
+        response = self.client.post(self.url, data, follow=True)
+        self.assertContains(response, "1 ditambahkan, 2 diubah, 0 dihapus")
+        self.assertEqual(set(self.net_pay().values()), {Decimal("1150000")})
+
+        response = self.client.post(self.url, {"action": "remove", "component": self.bonus.pk}, follow=True)
+        self.assertContains(response, "0 ditambahkan, 0 diubah, 3 dihapus")
+        self.assertEqual(set(self.net_pay().values()), {Decimal("900000")})
+
+    def test_add_keeps_existing_amounts(self):
+        counts = apply_component_to_period(period=self.period, component=self.bpjs, action="add", amount=Decimal("1"))
+        self.assertEqual(counts, {"created": 0, "updated": 0, "deleted": 0})
+        self.assertFalse(PayrollEntryItem.objects.filter(component=self.bpjs, amount=Decimal("1")).exists())
+
+    def test_amount_is_required_and_final_periods_are_locked(self):
+        response = self.client.post(self.url, {"action": "set", "component": self.bonus.pk})
+        self.assertContains(response, "Nominal wajib diisi untuk aksi ini.")
+        self.finalize(self.period)
+        with self.assertRaises(PayrollGenerationError):
+            apply_component_to_period(period=self.period, component=self.bonus, action="remove")
+
+
+class FragmentCacheTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        self.period = self.make_period()
+        self.url = reverse("period_detail", args=[self.period.pk])
+
+    def test_unchanged_table_does_not_load_entries(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get(self.url)
+        self.assertEqual(second.context["entry_rows"], first.context["entry_rows"])
+        self.assertFalse([query for query in context if 'INNER JOIN "payroll_employee"' in query["sql"]])
+
+    def test_changed_entry_renders_only_its_row(self):
+        self.client.get(self.url)
+        entry = self.period.entries.first()
+        entry.save()
+        with mock.patch("payroll.fragments.cache.set_many", wraps=cache.set_many) as set_many:
+            response = self.client.get(self.url)
+        (fresh,), _ = set_many.call_args
+        self.assertEqual(len(fresh), 1)
+        self.assertIn(f":period-row:{entry.pk}:", next(iter(fresh)))
+        self.assertEqual(response.context["entry_rows"].count("<tr"), 3)
+
+    def test_rename_bumps_the_table(self):
+        self.client.get(self.url)
+        employee = self.employees[0]
+        data = {
+            "full_name": "Pegawai Nol",
+            "nip": employee.nip,
+            "email": employee.email,
+            "employee_type": employee.employee_type,
+            "position": employee.position,
+            "base_salary": employee.base_salary,
+            "is_active": "on",
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("employee_edit", args=[employee.pk]), data)
+        self.assertRedirects(response, reverse("employee_list"))
+        response = self.client.get(self.url)
+        self.assertIn("Pegawai Nol", response.context["entry_rows"])
+        self.assertNotIn("<td>Pegawai 0</td>", response.context["entry_rows"])
+
+
+class StaticFilesTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        (self.root / "css").mkdir()
+        self.hashed = self.root / "css" / "style.3f2a9c1d.css"
+        self.hashed.write_text("body { margin: 0; }\n" * 50)
+        self.plain = self.root / "robots.txt"
+        self.plain.write_text("User-agent: *\n")
+        self.factory = RequestFactory()
+        self.downstream = mock.Mock(return_value=HttpResponse("aplikasi"))
+        with override_settings(STATIC_ROOT=self.root, STATIC_URL="/static/"):
+            with mock.patch.object(staticfiles, "_hashed_names", return_value={"css/style.3f2a9c1d.css"}):
+                self.middleware = staticfiles.StaticFilesMiddleware(self.downstream)
+
+    def get(self, path, **headers):
+        return self.middleware(self.factory.get(path, headers=headers))
+
+    def test_compress_file_writes_gzip_only_when_worthwhile(self):
+        self.assertEqual(staticfiles.compress_file(self.hashed)[:1], [".gz"])
+        self.assertEqual(staticfiles.compress_file(self.plain), [])
+        self.assertFalse(self.plain.with_name("robots.txt.gz").exists())
+
+    def test_hashed_file_is_immutable_and_precompressed_variant_is_chosen(self):
+        staticfiles.compress_file(self.hashed)
+        response = self.get("/static/css/style.3f2a9c1d.css", accept_encoding="gzip, deflate")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.hashed.read_bytes())
+
+        response = self.get("/static/css/style.3f2a9c1d.css", accept_encoding="gzip;q=0")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(b"".join(response.streaming_content), self.hashed.read_bytes())
+
+    def test_unhashed_file_is_revalidated(self):
+        response = self.get("/static/robots.txt")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+        response = self.get("/static/robots.txt", if_modified_since=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_paths_pass_through(self):
+        for path in ("/periods/", "/static/missing.css", "/static/../settings.py", "/static/css/style.3f2a9c1d.css.gz"):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path).content, b"aplikasi")
+        response = self.middleware(self.factory.post("/static/robots.txt"))
+        self.assertEqual(response.status_code, 405)
+
+
+@override_settings(PAYROLL_REPLICA_DATABASE="default")
+class ReplicaRouterTests(SimpleTestCase):
+    """Alias replika diarahkan ke ``default`` agar keputusan routing bisa diamati tanpa database kedua."""
+
+    def setUp(self):
+        patcher = mock.patch.dict(db_router._lag_state, checked_at=float("-inf"), ok=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+        self.routes = []
+
+        @db_router.read_replica
+        def view(request):
+            self.routes.append((current_route(), db_router.ReplicaRouter().db_for_read(School)))
+            return HttpResponse()
+
+        self.middleware = db_router.ReplicaRoutingMiddleware(view)
+
+    def test_safe_requests_read_from_the_replica(self):
+        response = self.middleware(self.factory.get("/"))
+        self.assertEqual(self.routes, [(REPLICA, "default")])
+        self.assertNotIn(db_router.STICKY_COOKIE, response.cookies)
+
+    def test_write_pins_following_reads_to_primary(self):
+        response = self.middleware(self.factory.post("/"))
+        self.assertEqual(self.routes, [(None, None)])
+        cookie = response.cookies[db_router.STICKY_COOKIE]
+        self.assertEqual(cookie["max-age"], 11)
+        request = self.factory.get("/")
+        request.COOKIES[db_router.STICKY_COOKIE] = cookie.value
+        self.middleware(request)
+        self.assertEqual(self.routes[-1], (db_router.PRIMARY, None))
+        request.COOKIES[db_router.STICKY_COOKIE] = str(int(time.time()) - 1)
+        self.middleware(request)
+        self.assertEqual(self.routes[-1], (REPLICA, "default"))
+
+    def test_write_during_a_replica_read_moves_to_primary(self):
+        with db_router.routed(REPLICA):
+            self.assertEqual(db_router.ReplicaRouter().db_for_write(School), "default")
+            self.assertEqual(current_route(), db_router.PRIMARY)
+            self.assertIsNone(db_router.ReplicaRouter().db_for_read(School))
+
+    def test_lagging_or_missing_replica_falls_back_to_primary(self):
+        with mock.patch.object(db_router, "replica_lag_seconds", return_value=30.0), self.assertLogs(
+            "payroll.db_router", "WARNING"
+        ):
+            self.middleware(self.factory.get("/"))
+        self.assertEqual(self.routes, [(REPLICA, None)])
+        with override_settings(PAYROLL_REPLICA_DATABASE="tidak-ada"):
+            self.assertFalse(db_router.replica_available())
+
+
+@override_settings(PAYROLL_SLIP_EMAIL_PAUSE=0)
+class SlipMailingTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        self.period = self.make_period()
+
+    def statuses(self):
+        return dict(SlipDelivery.objects.values_list("entry__employee__nip", "status"))
+
+    def test_only_final_periods_are_sent(self):
+        with self.assertRaises(SlipMailingError):
+            send_period_slips(self.period)
+
+    def test_each_slip_is_sent_once(self):
+        self.finalize(self.period)
+        summary = send_period_slips(self.period, workers=2, batch_size=2)
+        self.assertEqual((summary["sent"], summary["failed"], summary["batches"]), (3, 0, 2))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [e.email for e in self.employees])
+        filename, content, mimetype = mail.outbox[0].attachments[0]
+        self.assertEqual((filename, mimetype), ("slip-2026-09.pdf", "application/pdf"))
+        self.assertTrue(content.startswith(b"%PDF"))
+
+        self.assertEqual(send_period_slips(self.period)["sent"], 0)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_rerun_retries_failed_and_expired_claims_only(self):
+        Employee.objects.filter(pk=self.employees[0].pk).update(email="")
+        self.finalize(self.period)
+        summary = send_period_slips(self.period, workers=1)
+        self.assertEqual((summary["sent"], summary["failed"]), (2, 1))
+        failed = SlipDelivery.objects.get(status=SlipDelivery.STATUS_FAILED)
+        self.assertEqual(failed.last_error, "Pegawai tidak memiliki alamat email.")
+
+        Employee.objects.filter(pk=self.employees[0].pk).update(email="baru@sekolah.test")
+        SlipDelivery.objects.filter(entry__employee=self.employees[1]).update(
+            status=SlipDelivery.STATUS_SENDING, claimed_at=timezone.now()
+        )
+        SlipDelivery.objects.filter(entry__employee=self.employees[2]).update(
+            status=SlipDelivery.STATUS_SENDING, claimed_at=timezone.now() - timedelta(hours=1)
+        )
+        mail.outbox = []
+        self.assertEqual(send_period_slips(self.period)["sent"], 2)
+        recipients = sorted(message.to[0] for message in mail.outbox)
+        self.assertEqual(recipients, ["baru@sekolah.test", "pegawai2@sekolah.test"])
+        self.assertEqual(self.statuses()["NIP1"], SlipDelivery.STATUS_SENDING)
+        self.assertEqual(SlipDelivery.objects.get(entry__employee=self.employees[0]).attempts, 2)
+
+    def test_page_only_queues_and_command_sends(self):
+        self.finalize(self.period)
+        url = reverse("period_send_slips", args=[self.period.pk])
+        response = self.client.post(url, {"idempotency_key": "kirim-1"}, follow=True)
+        self.assertContains(response, "3 slip masuk antrean")
+        self.assertContains(response, "Menunggu: 3")
+        self.assertEqual(mail.outbox, [])
+
+        call_command("send_slips", queued=True, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(set(self.statuses().values()), {SlipDelivery.STATUS_SENT})
+        self.assertFalse(queued_periods().exists())
+        response = self.client.post(url, {"idempotency_key": "kirim-2"}, follow=True)
+        self.assertContains(response, "Semua slip sudah terkirim.")
+
+    def test_cancelled_period_sends_corrected_slips_again(self):
+        self.finalize(self.period)
+        send_period_slips(self.period)
+        self.client.post(reverse("period_cancel", args=[self.period.pk]), {"idempotency_key": "batal-1"})
+        self.assertFalse(SlipDelivery.objects.exists())
+        PayrollEntryItem.objects.filter(entry__period=self.period, component=self.transport).update(
+            amount=Decimal("50000")
+        )
+        refresh_entry_totals(self.period.entries.all())
+        self.client.post(reverse("period_finalize", args=[self.period.pk]), {"idempotency_key": "final-2"})
+        mail.outbox = []
+        self.assertEqual(send_period_slips(self.period)["sent"], 3)
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class IntegrityTests(PayrollTestCase):
+    def setUp(self):
+        super().setUp()
+        self.draft = self.make_period(month=9)
+        self.final = self.finalize(self.make_period(month=8))
+        self.drifted = self.final.entries.order_by("pk").first()
+        PayrollEntryItem.objects.filter(entry=self.drifted, component=self.basic).update(amount=Decimal("1500000"))
+
+    def test_raw_update_is_detected(self):
+        summary = verify_integrity(PayrollPeriod.objects.all(), workers=1)
+        self.assertEqual((summary["periods"], summary["entries"], summary["repaired"]), (2, 6, 0))
+        (row,) = summary["drift"]
+        self.assertEqual((row["id"], row["period_id"]), (self.drifted.pk, self.final.pk))
+        self.assertEqual(row["item_earnings"], Decimal("1500000.00"))
+        self.assertEqual(row["net_pay"], Decimal("900000"))
+        with self.assertRaisesMessage(CommandError, "1 entry menyimpang"):
+            call_command("verify_integrity", workers=1, stdout=StringIO())
+
+    def test_repair_recomputes_totals_and_refreshes_caches(self):
+        refresh_rollups([self.school.pk])
+        year_total = SchoolRollup.objects.get(school=self.school).year_net_total
+        with self.captureOnCommitCallbacks(execute=True):
+            version = portal_version(self.school.pk)
+            summary = verify_integrity(PayrollPeriod.objects.filter(school=self.school), workers=1, repair=True)
+        self.assertEqual(summary["repaired"], 1)
+        self.drifted.refresh_from_db()
+        self.assertEqual(self.drifted.net_pay, Decimal("1400000"))
+        self.assertNotEqual(portal_version(self.school.pk), version)
+        self.assertEqual(SchoolRollup.objects.get(school=self.school).year_net_total - year_total, Decimal("500000"))
+        output = StringIO()
+        call_command("verify_integrity", workers=1, stdout=output)
+        self.assertIn("6 entry di 2 periode diperiksa; semua total sesuai item.", output.getvalue())
@@ -4,10 +4,19 @@ from . import views
 
 urlpatterns = [
     path("", views.dashboard, name="dashboard"),
+    path("schools/", views.school_overview, name="school_overview"),
+    path("schools/refresh/", views.school_overview_refresh, name="school_overview_refresh"),
     path("employees/", views.employee_list, name="employee_list"),
+    path("employees/autocomplete/", views.employee_autocomplete, name="employee_autocomplete"),
     path("employees/create/", views.employee_create, name="employee_create"),
     path("employees/<int:pk>/edit/", views.employee_edit, name="employee_edit"),
     path("employees/<int:pk>/delete/", views.employee_delete, name="employee_delete"),
+    path("employees/<int:pk>/overrides/", views.employee_overrides, name="employee_overrides"),
+    path(
+        "employees/<int:pk>/overrides/<int:override_pk>/delete/",
+        views.employee_override_delete,
+        name="employee_override_delete",
+    ),
     path("components/", views.component_list, name="component_list"),
     path("components/create/", views.component_create, name="component_create"),
     path("components/<int:pk>/edit/", views.component_edit, name="component_edit"),
@@ -15,10 +24,15 @@ urlpatterns = [
     path("periods/", views.period_list, name="period_list"),
     path("periods/create/", views.period_create, name="period_create"),
     path("periods/<int:pk>/", views.period_detail, name="period_detail"),
+    path("periods/<int:pk>/bulk-component/", views.period_bulk_component, name="period_bulk_component"),
+    path("periods/<int:pk>/grid/", views.period_grid, name="period_grid"),
+    path("periods/<int:pk>/compare/", views.period_compare, name="period_compare"),
+    path("periods/<int:pk>/export/", views.period_export, name="period_export"),
     path("periods/<int:pk>/add-entry/", views.period_add_entry, name="period_add_entry"),
     path("periods/<int:pk>/generate/", views.period_generate, name="period_generate"),
     path("periods/<int:pk>/finalize/", views.period_finalize, name="period_finalize"),
     path("periods/<int:pk>/cancel/", views.period_cancel, name="period_cancel"),
+    path("periods/<int:pk>/send-slips/", views.period_send_slips, name="period_send_slips"),
     path("periods/<int:pk>/delete/", views.period_delete, name="period_delete"),
     path(
         "periods/<int:period_pk>/entries/<int:entry_pk>/",
@@ -45,4 +59,7 @@ urlpatterns = [
         views.payroll_entry_delete,
         name="payroll_entry_delete",
     ),
+    path("metrics/", views.metrics, name="metrics"),
+    path("portal/", views.portal_slip_list, name="portal_slip_list"),
+    path("portal/slips/<int:entry_pk>/pdf/", views.portal_slip_pdf, name="portal_slip_pdf"),
 ]
@@ -0,0 +1,37 @@
+"""Nomor versi cache per sekolah (portal, fragmen, katalog komponen).
+
+Kunci data memuat nomor versi; menaikkan versi membuat seluruh kunci lama tidak
+terpakai tanpa perlu menghapusnya satu per satu.
+
+- Versi awal diambil dari ``time.time_ns()``, bukan 1: bila kunci versi tergusur
+  dari cache (LocMem/memcached membuang kunci saat penuh), versi baru tidak mungkin
+  sama dengan versi lama sehingga entri basi tidak ikut hidup kembali.
+- Kenaikan versi dijalankan lewat ``transaction.on_commit``. Bila dinaikkan di tengah
+  transaksi, request lain bisa mengisi cache versi baru dengan data yang belum
+  di-commit (atau yang kemudian di-rollback).
+"""
+from __future__ import annotations
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def current_version(key: str) -> int:
+    version = cache.get(key)
+    if version is None:
+        seed = time.time_ns()
+        cache.add(key, seed, timeout=None)
+        version = cache.get(key, seed)
+    return version
+
+
+def bump_version(key: str) -> None:
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+    transaction.on_commit(bump)
@@ -1,19 +1,45 @@
 from __future__ import annotations
 
-from io import BytesIO
+import csv
+import hashlib
+import hmac
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, HttpResponseForbidden
+from django.contrib.auth.views import redirect_to_login
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.db.models import Sum
+from django.db.models import Count, Max, Min, Q, Sum
 from django.utils import timezone
-from django.views.decorators.http import require_POST
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_POST, require_safe
 
+from .backends import get_backend
+from .catalog import active_components, component_version
+from .concurrency import (
+    PeriodBusyError,
+    claim_idempotency_key,
+    complete_idempotency_key,
+    period_lock,
+    release_idempotency_key,
+)
+from .db_router import current_route, read_replica, routed
+from .exports import (
+    period_export_batch,
+    period_export_codes,
+    render_export_header,
+    render_export_rows,
+    render_slip_pdf,
+    run_in_render_pool,
+    slip_data,
+)
 from .forms import (
+    EmployeeComponentOverrideForm,
+    EmployeeFilterForm,
     EmployeeForm,
     PayrollComponentForm,
     PayrollEntryItemFormSet,
@@ -21,9 +47,42 @@ from .forms import (
     PayrollEntryAddForm,
     PayrollGenerateForm,
     PayrollPeriodForm,
+    PeriodBulkComponentForm,
+    PeriodGridForm,
+)
+from .fragments import bump_fragment_version, fragment_version, period_entry_rows
+from .mailing import SlipMailingError, delivery_counts, queue_period_slips
+from .metrics import registry
+from .models import (
+    Employee,
+    EmployeeComponentOverride,
+    PayrollComponent,
+    PayrollEntry,
+    PayrollEntryItem,
+    PayrollPeriod,
+    PeriodRollup,
+    School,
+    SchoolRollup,
+    SlipDelivery,
+)
+from .portal import (
+    bump_portal_version,
+    cached_slip_pdf,
+    load_slip_data,
+    slip_etag,
+    slip_listing,
+    store_slip_pdf,
+)
+from .reports import component_differences, employee_differences, period_totals, previous_period
+from .rollups import refresh_rollups
+from .search import search_employees
+from .services import (
+    PayrollGenerationError,
+    add_employee_payroll_entry,
+    apply_component_to_period,
+    generate_payroll,
+    refresh_entry_totals,
 )
-from .models import Employee, PayrollComponent, PayrollEntry, PayrollEntryItem, PayrollPeriod
-from .services import PayrollGenerationError, generate_payroll, add_employee_payroll_entry
 
 
 def _school_guard(request):
@@ -32,8 +91,80 @@ def _school_guard(request):
     return request.user.school
 
 
+def _cache_validators(request, *parts, last_modified, page: bool = True) -> dict:
+    """ETag/Last-Modified dari timestamp data; halaman HTML ikut memuat user & token CSRF."""
+    key = ":".join(str(part) for part in parts)
+    if page:
+        key += f":{request.user.pk}:{request.META.get('CSRF_COOKIE', '')}"
+    return {
+        "etag": quote_etag(hashlib.sha1(key.encode()).hexdigest()),
+        "last_modified": int(last_modified.timestamp()),
+    }
+
+
+def _set_cache_headers(response, validators: dict):
+    response["ETag"] = validators["etag"]
+    response["Last-Modified"] = http_date(validators["last_modified"])
+    # Periode final pun masih bisa berubah (perbaikan integritas, pesan flash, logout), jadi
+    # browser selalu memvalidasi ulang; jawaban 304 tetap murah berkat ETag/Last-Modified.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _not_modified(request, validators: dict):
+    # Pesan flash yang tertunda harus dirender, jadi jangan jawab 304.
+    if request.method not in ("GET", "HEAD") or len(messages.get_messages(request)):
+        return None
+    response = get_conditional_response(
+        request, etag=validators["etag"], last_modified=validators["last_modified"]
+    )
+    if response is not None:
+        _set_cache_headers(response, validators)
+    return response
+
+
+def _entry_validators(request, school, period_pk, entry_pk, *, page: bool = True) -> dict:
+    state = (
+        PayrollEntry.objects.filter(pk=entry_pk, period_id=period_pk, period__school=school)
+        .values("pk", "updated_at", "period__updated_at", "period__status")
+        .first()
+    )
+    if state is None:
+        raise Http404("Data gaji tidak ditemukan.")
+    return _cache_validators(
+        request,
+        "entry",
+        state["pk"],
+        state["updated_at"].isoformat(),
+        state["period__updated_at"].isoformat(),
+        state["period__status"],
+        # Pilihan komponen di form tambah item ikut memengaruhi halaman detail.
+        component_version(school.id) if page else "",
+        last_modified=max(state["updated_at"], state["period__updated_at"]),
+        page=page,
+    )
+
+
+def _employee_guard(request):
+    if not request.user.is_employee() or not request.user.school_id:
+        return HttpResponseForbidden("Akses hanya untuk pegawai.")
+    return request.user
+
+
+def _duplicate_submission(request, record) -> None:
+    if record is not None and record.completed_at:
+        messages.info(request, "Permintaan ini sudah diproses.")
+    else:
+        messages.info(request, "Permintaan yang sama masih diproses. Tunggu hingga selesai.")
+
+
 @login_required
+@read_replica
 def dashboard(request):
+    if request.user.is_employee():
+        return redirect("portal_slip_list")
+    if request.user.is_super_admin():
+        return redirect("school_overview")
     school = _school_guard(request)
     if isinstance(school, HttpResponse):
         return school
@@ -55,13 +186,108 @@ def dashboard(request):
     return render(request, "payroll/dashboard.html", context)
 
 
+@login_required
+@require_safe
+@read_replica
+def school_overview(request):
+    if not request.user.is_super_admin():
+        return HttpResponseForbidden("Akses hanya untuk super admin.")
+    rollups = SchoolRollup.objects.select_related("school", "latest_period")
+    query = request.GET.get("q", "").strip()
+    if query:
+        rollups = rollups.filter(Q(school__name__icontains=query) | Q(school__code__icontains=query))
+    totals = rollups.aggregate(
+        schools=Count("school_id"),
+        active_employees=Sum("active_employee_count"),
+        latest_net=Sum("latest_net_total"),
+        year_net=Sum("year_net_total"),
+        drafts=Sum("draft_period_count"),
+        refreshed_at=Min("refreshed_at"),
+    )
+    monthly = (
+        PeriodRollup.objects.filter(status=PayrollPeriod.STATUS_FINAL)
+        .values("year", "month")
+        .annotate(net_total=Sum("net_total"), entries=Sum("entry_count"), schools=Count("school_id"))
+        .order_by("-year", "-month")[:12]
+    )
+    per_page = getattr(settings, "PAYROLL_OVERVIEW_PAGE_SIZE", 50)
+    page = Paginator(rollups.order_by("school__name"), per_page).get_page(request.GET.get("page"))
+    return render(
+        request,
+        "payroll/school_overview.html",
+        {
+            "page": page,
+            "totals": totals,
+            "monthly": monthly,
+            "query": query,
+            "missing": School.objects.filter(rollup__isnull=True).count(),
+        },
+    )
+
+
+@login_required
+@require_POST
+def school_overview_refresh(request):
+    """Perbarui rollup satu sekolah (``school``) atau sekolah yang belum punya rollup saja.
+
+    Rollup seluruh sekolah diperbarui oleh perintah terjadwal ``refresh_rollups``.
+    """
+    if not request.user.is_super_admin():
+        return HttpResponseForbidden("Akses hanya untuk super admin.")
+    school_id = request.POST.get("school", "")
+    if school_id.isdigit():
+        school_ids = [get_object_or_404(School, pk=int(school_id)).pk]
+    else:
+        school_ids = list(School.objects.filter(rollup__isnull=True).values_list("pk", flat=True))
+    if school_ids:
+        result = refresh_rollups(school_ids)
+        messages.success(request, f"Ringkasan diperbarui: {result['schools']} sekolah, {result['periods']} periode.")
+    else:
+        messages.info(request, "Semua sekolah sudah memiliki ringkasan.")
+    return redirect("school_overview")
+
+
 @login_required
 def employee_list(request):
     school = _school_guard(request)
     if isinstance(school, HttpResponse):
         return school
-    employees = school.employees.all()
-    return render(request, "payroll/employee_list.html", {"employees": employees})
+    filter_form = EmployeeFilterForm(request.GET or None)
+    employees = filter_form.filter(school.employees.order_by("name_key", "id"))
+    per_page = getattr(settings, "PAYROLL_EMPLOYEE_PAGE_SIZE", 50)
+    page = Paginator(employees, per_page).get_page(request.GET.get("page"))
+    query = request.GET.copy()
+    query.pop("page", None)
+    return render(
+        request,
+        "payroll/employee_list.html",
+        {"employees": page, "page": page, "filter_form": filter_form, "query": query.urlencode()},
+    )
+
+
+@login_required
+def employee_autocomplete(request):
+    school = _school_guard(request)
+    if isinstance(school, HttpResponse):
+        return school
+    employees = school.employees.filter(is_active=True)
+    period_id = request.GET.get("exclude_period")
+    if period_id and period_id.isdigit():
+        employees = employees.exclude(payroll_entries__period_id=int(period_id))
+    query = request.GET.get("q", "")
+    if not query.strip():
+        return JsonResponse({"results": []})
+    limit = getattr(settings, "PAYROLL_AUTOCOMPLETE_LIMIT", 20)
+    rows = search_employees(employees, query).order_by("name_key", "id").values(
+        "id", "full_name", "nip", "email"
+    )[:limit]
+    return JsonResponse(
+        {
+            "results": [
+                {"id": row["id"], "text": f"{row['full_name']} ({row['nip'] or row['email']})"} for row in rows
+            ]
+        }
+    )
 
 
 @login_required
@@ -92,6 +318,8 @@ def employee_edit(request, pk):
         form = EmployeeForm(request.POST, instance=employee)
         if form.is_valid():
             form.save()
+            if "full_name" in form.changed_data:
+                bump_fragment_version(school.id)
             messages.success(request, "Data pegawai diperbarui.")
             return redirect("employee_list")
     else:
@@ -111,6 +339,43 @@ def employee_delete(request, pk):
     return redirect("employee_list")
 
 
+@login_required
+def employee_overrides(request, pk):
+    school = _school_guard(request)
+    if isinstance(school, HttpResponse):
+        return school
+    employee = get_object_or_404(Employee, pk=pk, school=school)
+    if request.method == "POST":
+        form = EmployeeComponentOverrideForm(request.POST, school=school)
+        if form.is_valid():
+            override = form.save(commit=False)
+            override.employee = employee
+            override.save()
+            messages.success(request, "Nominal khusus pegawai disimpan.")
+            return redirect("employee_overrides", pk=employee.pk)
+    else:
+        form = EmployeeComponentOverrideForm(school=school)
+    overrides = employee.component_overrides.select_related("component")
+    return render(
+        request,
+        "payroll/employee_overrides.html",
+        {"employee": employee, "overrides": overrides, "form": form},
+    )
+
+
+@login_required
+@require_POST
+def employee_override_delete(request, pk, override_pk):
+    school = _school_guard(request)
+    if isinstance(school, HttpResponse):
+        return school
+    employee = get_object_or_404(Employee, pk=pk, school=school)
+    override = get_object_or_404(EmployeeComponentOverride, pk=override_pk, employee=employee)
+    override.delete()
+    messages.success(request, "Nominal khusus pegawai dihapus.")
+    return redirect("employee_overrides", pk=employee.pk)
+
+
 @login_required
 def component_list(request):
     school = _school_guard(request)
@@ -168,6 +433,7 @@ def component_delete(request, pk):
 
 
 @login_required
+@read_replica
 def period_list(request):
     school = _school_guard(request)
     if isinstance(school, HttpResponse):
@@ -195,13 +461,225 @@ def period_create(request):
 
 
 @login_required
+@read_replica
 def period_detail(request, pk):
+    school = _school_guard(request)
+    if isinstance(school, HttpResponse):
+        return school
+    state = (
+        PayrollPeriod.objects.filter(pk=pk, school=school)
+        .annotate(last_entry=Max("entries__updated_at"), entry_count=Count("entries"))
+        .values("updated_at", "status", "last_entry", "entry_count")
+        .first()
+    )
+    if state is None:
+        raise Http404("Periode tidak ditemukan.")
+    version = fragment_version(school.id)
+    validators = _cache_validators(
+        request,
+        "period",
+        pk,
+        state["updated_at"].isoformat(),
+        state["last_entry"].isoformat() if state["last_entry"] else "",
+        state["entry_count"],
+        state["status"],
+        version,
+        last_modified=max(filter(None, [state["updated_at"], state["last_entry"]])),
+    )
+    not_modified = _not_modified(request, validators)
+    if not_modified is not None:
+        return not_modified
+    period = get_object_or_404(PayrollPeriod, pk=pk, school=school)
+    entry_rows = period_entry_rows(period, state, version) if state["entry_count"] else ""
+    response = render(request, "payroll/period_detail.html", {"period": period, "entry_rows": entry_rows})
+    return _set_cache_headers(response, validators)
+
+
+@login_required
+@read_replica
+def period_compare(request, pk):
+    school = _school_guard(request)
+    if isinstance(school, HttpResponse):
+        return school
+    period = get_object_or_404(PayrollPeriod, pk=pk, school=school)
+    base_id = request.GET.get("with", "")
+    if base_id.isdigit():
+        base = get_object_or_404(PayrollPeriod, pk=base_id, school=school)
+    else:
+        base = previous_period(period)
+    if base is None or base.pk == period.pk:
+        messages.info(request, "Tidak ada periode pembanding.")
+        return redirect("period_detail", pk=pk)
+
+    employees = employee_differences(base, period)
+    components = component_differences(base, period)
+    if request.GET.get("format") == "csv":
+        response = HttpResponse(content_type="text/csv")
+        response["Content-Disposition"] = (
+            f'attachment; filename="perbandingan-{base.year}-{base.month:02d}-{period.year}-{period.month:02d}.csv"'
+        )
+        writer = csv.writer(response)
+        writer.writerow(["pegawai", "komponen", "status", base.label, period.label, "selisih"])
+        for row in employees.iterator():
+            writer.writerow(
+                [row["employee__full_name"], "GAJI BERSIH", row["change"], row["net_base"], row["net_current"], row["delta"]]
+            )
+        for row in components.iterator():
+            writer.writerow(
+                [
+                    row["entry__employee__full_name"],
+                    row["component__code"],
+                    row["change"],
+                    row["amount_base"],
+                    row["amount_current"],
+                    row["delta"],
+                ]
+            )
+        return response
+
+    per_page = getattr(settings, "PAYROLL_COMPARE_PAGE_SIZE", 50)
+    employee_page = Paginator(employees, per_page).get_page(request.GET.get("emp_page"))
+    component_page = Paginator(components, per_page).get_page(request.GET.get("comp_page"))
+    return render(
+        request,
+        "payroll/period_compare.html",
+        {
+            "period": period,
+            "base": base,
+            "periods": school.periods.exclude(pk=period.pk),
+            "totals": period_totals(base, period),
+            "employee_page": employee_page,
+            "component_page": component_page,
+        },
+    )
+
+
+def _save_grid_cells(request, period, cell_ids):
+    items = {
+        item.pk: item
+        for item in PayrollEntryItem.objects.filter(entry__period=period, pk__in=cell_ids).only(
+            "id", "entry_id", "amount"
+        )
+    }
+    form = PeriodGridForm(request.POST, items=items)
+    if not form.is_valid():
+        errors = sorted({error for field_errors in form.errors.values() for error in field_errors})
+        messages.error(request, f"Perubahan tidak disimpan: {' '.join(errors)}")
+        return None, set(), {}
+    entries = {
+        entry.pk: entry
+        for entry in PayrollEntry.objects.select_for_update()
+        .filter(period=period, pk__in={item.entry_id for item in items.values()})
+        .select_related("employee")
+    }
+    conflicts = {
+        entry_id for entry_id, entry in entries.items() if entry.updated_at.isoformat() != form.version(entry_id)
+    }
+    changed = []
+    for item_id, amount in form.amounts().items():
+        item = items[item_id]
+        if item.entry_id not in conflicts and item.amount != amount:
+            item.amount = amount
+            changed.append(item)
+    if changed:
+        PayrollEntryItem.objects.bulk_update(changed, ["amount"], batch_size=500)
+        refresh_entry_totals(PayrollEntry.objects.filter(pk__in={item.entry_id for item in changed}))
+    return changed, conflicts, entries
+
+
+def _apply_grid_changes(request, period):
+    cell_ids = PeriodGridForm.cell_ids(request.POST)
+    if not cell_ids:
+        messages.info(request, "Tidak ada perubahan.")
+        return
+    try:
+        with period_lock(period.pk, "edit", wait=True) as locked_period:
+            if locked_period.status != PayrollPeriod.STATUS_DRAFT:
+                messages.error(request, "Periode sudah final; perubahan tidak disimpan.")
+                return
+            changed, conflicts, entries = _save_grid_cells(request, period, cell_ids)
+    except PeriodBusyError as exc:
+        messages.error(request, str(exc))
+        return
+    if changed is None:
+        return
+    if changed:
+        messages.success(request, f"{len(changed)} nominal diperbarui.")
+    elif not conflicts:
+        messages.info(request, "Tidak ada perubahan.")
+    if conflicts:
+        names = ", ".join(sorted(entries[entry_id].employee.full_name for entry_id in conflicts))
+        messages.warning(
+            request,
+            f"Perubahan untuk {names} tidak disimpan karena data sudah diubah pengguna lain. Periksa lalu ulangi.",
+        )
+
+
+@login_required
+def period_grid(request, pk):
     school = _school_guard(request)
     if isinstance(school, HttpResponse):
         return school
     period = get_object_or_404(PayrollPeriod, pk=pk, school=school)
-    entries = period.entries.select_related("employee").all()
-    return render(request, "payroll/period_detail.html", {"period": period, "entries": entries})
+    if period.status != PayrollPeriod.STATUS_DRAFT:
+        messages.error(request, "Periode final tidak dapat diubah.")
+        return redirect("period_detail", pk=pk)
+    if request.method == "POST":
+        _apply_grid_changes(request, period)
+        page = request.POST.get("page", "")
+        return redirect(f"{request.path}?page={int(page) if page.isdigit() else 1}")
+
+    components = list(
+        PayrollComponent.objects.filter(payrollentryitem__entry__period=period)
+        .order_by("-component_type", "code")  # pendapatan dulu, lalu potongan
+        .distinct()
+    )
+    per_page = getattr(settings, "PAYROLL_GRID_PAGE_SIZE", 100)
+    page = Paginator(period.entries.select_related("employee"), per_page).get_page(request.GET.get("page"))
+    entries = list(page)
+    cells: dict[tuple[int, int], PayrollEntryItem] = {
+        (item.entry_id, item.component_id): item
+        for item in PayrollEntryItem.objects.filter(entry__in=entries).only(
+            "id", "entry_id", "component_id", "amount"
+        )
+    }
+    rows = [(entry, [cells.get((entry.pk, component.pk)) for component in components]) for entry in entries]
+    return render(
+        request,
+        "payroll/period_grid.html",
+        {"period": period, "components": components, "rows": rows, "page": page},
+    )
+
+
+@login_required
+def period_bulk_component(request, pk):
+    school = _school_guard(request)
+    if isinstance(school, HttpResponse):
+        return school
+    period = get_object_or_404(PayrollPeriod, pk=pk, school=school)
+    if period.status != PayrollPeriod.STATUS_DRAFT:
+        messages.error(request, "Periode final tidak dapat diubah.")
+        return redirect("period_detail", pk=pk)
+    form = PeriodBulkComponentForm(request.POST or None, school=school)
+    if request.method == "POST" and form.is_valid():
+        try:
+            counts = apply_component_to_period(
+                period=period,
+                component=form.cleaned_data["component"],
+                action=form.cleaned_data["action"],
+                amount=form.cleaned_data["amount"],
+                employee_type=form.cleaned_data["employee_type"],
+            )
+        except PayrollGenerationError as exc:
+            messages.error(request, str(exc))
+        else:
+            messages.success(
+                request,
+                f"Komponen diterapkan: {counts['created']} ditambahkan, {counts['updated']} diubah, "
+                f"{counts['deleted']} dihapus.",
+            )
+            return redirect("period_detail", pk=pk)
+    return render(request, "payroll/period_bulk_component.html", {"period": period, "form": form})
 
 
 @login_required
@@ -222,7 +700,12 @@ def period_add_entry(request, pk):
             return redirect("period_detail", pk=pk)
         except PayrollGenerationError as exc:
             messages.error(request, str(exc))
-    return render(request, "payroll/period_add_entry.html", {"form": form, "period": period})
+    selected = form.cleaned_data.get("employee") if form.is_bound and form.is_valid() else None
+    return render(
+        request,
+        "payroll/period_add_entry.html",
+        {"form": form, "period": period, "selected_label": selected.full_name if selected else ""},
+    )
 
 
 @login_required
@@ -236,6 +719,12 @@ def period_generate(request, pk):
         return redirect("period_detail", pk=pk)
     form = PayrollGenerateForm(request.POST or None, request.FILES or None, school=school)
     if request.method == "POST" and form.is_valid():
+        record, duplicate = claim_idempotency_key(
+            request.user, "generate", request.POST.get("idempotency_key"), period
+        )
+        if duplicate:
+            _duplicate_submission(request, record)
+            return redirect("period_detail", pk=period.pk)
         method = form.cleaned_data["method"]
         source_period = form.cleaned_data.get("source_period")
         upload_file = form.cleaned_data.get("upload_file")
@@ -248,10 +737,14 @@ def period_generate(request, pk):
                 source_period=source_period,
                 upload_file=upload_file,
             )
-            messages.success(request, "Payroll berhasil digenerate.")
-            return redirect("period_detail", pk=period.pk)
         except PayrollGenerationError as exc:
+            release_idempotency_key(record)
             messages.error(request, str(exc))
+        else:
+            complete_idempotency_key(record)
+            refresh_rollups([school.id])
+            messages.success(request, "Payroll berhasil digenerate.")
+            return redirect("period_detail", pk=period.pk)
     return render(request, "payroll/period_generate.html", {"form": form, "period": period})
 
 
@@ -265,8 +758,27 @@ def period_finalize(request, pk):
     if period.status == PayrollPeriod.STATUS_FINAL:
         messages.info(request, "Periode sudah final.")
         return redirect("period_detail", pk=pk)
-    period.finalize(request.user)
-    PayrollEntry.objects.filter(period=period).update(status=PayrollEntry.STATUS_FINAL, updated_at=timezone.now())
+    record, duplicate = claim_idempotency_key(request.user, "finalize", request.POST.get("idempotency_key"), period)
+    if duplicate:
+        _duplicate_submission(request, record)
+        return redirect("period_detail", pk=pk)
+    try:
+        with period_lock(period.pk, "finalize") as period:
+            if period.status == PayrollPeriod.STATUS_FINAL:
+                release_idempotency_key(record)
+                messages.info(request, "Periode sudah final.")
+                return redirect("period_detail", pk=pk)
+            period.finalize(request.user)
+            PayrollEntry.objects.filter(period=period).update(
+                status=PayrollEntry.STATUS_FINAL, updated_at=timezone.now()
+            )
+    except PeriodBusyError as exc:
+        release_idempotency_key(record)
+        messages.error(request, str(exc))
+        return redirect("period_detail", pk=pk)
+    complete_idempotency_key(record)
+    bump_portal_version(school.id)
+    refresh_rollups([school.id])
     messages.success(request, "Periode berhasil difinalisasi.")
     return redirect("period_detail", pk=pk)
 
@@ -281,15 +793,70 @@ def period_cancel(request, pk):
     if period.status != PayrollPeriod.STATUS_FINAL:
         messages.error(request, "Periode belum final.")
         return redirect("period_list")
-    period.status = PayrollPeriod.STATUS_DRAFT
-    period.finalized_at = None
-    period.finalized_by = None
-    period.save(update_fields=["status", "finalized_at", "finalized_by", "updated_at"])
-    PayrollEntry.objects.filter(period=period).update(status=PayrollEntry.STATUS_DRAFT, updated_at=timezone.now())
+    record, duplicate = claim_idempotency_key(request.user, "cancel", request.POST.get("idempotency_key"), period)
+    if duplicate:
+        _duplicate_submission(request, record)
+        return redirect("period_list")
+    try:
+        with period_lock(period.pk, "cancel") as period:
+            if period.status != PayrollPeriod.STATUS_FINAL:
+                release_idempotency_key(record)
+                messages.error(request, "Periode belum final.")
+                return redirect("period_list")
+            period.status = PayrollPeriod.STATUS_DRAFT
+            period.finalized_at = None
+            period.finalized_by = None
+            period.save(update_fields=["status", "finalized_at", "finalized_by", "updated_at"])
+            PayrollEntry.objects.filter(period=period).update(
+                status=PayrollEntry.STATUS_DRAFT, updated_at=timezone.now()
+            )
+            # Slip terkirim memuat angka lama; setelah finalisasi ulang slip koreksi harus dikirim lagi.
+            SlipDelivery.objects.filter(entry__period=period).delete()
+    except PeriodBusyError as exc:
+        release_idempotency_key(record)
+        messages.error(request, str(exc))
+        return redirect("period_list")
+    complete_idempotency_key(record)
+    bump_portal_version(school.id)
+    refresh_rollups([school.id])
     messages.success(request, "Finalisasi periode dibatalkan.")
     return redirect("period_list")
 
 
+@login_required
+def period_send_slips(request, pk):
+    school = _school_guard(request)
+    if isinstance(school, HttpResponse):
+        return school
+    period = get_object_or_404(PayrollPeriod, pk=pk, school=school)
+    if period.status != PayrollPeriod.STATUS_FINAL:
+        messages.error(request, "Slip hanya dapat dikirim untuk periode final.")
+        return redirect("period_detail", pk=pk)
+    if request.method == "POST":
+        record, duplicate = claim_idempotency_key(
+            request.user, "send_slips", request.POST.get("idempotency_key"), period
+        )
+        if duplicate:
+            _duplicate_submission(request, record)
+            return redirect("period_send_slips", pk=pk)
+        try:
+            queued = queue_period_slips(period)
+        except SlipMailingError as exc:
+            release_idempotency_key(record)
+            messages.error(request, str(exc))
+            return redirect("period_send_slips", pk=pk)
+        complete_idempotency_key(record)
+        if queued:
+            messages.success(request, f"{queued} slip masuk antrean dan akan dikirim di latar belakang.")
+        else:
+            messages.info(request, "Semua slip sudah terkirim.")
+        return redirect("period_send_slips", pk=pk)
+
+    entries = period.entries.filter(status=PayrollEntry.STATUS_FINAL).select_related("employee", "delivery")
+    context = {"period": period, "entries": entries, "counts": delivery_counts(period)}
+    return render(request, "payroll/period_send_slips.html", context)
+
+
 @login_required
 @require_POST
 def period_delete(request, pk):
@@ -300,47 +867,95 @@ def period_delete(request, pk):
     if period.status == PayrollPeriod.STATUS_FINAL:
         messages.error(request, "Periode final tidak dapat dihapus.")
         return redirect("period_list")
-    period.delete()
+    try:
+        with period_lock(period.pk, "delete") as period:
+            if period.status == PayrollPeriod.STATUS_FINAL:
+                messages.error(request, "Periode final tidak dapat dihapus.")
+                return redirect("period_list")
+            period.delete()
+    except PeriodBusyError as exc:
+        messages.error(request, str(exc))
+        return redirect("period_list")
+    refresh_rollups([school.id])
     messages.success(request, "Periode berhasil dihapus.")
     return redirect("period_list")
 
 
+def _load_entry(school, period_pk, entry_pk) -> PayrollEntry:
+    """Ambil entry beserta periode, pegawai, dan seluruh item dalam dua query."""
+    return get_object_or_404(
+        PayrollEntry.objects.select_related("period", "employee").prefetch_related("items"),
+        pk=entry_pk,
+        period_id=period_pk,
+        period__school=school,
+    )
+
+
+def _recalculate_from_db(entry: PayrollEntry) -> None:
+    """Hitung ulang total dari item di database, bukan salinan yang dimuat sebelum kunci periode."""
+    entry.recalculate_totals(list(PayrollEntryItem.objects.filter(entry=entry)))
+
+
+def _split_items(items):
+    earnings = [item for item in items if item.component_type == PayrollComponent.TYPE_EARNING]
+    deductions = [item for item in items if item.component_type == PayrollComponent.TYPE_DEDUCTION]
+    return earnings, deductions
+
+
 @login_required
 def payroll_entry_detail(request, period_pk, entry_pk):
     school = _school_guard(request)
     if isinstance(school, HttpResponse):
         return school
-    period = get_object_or_404(PayrollPeriod, pk=period_pk, school=school)
-    entry = get_object_or_404(PayrollEntry, pk=entry_pk, period=period)
+    validators = None
+    if request.method == "GET":
+        validators = _entry_validators(request, school, period_pk, entry_pk)
+        not_modified = _not_modified(request, validators)
+        if not_modified is not None:
+            return not_modified
+    entry = _load_entry(school, period_pk, entry_pk)
+    period = entry.period
+    items = list(entry.items.all())
     editable = period.status == PayrollPeriod.STATUS_DRAFT
     if request.method == "POST" and editable:
-        formset = PayrollEntryItemFormSet(request.POST, instance=entry)
+        formset = PayrollEntryItemFormSet(request.POST, instance=entry, items=items)
         if formset.is_valid():
-            formset.save()
-            entry.recalculate_totals()
-            messages.success(request, "Nominal gaji diperbarui.")
+            try:
+                with period_lock(period.pk, "edit", wait=True) as locked_period:
+                    if locked_period.status != PayrollPeriod.STATUS_DRAFT:
+                        messages.error(request, "Periode sudah final; perubahan tidak disimpan.")
+                        return redirect("payroll_entry_detail", period_pk=period.pk, entry_pk=entry.pk)
+                    changed_items = formset.save(commit=False)
+                    PayrollEntryItem.objects.bulk_update(changed_items, ["amount"])
+                    _recalculate_from_db(entry)
+            except PeriodBusyError as exc:
+                messages.error(request, str(exc))
+            else:
+                messages.success(request, "Nominal gaji diperbarui.")
             return redirect("payroll_entry_detail", period_pk=period.pk, entry_pk=entry.pk)
     else:
-        formset = PayrollEntryItemFormSet(instance=entry)
+        formset = PayrollEntryItemFormSet(instance=entry, items=items)
     earning_forms = [
         form for form in formset.forms if form.instance.component_type == PayrollComponent.TYPE_EARNING
     ]
     deduction_forms = [
         form for form in formset.forms if form.instance.component_type == PayrollComponent.TYPE_DEDUCTION
     ]
-    earning_items = entry.items.filter(component_type=PayrollComponent.TYPE_EARNING)
-    deduction_items = entry.items.filter(component_type=PayrollComponent.TYPE_DEDUCTION)
+    earning_items, deduction_items = _split_items(items)
+    components = active_components(school.pk)
     earning_add_form = PayrollEntryItemAddForm(
         school=school,
         component_type=PayrollComponent.TYPE_EARNING,
+        components=components,
         prefix="earn_add",
     )
     deduction_add_form = PayrollEntryItemAddForm(
         school=school,
         component_type=PayrollComponent.TYPE_DEDUCTION,
+        components=components,
         prefix="ded_add",
     )
-    return render(
+    response = render(
         request,
         "payroll/entry_detail.html",
         {
@@ -356,57 +971,72 @@ def payroll_entry_detail(request, period_pk, entry_pk):
             "deduction_add_form": deduction_add_form,
         },
     )
+    if validators is not None:
+        _set_cache_headers(response, validators)
+    return response
 
 
-@login_required
-def payroll_entry_pdf(request, period_pk, entry_pk):
+def _slip_data_or_response(request, period_pk, entry_pk):
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
     school = _school_guard(request)
     if isinstance(school, HttpResponse):
         return school
-    period = get_object_or_404(PayrollPeriod, pk=period_pk, school=school)
-    entry = get_object_or_404(PayrollEntry, pk=entry_pk, period=period)
+    validators = _entry_validators(request, school, period_pk, entry_pk, page=False)
+    not_modified = _not_modified(request, validators)
+    if not_modified is not None:
+        return not_modified
+    entry = _load_entry(school, period_pk, entry_pk)
+    return slip_data(entry, list(entry.items.all())), validators
+
+
+@read_replica
+async def payroll_entry_pdf(request, period_pk, entry_pk):
+    loaded = await sync_to_async(_slip_data_or_response)(request, period_pk, entry_pk)
+    if isinstance(loaded, HttpResponse):
+        return loaded
+    data, validators = loaded
+    content = await run_in_render_pool(render_slip_pdf, data)
+    response = HttpResponse(content, content_type="application/pdf")
+    response["Content-Disposition"] = f'attachment; filename="slip-{data["employee_name"]}.pdf"'
+    return _set_cache_headers(response, validators)
+
+
+def _export_period_or_response(request, pk):
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    school = _school_guard(request)
+    if isinstance(school, HttpResponse):
+        return school
+    return get_object_or_404(PayrollPeriod, pk=pk, school=school)
+
+
+@read_replica
+async def period_export(request, pk):
+    period = await sync_to_async(_export_period_or_response)(request, pk)
+    if isinstance(period, HttpResponse):
+        return period
+    codes = await sync_to_async(period_export_codes)(period)
+    batch_size = getattr(settings, "PAYROLL_EXPORT_BATCH_SIZE", 500)
+    # Stream dibaca setelah view selesai, jadi keputusan replika/primary dibawa ke sana.
+    route = current_route()
 
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    y = height - 30 * mm
-    pdf.setFont("Helvetica-Bold", 14)
-    pdf.drawString(20 * mm, y, f"Slip Gaji - {period.label}")
-    y -= 10 * mm
-    pdf.setFont("Helvetica", 11)
-    pdf.drawString(20 * mm, y, f"Pegawai : {entry.employee.full_name}")
-    y -= 7 * mm
-    pdf.drawString(20 * mm, y, f"Jenis    : {entry.employee.get_employee_type_display()}")
-    y -= 7 * mm
-    pdf.drawString(20 * mm, y, f"Periode  : {period.label}")
-    y -= 12 * mm
-    pdf.setFont("Helvetica-Bold", 12)
-    pdf.drawString(20 * mm, y, "Rincian Pendapatan")
-    pdf.setFont("Helvetica", 11)
-    y -= 8 * mm
-    for item in entry.items.filter(component_type=PayrollComponent.TYPE_EARNING):
-        pdf.drawString(22 * mm, y, f"{item.component_name}")
-        pdf.drawRightString(width - 20 * mm, y, f"{item.amount:,.2f}")
-        y -= 6 * mm
-    y -= 4 * mm
-    pdf.setFont("Helvetica-Bold", 12)
-    pdf.drawString(20 * mm, y, "Rincian Potongan")
-    y -= 8 * mm
-    pdf.setFont("Helvetica", 11)
-    for item in entry.items.filter(component_type=PayrollComponent.TYPE_DEDUCTION):
-        pdf.drawString(22 * mm, y, f"{item.component_name}")
-        pdf.drawRightString(width - 20 * mm, y, f"{item.amount:,.2f}")
-        y -= 6 * mm
-    y -= 10 * mm
-    pdf.setFont("Helvetica-Bold", 12)
-    pdf.drawString(20 * mm, y, "Gaji Bersih")
-    pdf.drawRightString(width - 20 * mm, y, f"{entry.net_pay:,.2f}")
-    pdf.showPage()
-    pdf.save()
-
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename="slip-{entry.employee.full_name}.pdf"'
+    async def stream():
+        yield render_export_header(codes)
+        after_id = 0
+        while True:
+            with routed(route):
+                rows = await sync_to_async(period_export_batch)(period, after_id, batch_size)
+            if not rows:
+                break
+            yield await run_in_render_pool(render_export_rows, codes, rows)
+            after_id = rows[-1][0]
+
+    backend = get_backend("export")
+    response = StreamingHttpResponse(stream(), content_type=backend.content_type)
+    response["Content-Disposition"] = (
+        f'attachment; filename="payroll-{period.year}-{period.month:02d}.{backend.extension}"'
+    )
     return response
 
 
@@ -419,9 +1049,8 @@ def payroll_entry_add_item(request, period_pk, entry_pk, component_type):
     if component_type not in dict(PayrollComponent.COMPONENT_TYPES):
         messages.error(request, "Jenis komponen tidak valid.")
         return redirect("payroll_entry_detail", period_pk=period_pk, entry_pk=entry_pk)
-    period = get_object_or_404(PayrollPeriod, pk=period_pk, school=school)
-    entry = get_object_or_404(PayrollEntry, pk=entry_pk, period=period)
-    if period.status != PayrollPeriod.STATUS_DRAFT:
+    entry = _load_entry(school, period_pk, entry_pk)
+    if entry.period.status != PayrollPeriod.STATUS_DRAFT:
         messages.error(request, "Tidak dapat mengubah item pada periode final.")
         return redirect("payroll_entry_detail", period_pk=period_pk, entry_pk=entry_pk)
     form = PayrollEntryItemAddForm(
@@ -435,15 +1064,25 @@ def payroll_entry_add_item(request, period_pk, entry_pk, component_type):
         amount = form.cleaned_data["amount"]
         if amount is None:
             amount = component.default_amount
-        PayrollEntryItem.objects.create(
+        item = PayrollEntryItem(
             entry=entry,
             component=component,
             component_name=component.name,
             component_type=component.component_type,
             amount=amount,
         )
-        entry.recalculate_totals()
-        messages.success(request, "Item berhasil ditambahkan.")
+        try:
+            with period_lock(period_pk, "edit", wait=True) as locked_period:
+                if locked_period.status != PayrollPeriod.STATUS_DRAFT:
+                    messages.error(request, "Tidak dapat mengubah item pada periode final.")
+                    return redirect("payroll_entry_detail", period_pk=period_pk, entry_pk=entry_pk)
+                # bulk_create melewati PayrollEntryItem.save() agar total dihitung sekali saja.
+                PayrollEntryItem.objects.bulk_create([item])
+                _recalculate_from_db(entry)
+        except PeriodBusyError as exc:
+            messages.error(request, str(exc))
+        else:
+            messages.success(request, "Item berhasil ditambahkan.")
     else:
         messages.error(request, "Gagal menambahkan item. Lengkapi data dengan benar.")
     return redirect("payroll_entry_detail", period_pk=period_pk, entry_pk=entry_pk)
@@ -455,15 +1094,25 @@ def payroll_entry_delete_item(request, period_pk, entry_pk, item_pk):
     school = _school_guard(request)
     if isinstance(school, HttpResponse):
         return school
-    period = get_object_or_404(PayrollPeriod, pk=period_pk, school=school)
-    entry = get_object_or_404(PayrollEntry, pk=entry_pk, period=period)
-    if period.status != PayrollPeriod.STATUS_DRAFT:
+    entry = _load_entry(school, period_pk, entry_pk)
+    if entry.period.status != PayrollPeriod.STATUS_DRAFT:
         messages.error(request, "Tidak dapat menghapus item pada periode final.")
         return redirect("payroll_entry_detail", period_pk=period_pk, entry_pk=entry_pk)
-    item = get_object_or_404(PayrollEntryItem, pk=item_pk, entry=entry)
-    item.delete()
-    entry.recalculate_totals()
-    messages.success(request, "Item berhasil dihapus.")
+    items = list(entry.items.all())
+    item = next((item for item in items if item.pk == item_pk), None)
+    if item is None:
+        raise Http404("Item tidak ditemukan.")
+    try:
+        with period_lock(period_pk, "edit", wait=True) as locked_period:
+            if locked_period.status != PayrollPeriod.STATUS_DRAFT:
+                messages.error(request, "Tidak dapat menghapus item pada periode final.")
+                return redirect("payroll_entry_detail", period_pk=period_pk, entry_pk=entry_pk)
+            item.delete()
+            _recalculate_from_db(entry)
+    except PeriodBusyError as exc:
+        messages.error(request, str(exc))
+    else:
+        messages.success(request, "Item berhasil dihapus.")
     return redirect("payroll_entry_detail", period_pk=period_pk, entry_pk=entry_pk)
 
 
@@ -478,6 +1127,69 @@ def payroll_entry_delete(request, period_pk, entry_pk):
         messages.error(request, "Tidak dapat menghapus gaji pada periode final.")
         return redirect("period_detail", pk=period_pk)
     entry = get_object_or_404(PayrollEntry, pk=entry_pk, period=period)
-    entry.delete()
+    try:
+        with period_lock(period.pk, "edit", wait=True) as locked_period:
+            if locked_period.status != PayrollPeriod.STATUS_DRAFT:
+                messages.error(request, "Tidak dapat menghapus gaji pada periode final.")
+                return redirect("period_detail", pk=period_pk)
+            entry.delete()
+    except PeriodBusyError as exc:
+        messages.error(request, str(exc))
+        return redirect("period_detail", pk=period_pk)
     messages.success(request, "Data gaji pegawai dihapus.")
     return redirect("period_detail", pk=period_pk)
+
+
+@login_required
+def portal_slip_list(request):
+    user = _employee_guard(request)
+    if isinstance(user, HttpResponse):
+        return user
+    return render(request, "payroll/portal_slip_list.html", {"slips": slip_listing(user)})
+
+
+def _portal_slip_or_response(request, entry_pk):
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    user = _employee_guard(request)
+    if isinstance(user, HttpResponse):
+        return user
+    # Daftar slip (dari cache) sekaligus menjadi pemeriksaan kepemilikan.
+    slip = next((slip for slip in slip_listing(user) if slip["entry_id"] == entry_pk), None)
+    if slip is None:
+        raise Http404("Slip tidak ditemukan.")
+    etag = slip_etag(user.school_id, entry_pk)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified["ETag"] = etag
+        patch_cache_control(not_modified, private=True, no_cache=True)
+        return not_modified
+    return user.school_id, slip, etag
+
+
+async def portal_slip_pdf(request, entry_pk):
+    loaded = await sync_to_async(_portal_slip_or_response)(request, entry_pk)
+    if isinstance(loaded, HttpResponse):
+        return loaded
+    school_id, slip, etag = loaded
+    content = await sync_to_async(cached_slip_pdf)(school_id, entry_pk)
+    if content is None:
+        data = await sync_to_async(load_slip_data)(entry_pk)
+        content = await run_in_render_pool(render_slip_pdf, data)
+        await sync_to_async(store_slip_pdf)(school_id, entry_pk, content)
+    response = HttpResponse(content, content_type="application/pdf")
+    response["Content-Disposition"] = f'attachment; filename="slip-{slip["label"].replace("/", "-")}.pdf"'
+    response["ETag"] = etag
+    # Slip final masih bisa berubah (pembatalan, perbaikan integritas), jadi selalu divalidasi ulang.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def metrics(request):
+    token = getattr(settings, "PAYROLL_METRICS_TOKEN", None)
+    authorized = bool(token) and hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()
+    )
+    if not authorized and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden("Akses metrik ditolak.")
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,11 +43,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'payroll.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'payroll.staticfiles.StaticFilesMiddleware',
+    'payroll.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'payroll.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,6 +87,36 @@ DATABASES = {
     }
 }
 
+# Replika baca opsional untuk dashboard, daftar/detail periode, perbandingan, slip PDF,
+# dan ekspor (lihat payroll/db_router.py). Tanpa alias 'replica' semua query ke 'default'.
+# Contoh lokal dengan SQLite kedua (salin db.sqlite3 ke replica.sqlite3):
+# DATABASES['replica'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': BASE_DIR / 'replica.sqlite3',
+#     'TEST': {'MIRROR': 'default'},
+# }
+DATABASE_ROUTERS = ['payroll.db_router.ReplicaRouter']
+PAYROLL_REPLICA_DATABASE = 'replica'
+# Setelah POST, pengguna membaca dari primary selama sekian detik (read-your-writes).
+PAYROLL_REPLICA_STICKY_SECONDS = 10
+# Lag maksimum (detik, PostgreSQL) sebelum pembacaan kembali ke primary; None = tanpa cek.
+PAYROLL_REPLICA_MAX_LAG = 5
+PAYROLL_REPLICA_LAG_CHECK_INTERVAL = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# LocMemCache hanya berlaku per proses. Untuk deploy multi-worker gunakan
+# backend bersama (Redis/Memcached) agar cache portal slip konsisten.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'payroll',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -123,12 +158,113 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic memberi hash isi pada nama file dan menulis varian .gz/.br
+# (payroll/staticfiles.py); StaticFilesMiddleware melayaninya dengan header immutable.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'payroll.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+# Masa cache browser (detik) untuk file statis tanpa hash (mis. nama asli yang disalin collectstatic).
+PAYROLL_STATIC_MAX_AGE = 3600
+
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
 AUTH_USER_MODEL = 'payroll.User'
 
-MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
+# Penyimpanan sesi (lihat README "Sesi & Pesan Flash"). "db" (bawaan): tabel
+# django_session, sesi bisa dicabut dari server. Opt-in untuk mengurangi tulis
+# database: "cookie" (signed cookie) atau "cache" (CACHES; wajib backend bersama
+# seperti Redis untuk multi-worker).
+PAYROLL_SESSION_MODE = 'db'
+SESSION_ENGINE = {
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'db': 'django.contrib.sessions.backends.db',
+}[PAYROLL_SESSION_MODE]
+SESSION_COOKIE_HTTPONLY = True
+if PAYROLL_SESSION_MODE == 'cookie':
+    # Signed cookie tidak bisa dicabut dari server sebelum kedaluwarsa.
+    SESSION_COOKIE_AGE = 60 * 60 * 12
+# Pesan disimpan di cookie; hanya pesan yang melebihi batas ukuran cookie jatuh ke sesi.
+MESSAGE_STORAGE = 'django.contrib.messages.storage.fallback.FallbackStorage'
+
+# Slip PDF & ekspor dirender di thread pool terbatas (lihat payroll/exports.py).
+PAYROLL_RENDER_WORKERS = 4
+PAYROLL_EXPORT_BATCH_SIZE = 500
+PAYROLL_COMPARE_PAGE_SIZE = 50
+PAYROLL_GRID_PAGE_SIZE = 100
+PAYROLL_EMPLOYEE_PAGE_SIZE = 50
+PAYROLL_AUTOCOMPLETE_LIMIT = 20
+PAYROLL_EMPLOYEE_FULLTEXT = True
+PAYROLL_OVERVIEW_PAGE_SIZE = 50
+
+# Kunci per periode untuk generate/finalisasi/edit (lihat payroll/concurrency.py).
+# Kunci advisory SQLite yang lebih tua dari TTL dianggap milik proses mati dan boleh diambil alih.
+PAYROLL_PERIOD_LOCK_TTL = 600
+# Lama (detik) kunci idempoten form generate/finalisasi disimpan.
+PAYROLL_IDEMPOTENCY_TTL = 86400
+
+# Perintah auto_rollover: jendela off-peak (menurut TIME_ZONE), ukuran batch sekolah,
+# jeda antar batch (detik), dan masa sewa run agar dua cron tidak memproses bulan yang sama.
+PAYROLL_ROLLOVER_WINDOW = '22:00-05:00'
+PAYROLL_ROLLOVER_BATCH_SIZE = 10
+PAYROLL_ROLLOVER_PAUSE = 2.0
+PAYROLL_ROLLOVER_LEASE = 1800
+
+# Email slip gaji (lihat payroll/mailing.py). Atur EMAIL_BACKEND/EMAIL_HOST untuk SMTP sungguhan;
+# di pengembangan pesan ditulis ke EMAIL_FILE_PATH. Setiap worker memakai satu koneksi SMTP untuk banyak pesan.
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+DEFAULT_FROM_EMAIL = 'payroll@sekolah.test'
+PAYROLL_SLIP_FROM_EMAIL = None
+PAYROLL_SLIP_EMAIL_WORKERS = 4
+PAYROLL_SLIP_EMAIL_BATCH_SIZE = 50
+# Jeda (detik) antar batch agar tidak melampaui batas kirim server SMTP.
+PAYROLL_SLIP_EMAIL_PAUSE = 1.0
+# Baris "sedang dikirim" dari run yang mati boleh diambil run lain setelah masa ini (detik).
+PAYROLL_SLIP_EMAIL_LEASE = 900
+
+# Thread paralel perintah verify_integrity. Bermanfaat di PostgreSQL/MySQL; SQLite praktis serial.
+PAYROLL_INTEGRITY_WORKERS = 4
+
+# Lama (detik) daftar slip & PDF portal pegawai disimpan di cache.
+PAYROLL_PORTAL_CACHE_TIMEOUT = 3600
+
+# Lama (detik) fragmen HTML tabel entry periode disimpan di cache (lihat payroll/fragments.py).
+PAYROLL_FRAGMENT_CACHE_TIMEOUT = 86400
+
+# Lama (detik) katalog komponen aktif per sekolah disimpan di cache (lihat payroll/catalog.py).
+PAYROLL_COMPONENT_CACHE_TIMEOUT = 3600
+
+# Profiling opsional (lihat payroll/profiling.py). Aktifkan sementara saat investigasi.
+PAYROLL_PROFILING_ENABLED = False
+PAYROLL_PROFILE_DIR = BASE_DIR / 'profiles'
+PAYROLL_PROFILE_RETENTION = 50
+
+# Endpoint /metrics (format Prometheus). Scraper memakai header
+# "Authorization: Bearer <token>"; tanpa token hanya user staff yang boleh.
+PAYROLL_METRICS_TOKEN = None
+# Isi dengan direktori bersama untuk menggabungkan metrik dari banyak worker.
+# Snapshot ditulis thread latar tiap PAYROLL_METRICS_FLUSH_INTERVAL detik.
+PAYROLL_METRICS_MULTIPROC_DIR = None
+PAYROLL_METRICS_FLUSH_INTERVAL = 5.0
+
+# Logging
+# Logger "payroll.services" mengirim span waktu per fase generate (extra: payroll_span/payroll_run)
+# pada level INFO. Bawaannya WARNING agar output (termasuk manage.py test) tidak ramai;
+# set PAYROLL_LOG_LEVEL=INFO untuk melihat span.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'payroll': {'handlers': ['console'], 'level': os.environ.get('PAYROLL_LOG_LEVEL', 'WARNING')},
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -0,0 +1,57 @@
+// Autocomplete pegawai: hasil diambil bertahap dari server saat mengetik,
+// pilihan disimpan di input tersembunyi "employee".
+document.querySelectorAll("[data-employee-autocomplete]").forEach(function (box) {
+    var endpoint = box.dataset.employeeAutocomplete;
+    var search = box.querySelector("input[type=search]");
+    var hidden = box.querySelector("input[type=hidden]");
+    var results = box.querySelector(".autocomplete-results");
+    var timer = null;
+    var controller = null;
+
+    function clear() {
+        results.innerHTML = "";
+    }
+
+    function show(items) {
+        clear();
+        items.forEach(function (item) {
+            var button = document.createElement("button");
+            button.type = "button";
+            button.className = "list-group-item list-group-item-action";
+            button.textContent = item.text;
+            button.addEventListener("click", function () {
+                hidden.value = item.id;
+                search.value = item.text;
+                clear();
+            });
+            results.appendChild(button);
+        });
+        if (!items.length) {
+            var empty = document.createElement("div");
+            empty.className = "list-group-item text-muted";
+            empty.textContent = "Tidak ada pegawai yang cocok.";
+            results.appendChild(empty);
+        }
+    }
+
+    search.addEventListener("input", function () {
+        hidden.value = "";
+        clearTimeout(timer);
+        var query = search.value.trim();
+        if (!query) {
+            clear();
+            return;
+        }
+        timer = setTimeout(function () {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            var separator = endpoint.indexOf("?") === -1 ? "?" : "&";
+            fetch(endpoint + separator + "q=" + encodeURIComponent(query), {signal: controller.signal})
+                .then(function (response) { return response.json(); })
+                .then(function (data) { show(data.results); })
+                .catch(function () {});
+        }, 200);
+    });
+});
@@ -0,0 +1,25 @@
+// Form bertanda data-idempotent mendapat kunci unik per halaman, dan tombol
+// submit dinonaktifkan setelah dikirim sehingga klik ganda tidak diproses dua kali.
+(function () {
+    function newKey() {
+        if (window.crypto && window.crypto.randomUUID) {
+            return window.crypto.randomUUID();
+        }
+        return Date.now().toString(36) + "-" + Math.random().toString(36).slice(2);
+    }
+
+    document.querySelectorAll("form[data-idempotent]").forEach(function (form) {
+        var field = form.querySelector("input[name=idempotency_key]");
+        if (field && !field.value) {
+            field.value = newKey();
+        }
+        form.addEventListener("submit", function (event) {
+            if (event.defaultPrevented) {
+                return;
+            }
+            form.querySelectorAll("[type=submit]").forEach(function (button) {
+                button.disabled = true;
+            });
+        });
+    });
+})();
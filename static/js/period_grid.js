@@ -0,0 +1,24 @@
+// Grid edit massal: hanya sel yang berubah (dan versi entry-nya) yang diberi
+// atribut name sehingga ikut terkirim saat form disimpan.
+document.querySelectorAll("[data-period-grid]").forEach(function (form) {
+    form.addEventListener("input", function (event) {
+        var cell = event.target;
+        if (!cell.dataset.name || cell.dataset.initial === undefined) {
+            return;
+        }
+        var changed = cell.value !== cell.dataset.initial;
+        cell.classList.toggle("is-changed", changed);
+        if (changed) {
+            cell.name = cell.dataset.name;
+        } else {
+            cell.removeAttribute("name");
+        }
+        var row = cell.closest("tr");
+        var version = row.querySelector("input[type=hidden][data-name]");
+        if (row.querySelector("input.is-changed")) {
+            version.name = version.dataset.name;
+        } else {
+            version.removeAttribute("name");
+        }
+    });
+});